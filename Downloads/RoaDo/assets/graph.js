@@ -0,0 +1,28 @@
+// Patches the chart data from dash_app.graph_payload into the figure template the page
+// was sent with; the layout, colorbar and fonts never travel again.
+window.dash_clientside = window.dash_clientside || {};
+window.dash_clientside.roado = {
+    patchGraph: function (data) {
+        if (!data) {
+            return window.dash_clientside.no_update;
+        }
+        var hasBars = !data.message;
+        var values = hasBars ? data.co2e : [];
+        return new window.dash_clientside.Patch()
+            .assign(['data', 0, 'x'], values)
+            .assign(['data', 0, 'y'], hasBars ? data.vehicles : [])
+            .assign(['data', 0, 'marker', 'color'], values)
+            .assign(['layout', 'title', 'text'], data.title)
+            .assign(['layout', 'xaxis', 'visible'], hasBars)
+            .assign(['layout', 'yaxis', 'visible'], hasBars)
+            .assign(['layout', 'coloraxis', 'showscale'], hasBars)
+            .assign(['layout', 'annotations'], hasBars ? [] : [{
+                text: data.message,
+                xref: 'paper',
+                yref: 'paper',
+                showarrow: false,
+                font: {size: 16}
+            }])
+            .build();
+    }
+};
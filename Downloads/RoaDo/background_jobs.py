@@ -0,0 +1,75 @@
+from dash import DiskcacheManager
+
+try:
+    import diskcache
+    import multiprocess  # noqa: F401 (runs the jobs)
+    import psutil  # noqa: F401 (stops them)
+except ImportError:  # without dash[diskcache] the heavy callbacks run in the request thread
+    diskcache = None
+
+RESULT_SECONDS = 600  # finished results are served to identical requests for this long
+
+
+class SharedJobManager(DiskcacheManager):
+    # Dash's disk-backed manager: each background callback runs in its own process and
+    # leaves its result in a local diskcache, so no broker is needed. On top of it,
+    # identical requests (same callback, arguments and dataset version) share one job:
+    # a request arriving while that job runs waits on it instead of starting another, and
+    # a superseded request only kills the job once no other request is waiting on it.
+
+    def call_job_fn(self, key, job_fn, args, context):
+        if self.result_ready(key):
+            return 0  # no process: the first poll returns the finished result
+        with self.handle.transact():
+            job = self.handle.get(f"{key}-job")
+            if job is not None and self.job_running(job):
+                self.handle.incr(f"{key}-waiters")
+                return job
+        job = super().call_job_fn(key, job_fn, args, context)
+        with self.handle.transact():
+            self.handle.set(f"{key}-job", job, expire=RESULT_SECONDS)
+            self.handle.set(f"{key}-waiters", 1, expire=RESULT_SECONDS)
+            self.handle.set(f"job-{job}", key, expire=RESULT_SECONDS)
+        return job
+
+    def terminate_job(self, job):
+        # Called once per request, when it got its result or was superseded. Job 0 (a
+        # finished result) has no process; the request handles carry it as a string.
+        if job is None or not int(job):
+            return
+        with self.handle.transact():
+            key = self.handle.get(f"job-{job}")
+            if key is not None:
+                if self.handle.decr(f"{key}-waiters", default=1) > 0:
+                    return
+                self.handle.delete(f"job-{job}")
+                self.handle.delete(f"{key}-job")
+                self.handle.delete(f"{key}-waiters")
+        super().terminate_job(job)
+
+
+def job_manager(cache_dir, size_limit):
+    """A SharedJobManager keeping its jobs and results in cache_dir, or None without diskcache."""
+    if diskcache is None:
+        return None
+    cache = diskcache.Cache(cache_dir, size_limit=size_limit)
+    # cache_by enables result caching; the dataset version is already among the arguments
+    return SharedJobManager(cache, cache_by=[], expire=RESULT_SECONDS)
+
+
+# Jobs hand their stage and callback timings to the app through the job cache, as a queue
+# of StageTimers snapshots that the app merges into its own when /metrics is read
+METRICS_PREFIX = 'metrics'
+
+
+def push_metrics(cache, timers):
+    if timers.enabled:
+        cache.push(timers.snapshot(), prefix=METRICS_PREFIX)
+
+
+def pull_metrics(cache, timers):
+    while True:
+        key, snapshot = cache.pull(prefix=METRICS_PREFIX)
+        if key is None:
+            return
+        timers.merge(snapshot)
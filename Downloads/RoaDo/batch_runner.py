@@ -0,0 +1,218 @@
+import argparse
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from emissions import RESULT_COLUMNS, compute_trip_emissions
+from trip_schema import TRIP_COLUMNS, read_report
+from vehicle_registry import VehicleRegistry
+
+VAHAN_FILE = 'PRLGreenko.vahans.csv'
+
+# --partition-by choice -> report column it is derived from
+PARTITION_COLUMNS = {'branch': 'Branch Name', 'consignor': 'Consignor', 'month': 'LR Date'}
+UNKNOWN_PARTITION = 'unknown'
+
+# A report is cut into byte ranges of whole rows so one large file spreads across the
+# pool; ranges smaller than this are not worth a worker of their own
+MIN_RANGE_BYTES = 8 << 20
+SCAN_BLOCK_BYTES = 16 << 20
+QUOTE, NEWLINE = ord('"'), ord('\n')
+
+_registry = None
+
+
+def load_registry(vahan_paths):
+    # Several vahan exports in the given order; the first record per vehicle wins
+    return VehicleRegistry.from_vahan(vahan_paths)
+
+
+def _init_worker(registry):
+    # The registry is shipped once per worker process, not once per shard
+    global _registry
+    _registry = registry
+
+
+def partition_labels(df_trip, partition_by):
+    if partition_by is None:
+        return np.full(len(df_trip), '', dtype=object)
+    col = df_trip[PARTITION_COLUMNS[partition_by]]
+    if partition_by == 'month':
+        col = col.dt.strftime('%Y-%m')
+    return col.astype(object).where(col.notna(), UNKNOWN_PARTITION).astype(str).to_numpy(dtype=object)
+
+
+def _count_quotes(f, size):
+    # '"' in the next size bytes of f
+    count = 0
+    while size > 0:
+        block = f.read(min(size, SCAN_BLOCK_BYTES))
+        if not block:
+            break
+        count += block.count(b'"')
+        size -= len(block)
+    return count
+
+
+def row_ranges(report_path, parts):
+    """Up to parts (start, end) byte ranges of whole rows covering a report after its header.
+
+    A range ends at a newline outside quotes (an even number of '"' since the header), so
+    quoted text that spans lines stays in one range. Finding the cuts only counts quotes,
+    so the file is scanned once at disk speed and parsed by the workers alone.
+    """
+    size = os.path.getsize(report_path)
+    with open(report_path, 'rb') as f:
+        f.readline()
+        bounds = [f.tell()]
+        pos = bounds[0]
+        quotes = 0  # '"' between the header and pos
+        for k in range(1, parts):
+            target = bounds[0] + k * (size - bounds[0]) // parts
+            if target <= pos:
+                continue
+            f.seek(pos)
+            quotes += _count_quotes(f, target - pos)
+            pos = target
+            while True:
+                block = np.frombuffer(f.read(SCAN_BLOCK_BYTES), dtype=np.uint8)
+                if not len(block):
+                    break
+                outside = (quotes + np.cumsum(block == QUOTE)) % 2 == 0
+                ends = np.flatnonzero((block == NEWLINE) & outside)
+                if len(ends):
+                    quotes += int(np.count_nonzero(block[:ends[0] + 1] == QUOTE))
+                    pos += int(ends[0]) + 1
+                    break
+                quotes += int(np.count_nonzero(block == QUOTE))
+                pos += len(block)
+            if pos >= size:
+                break
+            bounds.append(pos)
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_shard(source, partition_by):
+    # source: a report path, or (path, start, end) for a byte range of its rows
+    columns = TRIP_COLUMNS + ([PARTITION_COLUMNS[partition_by]] if partition_by else [])
+    if isinstance(source, str):
+        return read_report(source, columns)
+    path, start, end = source
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        rows = f.read(end - start)
+    return read_report(io.BytesIO(header + rows), columns)
+
+
+def shard_tasks(file_index, report_path, partition_by, parts):
+    # One task per byte range of the report; a small file stays one whole-file task
+    parts = max(1, min(parts, os.path.getsize(report_path) // MIN_RANGE_BYTES))
+    if parts == 1:
+        return [(file_index, 0, report_path, partition_by)]
+    return [(file_index, part, (report_path, start, end), partition_by)
+            for part, (start, end) in enumerate(row_ranges(report_path, parts))]
+
+
+def run_shard(task):
+    """Emissions for one shard against the worker's registry.
+
+    A shard is (file index, part, report path or (path, start, end) byte range,
+    partition_by). Returns (results, partition label per result row, (file index, part),
+    source row per result row).
+    """
+    file_index, part, source, partition_by = task
+    df_trip = read_shard(source, partition_by)
+    df_results = compute_trip_emissions(df_trip, _registry)
+    # Results are in first-occurrence order of Assignment UID, so these line up row for row
+    first = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first')
+    return df_results, partition_labels(first, partition_by), (file_index, part), first.index.to_numpy()
+
+
+def merge_shards(shards):
+    # Rows are put back in (file, byte range, source row) order before dropping duplicate
+    # trips, so a trip reported in several files or ranges keeps its first occurrence and
+    # the merged result is the same however the input was sharded and whichever worker
+    # finished first.
+    if not shards:
+        return pd.DataFrame(columns=RESULT_COLUMNS), np.empty(0, dtype=object)
+    results = pd.concat([shard[0] for shard in shards], ignore_index=True)
+    labels = np.concatenate([shard[1] for shard in shards])
+    files = np.concatenate([np.full(len(shard[0]), shard[2][0]) for shard in shards])
+    parts = np.concatenate([np.full(len(shard[0]), shard[2][1]) for shard in shards])
+    rows = np.concatenate([shard[3] for shard in shards])
+    order = np.lexsort((rows, parts, files))
+    results, labels = results.iloc[order].reset_index(drop=True), labels[order]
+    keep = ~results['Trip ID'].duplicated(keep='first').to_numpy()
+    return results[keep].reset_index(drop=True), labels[keep]
+
+
+def run_batch(report_paths, vahan_paths, partition_by=None, workers=None):
+    """Compute emissions for many report files in a process pool -> (results, partition label per row).
+
+    Each file is one shard, read by a worker. With fewer files than workers, files are
+    instead cut into byte ranges of whole rows, which the workers parse, so a single large
+    report still spreads across the pool.
+    """
+    registry = load_registry(vahan_paths)
+    workers = workers or os.cpu_count() or 1
+    parts = -(-workers // max(len(report_paths), 1)) if len(report_paths) < workers else 1
+    tasks = [task for i, path in enumerate(report_paths) for task in shard_tasks(i, path, partition_by, parts)]
+    workers = min(workers, max(len(tasks), 1))
+    if workers == 1:
+        _init_worker(registry)
+        shards = [run_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(registry,)) as pool:
+            shards = list(pool.map(run_shard, tasks))
+    return merge_shards(shards)
+
+
+def partition_file_name(label):
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', str(label)).strip('._') or UNKNOWN_PARTITION
+
+
+def write_partitions(out_dir, results, labels, suffix='.csv'):
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for label, rows in sorted(pd.Series(labels).groupby(labels, sort=False).indices.items()):
+        path = os.path.join(out_dir, partition_file_name(label) + suffix)
+        part = results.iloc[rows]
+        if suffix == '.parquet':
+            part.to_parquet(path, index=False)
+        else:
+            part.to_csv(path, index=False)
+        written.append(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute per-trip emissions for many report files in parallel.')
+    parser.add_argument('reports', nargs='+', help='report CSV files (one shard each; earlier files win duplicate trips)')
+    parser.add_argument('--vahan', nargs='+', default=[VAHAN_FILE], help='vahan registry CSV files, shared by all shards')
+    parser.add_argument('--output', default='RESULTS.csv', help='merged results file (.csv or .parquet)')
+    parser.add_argument('--partition-by', choices=sorted(PARTITION_COLUMNS),
+                        help='also write one results file per branch, consignor or LR Date month')
+    parser.add_argument('--partition-dir', default='partitions', help='output directory for --partition-by')
+    parser.add_argument('--workers', type=int, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    results, labels = run_batch(args.reports, args.vahan, partition_by=args.partition_by, workers=args.workers)
+    parquet = str(args.output).endswith('.parquet')
+    if parquet:
+        results.to_parquet(args.output, index=False)
+    else:
+        results.to_csv(args.output, index=False)
+    print(f"Wrote {len(results)} trips from {len(args.reports)} reports to {args.output}")
+    if args.partition_by:
+        written = write_partitions(args.partition_dir, results, labels, '.parquet' if parquet else '.csv')
+        print(f"Wrote {len(written)} {args.partition_by} partitions to {args.partition_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import datetime
+import functools
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pandas as pd
+
+from emissions import compute_trip_emissions
+from synthetic_data import REPORT_FILE, VAHAN_FILE, parse_size, write_dataset
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = '.bench'
+HISTORY_FILE = os.path.join(BENCH_DIR, 'history.jsonl')
+STAGES = ['results', 'dash', 'streamlit']
+
+
+def ensure_dataset(size, seed, root=BENCH_DIR):
+    # Synthetic data is generated once per (size, seed) and reused by later runs
+    data_dir = os.path.join(root, f"{size.lower()}-seed{seed}")
+    if not all(os.path.exists(os.path.join(data_dir, f)) for f in (REPORT_FILE, VAHAN_FILE)):
+        write_dataset(data_dir, parse_size(size), seed=seed)
+    return data_dir
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_results(data_dir):
+    # The create_results_excel.py pipeline without the workbook, and without the frame cache
+    timings = {}
+    timings['results.read_report'], df_trip = timed(
+        pd.read_csv, os.path.join(data_dir, REPORT_FILE), low_memory=False, encoding='utf-8')
+    timings['results.read_vahan'], df_veh = timed(
+        pd.read_csv, os.path.join(data_dir, VAHAN_FILE), low_memory=False, encoding='utf-8')
+    timings['results.compute'], df_results = timed(compute_trip_emissions, df_trip, df_veh)
+    timings['results.write'], _ = timed(df_results.to_csv, os.path.join(data_dir, 'RESULTS.csv'), index=False)
+    return timings
+
+
+def _in_data_dir(data_dir):
+    # Child-process setup: the apps resolve their input files relative to the working directory
+    os.chdir(data_dir)
+    shutil.rmtree('.cache', ignore_errors=True)
+    sys.path.insert(0, REPO_DIR)
+
+
+def _graph_job_result(manager, job_fn, key, args):
+    # What one graph request costs: starting (or reusing) the job and polling until its result is in
+    job = manager.call_job_fn(key, job_fn, args, {})
+    while not manager.result_ready(key):
+        time.sleep(0.005)
+    return manager.get_result(key, job)
+
+
+def _bench_dash(data_dir, n_consignors):
+    _in_data_dir(data_dir)
+    timings = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        dash_app = __import__('dash_app')
+        timings['dash.start'], app = timed(dash_app.create_app, '.')
+        dataset = app.dataset_store.wait()
+        timings['dash.load'] = time.perf_counter() - start
+    if dataset is None:
+        raise RuntimeError(f"dash_app.py failed: {app.dataset_store.message}")
+    manager = app.job_manager
+    if manager is None:
+        # Without dash[diskcache] the app serves the graph in the request thread
+        update_graph = functools.partial(dash_app.graph_payload, dataset)
+    else:
+        # As served: a background job per selection, then its cached result for repeats
+        job_fn = manager.make_job_fn(dash_app.graph_job('.', manager.handle), progress=True)
+
+        def update_graph(consignor):
+            return _graph_job_result(manager, job_fn, f"bench-{consignor}", [consignor, dataset.version])
+    with contextlib.redirect_stdout(io.StringIO()):
+        consignors = dataset.df['Consignor'].value_counts().index[:n_consignors]
+        graph, graph_warm, table, table_warm = [], [], [], []
+        for consignor in consignors:
+            graph.append(timed(update_graph, consignor)[0])
+            graph_warm.append(timed(update_graph, consignor)[0])
+            table.append(timed(dash_app.table_page_payload, dataset, consignor, 0, 100, [], '')[0])
+            table_warm.append(timed(dash_app.table_page_payload, dataset, consignor, 0, 100, [], '')[0])
+    app.dataset_store.stop()
+    # Largest consignors first; the median over them is what a user clicking around sees
+    timings['dash.update_graph_and_table'] = statistics.median(graph)
+    timings['dash.update_graph_and_table.warm'] = statistics.median(graph_warm)
+    timings['dash.update_table_page'] = statistics.median(table)
+    timings['dash.update_table_page.warm'] = statistics.median(table_warm)
+    return timings
+
+
+def _bench_streamlit(data_dir):
+    _in_data_dir(data_dir)
+    from streamlit.testing.v1 import AppTest
+    timings = {}
+    app = AppTest.from_file(os.path.join(REPO_DIR, 'dashboard.py'), default_timeout=24 * 3600)
+    timings['streamlit.first_run'], _ = timed(app.run)
+    if app.exception:
+        raise RuntimeError(f"dashboard.py failed: {app.exception}")
+    timings['streamlit.rerun'], _ = timed(app.run)
+    return timings
+
+
+def in_fresh_process(fn, *args):
+    # Each app is imported in a new interpreter so module-level loading and in-process
+    # caches are measured cold, as on a server start
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def run_suite(sizes, stages, seed=0, n_consignors=5):
+    records = []
+    for size in sizes:
+        data_dir = ensure_dataset(size, seed)
+        timings = {}
+        if 'results' in stages or not os.path.exists(os.path.join(data_dir, 'RESULTS.csv')):
+            timings.update(bench_results(data_dir))
+        if 'dash' in stages:
+            timings.update(in_fresh_process(_bench_dash, os.path.abspath(data_dir), n_consignors))
+        if 'streamlit' in stages:
+            timings.update(in_fresh_process(_bench_streamlit, os.path.abspath(data_dir)))
+        records.extend({'size': size.lower(), 'rows': parse_size(size), 'stage': stage, 'seconds': round(seconds, 6)}
+                       for stage, seconds in timings.items())
+    return records
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'run': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': commit,
+            'python': platform.python_version(), 'pandas': pd.__version__, 'cpus': os.cpu_count()}
+
+
+def load_history(path=HISTORY_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def record(records, path=HISTORY_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    env = environment()
+    with open(path, 'a') as f:
+        for rec in records:
+            f.write(json.dumps({**env, **rec}) + '\n')
+
+
+def report(records, history):
+    # Each timing next to the previous run of the same size and stage
+    previous = {(h['size'], h['stage']): h for h in history}
+    for rec in records:
+        line = f"{rec['size']:>6}  {rec['stage']:<36} {rec['seconds']:>10.4f}s"
+        before = previous.get((rec['size'], rec['stage']))
+        if before and before['seconds'] > 0:
+            change = 100 * (rec['seconds'] / before['seconds'] - 1)
+            line += f"  {change:+7.1f}% vs {before['commit'] or '?'} ({before['run']})"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the emissions pipeline and dashboards on synthetic data.')
+    parser.add_argument('--sizes', nargs='+', default=['10k'], help='report sizes, e.g. 10k 1M 10M')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--consignors', type=int, default=5, help='largest consignors timed in the Dash callbacks')
+    parser.add_argument('--history', default=HISTORY_FILE, help='JSON-lines file the timings are appended to')
+    parser.add_argument('--no-record', action='store_true', help='print timings without appending them to --history')
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    records = run_suite(args.sizes, args.stages, seed=args.seed, n_consignors=args.consignors)
+    report(records, history)
+    if not args.no_record:
+        record(records, args.history)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,120 +1,214 @@
+import argparse
+
 import pandas as pd
 
-# GWP factors (AR5):
-GWP_CH4 = 28
-GWP_N2O = 265
-
-# Emission factors per km (WRI India, kg/km, tailpipe, for diesel trucks)
-# Values are approximate, for illustration. Adjust as per your reference if needed.
-EMISSION_FACTORS = {
-    'LGV': {'CO2': 0.305, 'CH4': 0.00002, 'N2O': 0.00002},
-    'MGV': {'CO2': 0.59,  'CH4': 0.00003, 'N2O': 0.00003},
-    'HGV': {'CO2': 0.73,  'CH4': 0.00004, 'N2O': 0.00004},
-}
-
-# 10% uplift for real-world conditions
-def uplift(val):
-    return round(val * 1.1, 6)
-
-def get_type_factor(veh_type):
-    if 'LGV' in veh_type:
-        return 'LGV'
-    elif 'MGV' in veh_type:
-        return 'MGV'
-    elif 'HGV' in veh_type:
-        return 'HGV'
+from emissions import IDLING_COLUMNS, IDLING_FILE, RESULT_COLUMNS, compare_methodologies, compute_trip_emissions, \
+    factor_config, load_idling_factors
+from factor_registry import REGISTRY_FILE, FactorRegistry
+from quality_gate import QUARANTINE_FILE, QualityGate
+from report_export import export_per_consignor, export_workbook
+from results_store import STORE_FILE, store_results, update_store
+from trip_cache import cached_frame
+from trip_schema import DURATION_FORMATS, IDLING_TRIP_COLUMNS, TRIP_COLUMNS, VEHICLE_COLUMNS, parse_durations, \
+    read_report, read_vahan
+from vehicle_registry import VehicleRegistry
+from weights import WeightEstimator
+
+REPORT_FILE = 'PRL-GreenkoReport-24-25.csv'
+VAHAN_FILE = 'PRLGreenko.vahans.csv'
+RESULTS_FILE = 'RESULTS.csv'
+EXCEL_FILE = 'RESULTS_T.xlsx'
+TEXT_COLUMNS = ['Trip ID', 'Vehicle No.', 'Vehicle Type', 'Fuel Type']
+
+
+def raw_sheets(report_path, vahan_path):
+    # The raw sheets carry every column of both files, as text; only read them for export
+    raw_trip = cached_frame('report', [report_path],
+                            lambda: pd.read_csv(report_path, low_memory=False, encoding='utf-8'))
+    raw_veh = cached_frame('vahan', [vahan_path], lambda: pd.read_csv(vahan_path, low_memory=False, encoding='utf-8'))
+    return raw_trip, raw_veh
+
+
+def run_full(report_path, vahan_path, results_path, excel_path, include_raw=True, per_consignor_dir=None,
+             workers=None, idling=None, gate=None):
+    # Load the typed columns the calculation needs (parsed frames are cached by file content)
+    columns = TRIP_COLUMNS + ['Consignor'] + (IDLING_TRIP_COLUMNS if idling is not None else [])
+    df_trip = cached_frame('report_typed', [report_path], lambda: read_report(report_path, columns),
+                           config={'columns': columns})
+    df_veh = cached_frame('vahan_typed', [vahan_path], lambda: read_vahan(vahan_path, VEHICLE_COLUMNS))
+
+    # One vectorized pass over all trips (duplicates on Trip ID are dropped, first kept)
+    df_results = cached_frame('results', [report_path, vahan_path],
+                              lambda: compute_trip_emissions(df_trip, df_veh, idling),
+                              config={**factor_config(), 'idling': idling})
+    if gate is not None:
+        gate.check(df_results)
+    if str(results_path).endswith('.parquet'):
+        df_results.to_parquet(results_path, index=False)
     else:
-        return None
-
-# Load CSVs
-df_trip = pd.read_csv('PRL-GreenkoReport-24-25.csv', low_memory=False, encoding='utf-8')
-df_veh = pd.read_csv('PRLGreenko.vahans.csv', low_memory=False, encoding='utf-8')
-
-results = []
-for _, row in df_trip.iterrows():
-    trip_id = row['Assignment UID']
-    veh_no = row['Current Vehicle No.']
-    # --- Force vehicle type/fuel for specific vehicles ---
-    if str(veh_no) == 'RJ06FC0709':
-        veh_type = 'HGV'
-        fuel_type = 'DIESEL'
-        type_key = 'HGV'
-    elif str(veh_no) == 'MH03ES1467':
-        veh_type = 'MGV'
-        fuel_type = 'DIESEL'
-        type_key = 'MGV'
+        df_results.to_csv(results_path, index=False)
+
+    raw_trip, raw_veh = raw_sheets(report_path, vahan_path) if include_raw else (None, None)
+
+    # Export stage: row-streamed workbooks, optionally one per consignor
+    if per_consignor_dir:
+        # df_results is in first-occurrence order of Assignment UID, so this lines up row for row
+        consignors = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first')['Consignor']
+        export_per_consignor(per_consignor_dir, df_results, consignors, trips=raw_trip, vehicles=raw_veh,
+                             workers=workers)
     else:
-        veh_info = df_veh[df_veh['regNo'] == str(veh_no)]
-        if not veh_info.empty:
-            veh_type = veh_info.iloc[0]['details.rc_vch_catg']
-            fuel_type = veh_info.iloc[0]['details.rc_fuel_desc']
-            if 'LGV' in veh_type:
-                type_key = 'LGV'
-            elif 'MGV' in veh_type:
-                type_key = 'MGV'
-            elif 'HGV' in veh_type:
-                type_key = 'HGV'
-            else:
-                type_key = None
-        else:
-            veh_type = ''
-            fuel_type = ''
-            type_key = None
-    try:
-        running_distance = float(row['Distance Covered'])
-    except:
-        running_distance = ''
+        export_workbook(excel_path, df_results, trips=raw_trip, vehicles=raw_veh)
+    return df_results
+
+
+class _ParquetSink:
+    def __init__(self, path, columns=RESULT_COLUMNS):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self.schema = pa.schema([
+            (col, pa.string() if col in TEXT_COLUMNS else pa.float64()) for col in columns
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, df):
+        self.writer.write_table(self._pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path, columns=RESULT_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            pd.DataFrame(columns=self.columns).to_csv(self.path, index=False)
+
+
+def stream_results(report_path, vahan_path, results_path, chunk_size=100_000, idling=None, gate=None):
+    # Bounded-memory mode: only TRIP_COLUMNS are parsed, one chunk at a time, and each
+    # chunk is appended to the output as soon as it is computed. The only state kept
+    # across chunks is the set of Trip IDs already written, so duplicates that straddle
+    # a chunk boundary are dropped with the same keep-first rule as the full run.
+    vehicles = VehicleRegistry.from_vahan([vahan_path])
+    columns = RESULT_COLUMNS + (IDLING_COLUMNS if idling is not None else [])
+    usecols = TRIP_COLUMNS + (IDLING_TRIP_COLUMNS if idling is not None else [])
+    sink = (_ParquetSink if str(results_path).endswith('.parquet') else _CsvSink)(results_path, columns)
+    seen_trip_ids = set()
+    rows = 0
     try:
-        total_distance = float(row['Total Distance'])
-    except:
-        total_distance = ''
-    route_efficiency = round(running_distance / total_distance, 3) if running_distance != '' and total_distance != '' and total_distance != 0 else ''
-    if type_key and running_distance != '':
-        ef = EMISSION_FACTORS[type_key]
-        co2 = uplift(ef['CO2']) * running_distance
-        ch4 = uplift(ef['CH4']) * running_distance
-        n2o = uplift(ef['N2O']) * running_distance
-        co2e = co2 + ch4 * GWP_CH4 + n2o * GWP_N2O
-        co2 = round(co2, 2)
-        ch4 = round(ch4, 5)
-        n2o = round(n2o, 5)
-        co2e = round(co2e, 2)
-        ef_co2 = uplift(ef['CO2'])
-        ef_ch4 = uplift(ef['CH4'])
-        ef_n2o = uplift(ef['N2O'])
+        for df_chunk in pd.read_csv(report_path, usecols=usecols, chunksize=chunk_size, encoding='utf-8',
+                                    dtype={'Assignment UID': str, 'Current Vehicle No.': str,
+                                           'Total Halt Time': str}):
+            for col in IDLING_TRIP_COLUMNS if idling is not None else []:
+                df_chunk[col] = parse_durations(df_chunk[col], DURATION_FORMATS[col])
+            df_results = compute_trip_emissions(df_chunk, vehicles, idling)
+            df_results = df_results[~df_results['Trip ID'].isin(seen_trip_ids)]
+            seen_trip_ids.update(df_results['Trip ID'])
+            if gate is not None:
+                gate.check(df_results)
+            sink.write(df_results)
+            rows += len(df_results)
+    finally:
+        sink.close()
+    return rows
+
+
+def run_incremental(report_path, vahan_path, results_path, store_path, excel_path=None, include_raw=True, gate=None,
+                    idling=None):
+    # Only new or changed trips are recomputed; RESULTS.csv and the workbook are regenerated from the store
+    store, stats = update_store(report_path, vahan_path, store_path, idling)
+    df_results = store_results(store)
+    if gate is not None:
+        gate.check(df_results)
+    if str(results_path).endswith('.parquet'):
+        df_results.to_parquet(results_path, index=False)
     else:
-        co2 = ch4 = n2o = co2e = ef_co2 = ef_ch4 = ef_n2o = ''
-    results.append({
-        'Trip ID': trip_id,
-        'Vehicle No.': veh_no,
-        'Vehicle Type': veh_type,
-        'Fuel Type': fuel_type,
-        'Running Distance (km)': running_distance,
-        'Total Distance (km)': total_distance,
-        'Route Efficiency (Running/Total)': route_efficiency,
-        'EF_CO2 (kg/km)': ef_co2,
-        'EF_CH4 (kg/km)': ef_ch4,
-        'EF_N2O (kg/km)': ef_n2o,
-        'CO2 (kg)': co2,
-        'CH4 (kg)': ch4,
-        'N2O (kg)': n2o,
-        'CO2e (kg)': co2e
-    })
-df_results = pd.DataFrame(results)
-
-# Define desired column order
-column_order = [
-    'Trip ID', 'Vehicle No.', 'Vehicle Type', 'Fuel Type',
-    'Running Distance (km)', 'Total Distance (km)', 'Route Efficiency (Running/Total)',
-    'EF_CO2 (kg/km)', 'EF_CH4 (kg/km)', 'EF_N2O (kg/km)',
-    'CO2 (kg)', 'CH4 (kg)', 'N2O (kg)', 'CO2e (kg)'
-]
-df_results = df_results[column_order]
-
-df_results.drop_duplicates(subset=['Trip ID'], keep='first', inplace=True) # Remove duplicates based on Trip ID
-df_results.to_csv('RESULTS.csv', index=False)
-
-with pd.ExcelWriter('RESULTS_T.xlsx') as writer:
-    df_trip.to_excel(writer, sheet_name='trip data', index=False)
-    df_veh.to_excel(writer, sheet_name='vehicle information', index=False)
-    df_results.to_excel(writer, sheet_name='results', index=False)
+        df_results.to_csv(results_path, index=False)
+    if excel_path:
+        raw_trip, raw_veh = raw_sheets(report_path, vahan_path) if include_raw else (None, None)
+        export_workbook(excel_path, df_results, trips=raw_trip, vehicles=raw_veh)
+    return stats
+
+
+def run_comparison(report_path, vahan_path, out_path, registry_path=REGISTRY_FILE, specs=None):
+    # CO2e per trip under every registry methodology, side by side
+    registry = FactorRegistry.from_file(registry_path)
+    df_trip = read_report(report_path, TRIP_COLUMNS + ['Consignment', 'Quantity'])
+    df_veh = read_vahan(vahan_path, VEHICLE_COLUMNS + ['details.rc_unld_wt'])
+    comparison = compare_methodologies(df_trip, df_veh, registry, WeightEstimator.from_file(), specs)
+    if str(out_path).endswith('.parquet'):
+        comparison.to_parquet(out_path, index=False)
+    else:
+        comparison.to_csv(out_path, index=False)
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute per-trip emissions into RESULTS.csv and RESULTS_T.xlsx.')
+    parser.add_argument('--report', default=REPORT_FILE)
+    parser.add_argument('--vahan', default=VAHAN_FILE)
+    parser.add_argument('--output', default=RESULTS_FILE, help='results file (.csv or .parquet)')
+    parser.add_argument('--excel', default=EXCEL_FILE)
+    parser.add_argument('--no-raw-sheets', action='store_true',
+                        help="leave the 'trip data' and 'vehicle information' sheets out of the workbook")
+    parser.add_argument('--per-consignor', metavar='DIR',
+                        help='write one workbook per consignor into DIR instead of --excel')
+    parser.add_argument('--workers', type=int, help='processes for --per-consignor (default: CPU count)')
+    parser.add_argument('--stream', action='store_true',
+                        help='read the report in chunks and append results as they are computed (no Excel workbook)')
+    parser.add_argument('--chunk-size', type=int, default=100_000, help='rows per chunk in --stream mode')
+    parser.add_argument('--idling', nargs='?', const=IDLING_FILE, metavar='FILE',
+                        help="add engine idling over each trip's halt time to its CO2e, at the per-vehicle-class "
+                             "rates in FILE (default: the bundled idling_factors.csv)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='recompute only new or changed trips into --store and regenerate the results file and '
+                             '--excel from it (not --per-consignor)')
+    parser.add_argument('--store', default=STORE_FILE, help='persistent results store for --incremental')
+    parser.add_argument('--quarantine', default=QUARANTINE_FILE, metavar='FILE',
+                        help='write trips that fail the data-quality checks (unknown vehicle, no category, missing, '
+                             'negative or absurd distance, running over total distance) to FILE with their reason '
+                             'codes; they stay in the results')
+    parser.add_argument('--no-quality-gate', action='store_true', help='skip the data-quality checks')
+    parser.add_argument('--compare-methodologies', metavar='FILE',
+                        help='write CO2e per trip under each factor registry methodology to FILE (.csv or .parquet) '
+                             'instead of the results')
+    parser.add_argument('--methodologies', nargs='+', metavar='NAME[@VERSION]',
+                        help='methodologies for --compare-methodologies (default: latest version of each)')
+    parser.add_argument('--factors', default=REGISTRY_FILE, help='factor registry for --compare-methodologies')
+    args = parser.parse_args()
+    idling = load_idling_factors(args.idling) if args.idling else None
+    gate = None if args.no_quality_gate else QualityGate(args.quarantine)
+
+    if args.compare_methodologies:
+        comparison = run_comparison(args.report, args.vahan, args.compare_methodologies, args.factors,
+                                    args.methodologies)
+        print(f"Wrote {len(comparison)} trips to {args.compare_methodologies}")
+    elif args.incremental:
+        if args.per_consignor:
+            parser.error('--per-consignor needs the consignors of a full run; drop --incremental')
+        stats = run_incremental(args.report, args.vahan, args.output, args.store, args.excel,
+                                include_raw=not args.no_raw_sheets, gate=gate, idling=idling)
+        print(f"{stats['trips']} trips: {stats['new']} new, {stats['changed']} changed, {stats['removed']} removed; "
+              f"{stats['stored']} in store")
+    elif args.stream:
+        rows = stream_results(args.report, args.vahan, args.output, chunk_size=args.chunk_size, idling=idling,
+                              gate=gate)
+        print(f"Wrote {rows} trips to {args.output}")
+    else:
+        run_full(args.report, args.vahan, args.output, args.excel, include_raw=not args.no_raw_sheets,
+                 per_consignor_dir=args.per_consignor, workers=args.workers, idling=idling, gate=gate)
+    if gate is not None and not args.compare_methodologies:
+        print(gate)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,344 +1,357 @@
 import dash
 from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
+from dash.dash_table.Format import Format, Scheme
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import plotly.express as px
 import pandas as pd
 import numpy as np
-import sys
+import os
+import threading
+import time
+
+from background_jobs import job_manager, pull_metrics
+from emissions import factor_config
+from factor_registry import FactorRegistry
+from graph_jobs import GRAPH_NAME, SERVING_NAME, bars_payload, graph_frame, graph_job, message_payload
+from joins import checked_merge
+from payload_cache import PayloadCache
+from quality_gate import QualityGate, check_trips
+from stage_timers import StageTimers
+from trip_cache import CACHE_DIR, cache_key, cached_frame, cached_mapped_frame, published_frame
+from trip_schema import read_report, read_results
+from trip_table import TripTableIndex
+from vehicle_registry import VehicleRegistry, alias_numbers, load_overrides, overrides_config
+from weights import WeightEstimator
 
-# --- 1. Load Data ---
 try:
-    vahans_df = pd.read_csv('PRLGreenko.vahans.csv')
-    report_df = pd.read_csv('PRL-GreenkoReport-24-25.csv', low_memory=False)
-    results_df = pd.read_csv('RESULTS.csv')
-except FileNotFoundError as e:
-    print(f"Error loading CSV files: {e}")
-    print("Please ensure all CSV files are in the same directory.")
-    sys.exit()
-
-# --- 2. Create WRI DataFrame ---
-wri_data = {
-    'Vehicle_Type': ['HGV', 'MGV', 'LCV'],
-    'Emission_Factor': [133.53, 168.32, 308.23]  # gCO2e/tonne-km
-}
-wri_df = pd.DataFrame(wri_data)
-
-# --- 3. Merge Vehicle and Report Data ---
-# Ensure merge columns exist
-if 'Current Vehicle No.' not in report_df.columns:
-    raise KeyError("'Current Vehicle No.' column missing in report_df")
-if 'regNo' not in vahans_df.columns:
-    raise KeyError("'regNo' column missing in vahans_df")
-
-df = pd.merge(report_df, vahans_df, left_on='Current Vehicle No.', right_on='regNo', how='left')
-
-# --- 3A. Merge with RESULTS.csv for reference emissions ---
-# Standardize vehicle number column names for join
-results_df.rename(columns={'Vehicle No.': 'Current Vehicle No.', 'Trip ID': 'Trip ID Results'}, inplace=True)
-df = pd.merge(df, results_df, on=['Current Vehicle No.'], how='left', suffixes=('', '_results'))
-
-# --- 4. Estimate Consignment Weights ---
-avg_weights = {
-    'GENERATOR': 50000,
-    'ABB GENERATOR': 15000,
-    'GEAR BOX': 20000,
-    'TRANSFORMER': 10000,
-    'SKY LIFT': 15000,
-    'MODULE': 10,
-    'CONTACTOR': 5,
-    'IGBT': 1,
-    'ISOLATOR': 3,
-    'INTERFACE': 2,
-    'ELECTRICITY': 50000,
-}
-
-def estimate_weight(consignment):
-    if pd.isna(consignment):
-        return 0
-    total_weight = 0
-    consignment_str = str(consignment).upper()
-    quantity = 1
-    try:
-        parts = consignment_str.split(' ')
-        for i, part in enumerate(parts):
-            if 'NOS' in part and i > 0:
-                 if parts[i-1].isdigit():
-                    quantity = int(parts[i-1])
-                    break
-                 elif any(char.isdigit() for char in part):
-                     num_str = ''.join(filter(str.isdigit, part))
-                     if num_str:
-                         quantity = int(num_str)
-                         break
-    except Exception:
-         quantity = 1
-
-    found = False
-    for key, weight_val in avg_weights.items():
-        if key in consignment_str:
-            total_weight += weight_val * quantity
-            found = True
-            break
-    if not found:
-        return 500
-    return total_weight
-
-df['Estimated Consignment Weight (kg)'] = df['Consignment'].apply(estimate_weight)
-
-# --- 4A. Force vehicle type for specific vehicles ---
-# Ensure 'details.rc_vch_catg' exists or create it
-if 'details.rc_vch_catg' not in df.columns:
-    df['details.rc_vch_catg'] = np.nan
-
-def force_vehicle_type(row):
-    if str(row['Current Vehicle No.']) == 'RJ06FC0709':
-        return 'HGV'
-    elif str(row['Current Vehicle No.']) == 'MH03ES1467':
-        return 'MGV'
+    import flask_compress
+except ImportError:  # without dash[compress] responses go out uncompressed
+    flask_compress = None
+
+# --- 1. Input Files ---
+VAHAN_FILE = 'PRLGreenko.vahans.csv'
+REPORT_FILE = 'PRL-GreenkoReport-24-25.csv'
+RESULTS_FILE = 'RESULTS.csv'
+INPUT_FILES = [VAHAN_FILE, REPORT_FILE, RESULTS_FILE]
+
+# The columns build_dataset reads from each file
+REPORT_COLUMNS = ['Assignment UID', 'Current Vehicle No.', 'Consignor', 'Consignment', 'Quantity', 'Distance Covered',
+                  'Total Distance']
+VEHICLE_COLUMNS = ['details.rc_vch_catg', 'details.rc_unld_wt']
+RESULTS_COLUMNS = ['Trip ID', 'CO2e (kg)']
+
+# Seconds between checks of the input files for a new export
+RELOAD_POLL_SECONDS = float(os.environ.get('ROADO_RELOAD_POLL_SECONDS', '5'))
+
+# Stage and callback histograms, served on /metrics (enable with ROADO_METRICS=1)
+timers = StageTimers()
+
+# Bump whenever build_dataset's or serving_frame's logic changes
+DATASET_BUILD = 7
+
+
+class DatasetInputs:
+    # The tables build_dataset reads besides the input files, from the copies bundled with
+    # the scripts. Loaded by create_app, not on import, so the data directory can be
+    # anywhere.
+
+    def __init__(self, data_dir='.'):
+        # --- 2. Create WRI DataFrame ---
+        # gCO2e/tonne-km per vehicle category, from the factor registry (WRI calls LGVs LCVs)
+        wri_factors = FactorRegistry.from_file().factors('wri_tonne_km')
+        self.wri_data = {
+            'Vehicle_Type': ['HGV', 'MGV', 'LCV'],
+            'Emission_Factor': [wri_factors['HGV'], wri_factors['MGV'], wri_factors['LGV']]
+        }
+        self.wri_df = pd.DataFrame(self.wri_data)
+
+        # --- 4. Estimate Consignment Weights ---
+        # Keyword -> average weight rules live in consignment_weights.csv
+        self.weight_estimator = WeightEstimator.from_file(memo_dir=os.path.join(data_dir, CACHE_DIR))
+
+        # Vehicle type/fuel overrides and aliases live in vehicle_overrides.csv
+        self.vehicle_overrides = load_overrides()
+
+        # Anything besides the input files that changes the merged dataset
+        self.config = {'build': DATASET_BUILD, 'wri': self.wri_data, 'weights': self.weight_estimator.rules,
+                       'emissions': factor_config(), 'vehicles': overrides_config()}
+
+
+def build_dataset(data_dir='.', inputs=None):
+    inputs = inputs or DatasetInputs(data_dir)
+    with timers.stage('load'):
+        vehicles = VehicleRegistry.from_vahan([os.path.join(data_dir, VAHAN_FILE)])
+        report_df = read_report(os.path.join(data_dir, REPORT_FILE), REPORT_COLUMNS)
+        results_df = read_results(os.path.join(data_dir, RESULTS_FILE), RESULTS_COLUMNS)
+
+    # --- 3. Look Up Vehicle Details ---
+    if 'Current Vehicle No.' not in report_df.columns:
+        raise KeyError("'Current Vehicle No.' column missing in report_df")
+
+    # Registry lookup on the normalized number: the first vahan record wins and the
+    # vehicle type overrides are applied
+    with timers.stage('vehicle_lookup'):
+        info = vehicles.lookup(report_df['Current Vehicle No.'], VEHICLE_COLUMNS)
+        df = report_df.assign(**{col: info[col].to_numpy() for col in VEHICLE_COLUMNS})
+
+    # --- 3A. Merge with RESULTS.csv for reference emissions ---
+    # One RESULTS row per trip, so the join is on the trip key, never on the vehicle
+    results_df.rename(columns={'Trip ID': 'Trip ID Results'}, inplace=True)
+    with timers.stage('merge_results'):
+        df = checked_merge(df, results_df, 'Assignment UID', 'Trip ID Results', 'many_to_one', suffixes=('', '_results'))
+
+    # --- 3B. Data-quality checks ---
+    # Trips with an unknown vehicle, no category or a missing distance get no emissions
+    # (NaN, not 0 kg); the counts per reason code are logged with each build
+    with timers.stage('quality_gate'):
+        gate = QualityGate()
+        gate.record(report_df, check_trips(info['found'], info['details.rc_vch_catg'], report_df['Distance Covered'],
+                                           report_df['Total Distance']))
+    print(gate)
+
+    # --- 4. Estimate Consignment Weights ---
+    with timers.stage('weights'):
+        df['Estimated Consignment Weight (kg)'] = inputs.weight_estimator.estimate(df['Consignment'], df.get('Quantity'))
+
+    # --- 5. Merge with WRI Data ---
+    # Ensure 'details.rc_unld_wt' exists or create it
+    if 'details.rc_unld_wt' not in df.columns:
+        df['details.rc_unld_wt'] = 0
+
+    df['details.rc_unld_wt'] = pd.to_numeric(df['details.rc_unld_wt'], errors='coerce').fillna(0)
+    df['Vehicle_Type_WRI'] = df['details.rc_vch_catg'].replace({'LGV': 'LCV'})
+    with timers.stage('merge_wri'):
+        df = checked_merge(df, inputs.wri_df, 'Vehicle_Type_WRI', 'Vehicle_Type', 'many_to_one')
+
+    # --- 6. Calculate Carbon Emissions ---
+    with timers.stage('emissions'):
+        df['Total Weight (tonnes)'] = (df['details.rc_unld_wt'] + df['Estimated Consignment Weight (kg)']) / 1000
+        if 'Distance Covered' not in df.columns:
+            df['Distance Covered'] = 0
+        df['Distance Covered'] = pd.to_numeric(df['Distance Covered'], errors='coerce')
+        df['Total Weight (tonnes)'] = df['Total Weight (tonnes)'].fillna(0)
+        df['Carbon Emissions (kg)'] = (df['Distance Covered'] * df['Total Weight (tonnes)'] * df['Emission_Factor']) / 1000
+
+    # --- 6A. Add reference emissions from RESULTS.csv if available ---
+    if 'CO2e (kg)_results' not in df.columns:
+        df['CO2e (kg)_results'] = np.nan
+
+    df['Reference CO2e (kg)'] = df['CO2e (kg)'].fillna(df['CO2e (kg)_results'])
+    return df
+
+# --- 6B. Dataset snapshots ---
+# Numeric table columns are sent as numbers and shown to 1 decimal place by the browser
+NUMBER_COLUMN = {'type': 'numeric', 'format': Format(precision=1, scheme=Scheme.fixed).to_plotly_json()}
+TABLE_COLUMNS = [
+    {'name': 'Vehicle No.', 'id': 'Current Vehicle No.'},
+    {'name': 'Consignor', 'id': 'Consignor'},
+    {'name': 'Consignment', 'id': 'Consignment'},
+    {'name': 'Distance Covered (km)', 'id': 'Distance Covered', **NUMBER_COLUMN},
+    {'name': 'Estimated Consignment Weight (kg)', 'id': 'Estimated Consignment Weight (kg)', **NUMBER_COLUMN},
+    {'name': 'Carbon Emissions (kg)', 'id': 'Carbon Emissions (kg)', **NUMBER_COLUMN},
+    {'name': 'Reference CO2e (kg)', 'id': 'Reference CO2e (kg)', **NUMBER_COLUMN}
+]
+
+
+# Prefix of the trip table index arrays published next to the served columns
+INDEX_PREFIX = '__index__ '
+
+
+def table_columns(df):
+    # Use 'Trip ID' if present and not all null, else fallback to 'Trip ID Results'
+    if 'Trip ID' in df.columns and not df['Trip ID'].isnull().all():
+        trip_id_col = 'Trip ID'
+    elif 'Trip ID Results' in df.columns:
+        trip_id_col = 'Trip ID Results'
     else:
-        return row['details.rc_vch_catg']
+        trip_id_col = None
+    return [{'name': 'Trip ID', 'id': trip_id_col if trip_id_col else 'Trip ID'}] + TABLE_COLUMNS
 
-df['details.rc_vch_catg'] = df.apply(force_vehicle_type, axis=1)
 
-# --- 5. Merge with WRI Data ---
-# Ensure 'details.rc_unld_wt' exists or create it
-if 'details.rc_unld_wt' not in df.columns:
-    df['details.rc_unld_wt'] = 0
+def serving_frame(df, vehicle_overrides):
+    # The columns the app reads, the charted vehicle numbers and the trip table's index
+    # arrays: what worker and graph job processes map
+    columns = [c['id'] for c in table_columns(df) if c['id'] in df.columns]
+    served = df[columns].reset_index(drop=True)
+    index = TripTableIndex.build_index(served, columns)
+    graph = {'Graph Vehicle No.': alias_numbers(served['Current Vehicle No.'], vehicle_overrides).to_numpy()}
+    return pd.concat([served, pd.DataFrame(graph),
+                      pd.DataFrame({INDEX_PREFIX + name: values for name, values in index.items()})], axis=1)
 
-df['details.rc_unld_wt'] = pd.to_numeric(df['details.rc_unld_wt'], errors='coerce').fillna(0)
-df['Vehicle_Type_WRI'] = df['details.rc_vch_catg'].replace({'LGV': 'LCV'})
-df = pd.merge(df, wri_df, left_on='Vehicle_Type_WRI', right_on='Vehicle_Type', how='left')
 
-# --- 6. Calculate Carbon Emissions ---
-df['Total Weight (tonnes)'] = (df['details.rc_unld_wt'] + df['Estimated Consignment Weight (kg)']) / 1000
-if 'Distance Covered' not in df.columns:
-    df['Distance Covered'] = 0
-df['Distance Covered'] = pd.to_numeric(df['Distance Covered'], errors='coerce').fillna(0)
-df['Emission_Factor'] = df['Emission_Factor'].fillna(0)
-df['Total Weight (tonnes)'] = df['Total Weight (tonnes)'].fillna(0)
-df['Carbon Emissions (kg)'] = (df['Distance Covered'] * df['Total Weight (tonnes)'] * df['Emission_Factor']) / 1000
+class Dataset:
+    # One build of the merged trips and everything the callbacks derive from it. Never
+    # modified after construction, so requests can keep using a snapshot while a newer
+    # one replaces it.
 
-# --- 6A. Add reference emissions from RESULTS.csv if available ---
-if 'CO2e (kg)_results' not in df.columns:
-    df['CO2e (kg)_results'] = np.nan
+    def __init__(self, df, version, index=None, graph=None):
+        self.df = df
+        self.version = version
 
-df['Reference CO2e (kg)'] = df['CO2e (kg)'].fillna(df['CO2e (kg)_results'])
+        # --- 6C. Server-side index for the Trip Details Table ---
+        self.table_columns = table_columns(df)
 
-# --- 7. Create Dash App ---
-app = dash.Dash(__name__)
-
-app.layout = html.Div(
-    [
-        html.Div(
-            [
-                html.Img(
-                    src='/assets/roado%20logo.png',  # Updated path and encoded space
-                    style={
-                        'display': 'block',
-                        'marginLeft': 'auto',
-                        'marginRight': 'auto',
-                        'height': '80px',
-                        'marginBottom': '10px',
-                        'marginTop': '10px'
-                    }
-                ),
-                html.H1(
-                    "Roado Carbon Emission Calculator",
-                    style={
-                        'textAlign': 'center',
-                        'color': '#1B5E20',
-                        'marginBottom': '30px',
-                        'fontWeight': 'bold',
-                        'fontFamily': 'Roboto, Arial, sans-serif',
-                        'fontSize': '2.5rem',
-                        'letterSpacing': '1px',
-                        'textShadow': '0 2px 8px #b2dfdb'
-                    }
-                ),
-                html.Div(
-                    [
-                        html.Label(
-                            "Select Consignor:",
-                            style={'fontWeight': 'bold', 'fontSize': '18px', 'color': '#1B5E20', 'marginBottom': '8px'}
-                        ),
-                        dcc.Dropdown(
-                            id='consignor-dropdown',
-                            options=[
-                                {'label': i, 'value': i}
-                                for i in df['Consignor'].unique() if pd.notna(i)
-                            ],
-                            value=(
-                                df['Consignor'].dropna().unique()[0]
-                                if not df['Consignor'].dropna().empty else None
-                            ),
-                            placeholder="Select a consignor...",
-                            style={
-                                'width': '100%',
-                                'backgroundColor': '#e8f5e9',
-                                'color': '#1B5E20',
-                                'borderRadius': '8px',
-                                'border': '2px solid #388e3c',
-                                'fontSize': '17px',
-                                'fontFamily': 'Roboto, Arial, sans-serif',
-                                'marginBottom': '10px'
-                            }
-                        ),
-                    ],
-                    style={'marginBottom': '30px', 'width': '60%', 'margin': '0 auto'}
-                ),
-                dcc.Graph(id='emission-graph', style={'backgroundColor': '#e8f5e9', 'borderRadius': '14px', 'padding': '18px', 'boxShadow': '0 2px 12px #b2dfdb'}),
-                html.Br(),
-                html.H3(
-                    "Trip Details Table",
-                    style={'color': '#1B5E20', 'fontWeight': 'bold', 'marginTop': '30px', 'textAlign': 'center', 'fontSize': '1.5rem'}
-                ),
-                html.Div(id='trip-table', style={'marginBottom': '30px'}),
-                html.Br(),
-                html.Div(
-                    [
-                        html.H4(
-                            "Calculation Methodology & Assumptions",
-                            style={'color': '#1B5E20', 'fontWeight': 'bold'}
-                        ),
-                        html.P(
-                            "Note: The original data does NOT contain actual consignment weights. All carbon emission values are based on the following methodology:",
-                            style={'color': '#1B5E20'}
-                        ),
-                        html.Ul(
-                            [
-                                html.Li("Distance used: The distance for each trip is taken from the 'Distance Covered' column in the trip data. This is the actual distance the vehicle traveled, measured by GPS or odometer."),
-                                html.Li("Emission factors used: We use standard values from WRI India 2015 to estimate how much carbon dioxide is produced per tonne of goods moved per kilometer. These are: HGV (Heavy Goods Vehicle) = 133.53, MGV (Medium Goods Vehicle) = 168.32, LCV (Light Commercial Vehicle) = 308.23 (all in grams of CO2 per tonne-km)."),
-                                html.Li("Estimated consignment weights: Since the actual weight of the goods is not available, we make a rough guess based on keywords in the consignment description. For example, if the consignment mentions 'GENERATOR', we use an average weight for a generator. If we can't guess, we use a default weight of 500 kg. These are only estimates and may not reflect the real weight."),
-                                html.Li("How carbon emissions are calculated: For each trip, we multiply the distance traveled (in km) by the estimated total weight (in tonnes) and the emission factor (in grams of CO2 per tonne-km), then divide by 1000 to get the result in kilograms. Formula: Carbon Emissions (kg) = Distance Covered (km) × Estimated Total Weight (tonnes) × Emission Factor (gCO2e/tonne-km) / 1000."),
-                                html.Li("Reference CO2e (kg): This is a comparison value for carbon emissions. If our calculated value is available, we show that. If not, we use a value from another file (if available). This helps you see both our estimate and any reference value side by side, making it easier to compare.") ,
-                                html.Li("Important: All results are rough estimates for general understanding only. They should NOT be used for official, regulatory, or audit purposes.")
-                            ],
-                            style={'fontSize': '15px', 'color': '#1B5E20'}
-                        ),
-                    ],
-                    style={
-                        'backgroundColor': '#e8f5e9',
-                        'padding': '20px',
-                        'borderRadius': '10px',
-                        'marginBottom': '30px',
-                        'boxShadow': '0 2px 8px #b2dfdb',
-                        'width': '90%',
-                        'margin': '0 auto'
-                    }
-                ),
-                html.Div(
-                    [
-                        html.P(
-                            "Disclaimer: These emissions are *estimates* based on standardized factors and highly uncertain weight estimations. Actual emissions may vary significantly.",
-                            style={
-                                'color': '#fff',
-                                'backgroundColor': '#388e3c',
-                                'padding': '12px',
-                                'borderRadius': '8px',
-                                'fontWeight': 'bold',
-                                'fontSize': '16px',
-                                'textAlign': 'center',
-                                'marginTop': '20px',
-                                'boxShadow': '0 2px 8px #b2dfdb',
-                                'fontFamily': 'Roboto, Arial, sans-serif'
-                            }
-                        )
-                    ]
-                ),
-            ],
-            style={
-                'backgroundColor': '#fff',
-                'padding': '40px 30px 30px 30px',
-                'borderRadius': '18px',
-                'maxWidth': '1100px',
-                'margin': '40px auto',
-                'boxShadow': '0 4px 24px #b2dfdb'
+        # Only the visible page is serialized; sorting and filtering run here, not in the browser
+        with timers.stage('table_index'):
+            self.trip_table_index = TripTableIndex(
+                df, [c['id'] for c in self.table_columns if c['id'] in df.columns], index=index)
+
+        # --- 6D. Per-vehicle emission totals per consignor, aggregated once ---
+        with timers.stage('aggregate'):
+            graph = graph_frame(df) if graph is None else graph
+            self.vehicle_emissions_by_consignor = {
+                consignor: group.drop(columns='Consignor').reset_index(drop=True)
+                for consignor, group in graph.groupby('Consignor', sort=False)
             }
-        )
-    ],
-    style={'backgroundColor': '#e0f2f1', 'minHeight': '100vh'}
-)
+        self.consignors = [c for c in df['Consignor'].unique() if pd.notna(c)]
 
-# --- 8. Define Callbacks ---
-@app.callback(
-    [Output('emission-graph', 'figure'), Output('trip-table', 'children')],
-    [Input('consignor-dropdown', 'value')]
-)
-def update_graph_and_table(selected_consignor):
-    print('Selected consignor:', selected_consignor)
-    filtered_df = df[df['Consignor'] == selected_consignor]
-    print('Filtered columns:', filtered_df.columns)
-    print('Filtered DataFrame head:')
-    print(filtered_df.head())
-
-    table_columns = [
-        {'name': 'Trip ID', 'id': 'Trip ID'},
-        {'name': 'Vehicle No.', 'id': 'Current Vehicle No.'},
-        {'name': 'Consignor', 'id': 'Consignor'},
-        {'name': 'Consignment', 'id': 'Consignment'},
-        {'name': 'Distance Covered (km)', 'id': 'Distance Covered'},
-        {'name': 'Estimated Consignment Weight (kg)', 'id': 'Estimated Consignment Weight (kg)'},
-        {'name': 'Carbon Emissions (kg)', 'id': 'Carbon Emissions (kg)'},
-        {'name': 'Reference CO2e (kg)', 'id': 'Reference CO2e (kg)'}
-    ]
 
+def load_dataset(data_dir='.', inputs=None):
+    """Map the published serving frame for the inputs in data_dir, building it if needed.
+
+    The full merged frame comes from the content-hashed cache. Only the served columns
+    and the table index are published, uncompressed, for every worker process to map
+    read-only, so a worker's private memory does not grow with the dataset.
+    """
+    inputs = inputs or DatasetInputs(data_dir)
+    paths = [os.path.join(data_dir, name) for name in INPUT_FILES]
+    cache_dir = os.path.join(data_dir, CACHE_DIR)
+
+    def build():
+        df = cached_frame('dash_dataset', paths, lambda: build_dataset(data_dir, inputs), config=inputs.config,
+                          cache_dir=cache_dir)
+        return serving_frame(df, inputs.vehicle_overrides)
+
+    with timers.stage('dataset'):
+        # The version names the published file, so graph jobs can map it from the version alone
+        version = cache_key(SERVING_NAME, paths, inputs.config, cache_dir)
+        published = cached_mapped_frame(SERVING_NAME, paths, build, config=inputs.config, cache_dir=cache_dir)
+        index_cols = [c for c in published.columns if c.startswith(INDEX_PREFIX)]
+        index = {c[len(INDEX_PREFIX):]: published[c].to_numpy() for c in index_cols}
+        df = published.drop(columns=index_cols)
+        # The chart totals, published under the same version for the graph jobs
+        graph = published_frame(GRAPH_NAME, version, lambda: graph_frame(df), cache_dir=cache_dir)
+    return Dataset(df, version, index, graph)
+
+
+class DatasetStore:
+    """The current Dataset of a data directory, loaded and hot-reloaded on a background thread.
+
+    Callbacks read store.current once per request. A rebuilt dataset replaces it in a
+    single assignment, so a request in flight finishes on the snapshot it started with and
+    none is dropped or sees a half-built dataset. Inputs are reloaded once their size and
+    mtime have held still for a full poll interval (so a report still being exported is
+    not read half-written), and only when their contents hash differently. A failed
+    reload keeps the previous dataset.
+    """
+
+    def __init__(self, data_dir='.', poll_seconds=RELOAD_POLL_SECONDS, inputs=None):
+        self.data_dir = data_dir
+        self.inputs = inputs or DatasetInputs(data_dir)
+        self.poll_seconds = poll_seconds
+        self.current = None
+        self.message = 'Loading trip data...'  # shown above the chart; None once loaded
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name='dataset-loader', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        # Blocks until the first load attempt ends (for scripts and benchmarks); None if it failed
+        self._ready.wait(timeout)
+        return self.current
+
+    def _stamps(self):
+        stamps = []
+        for name in INPUT_FILES:
+            try:
+                stat = os.stat(os.path.join(self.data_dir, name))
+                stamps.append((stat.st_size, stat.st_mtime_ns))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _watch(self):
+        seen = loaded = None
+        while True:
+            stamps = self._stamps()
+            missing = [name for name, stamp in zip(INPUT_FILES, stamps) if stamp is None]
+            if missing:
+                self._set_status(f"Waiting for {', '.join(missing)} in {os.path.abspath(self.data_dir)}")
+            elif stamps != loaded and (seen is None or stamps == seen):
+                self._reload()
+                loaded = stamps
+            seen = stamps
+            if self._stop.wait(self.poll_seconds):
+                return
+
+    def _reload(self):
+        started = time.perf_counter()
+        try:
+            dataset = load_dataset(self.data_dir, self.inputs)
+        except Exception as e:
+            print(f"Error loading CSV files from {self.data_dir}: {e}")
+            self._set_status(f"Could not load the trip data: {e}")
+        else:
+            if self.current is None or dataset.version != self.current.version:
+                self.current = dataset
+                print(f"Loaded dataset {dataset.version} ({len(dataset.df)} trips) "
+                      f"in {time.perf_counter() - started:.1f}s")
+            self.message = None
+        # The first attempt, successful or not, releases wait()
+        self._ready.set()
+
+    def _set_status(self, problem):
+        if self.current is not None:
+            problem = f"Showing the data loaded before this problem. {problem}"
+        self.message = problem
+
+
+# Rendered figures and table pages, keyed by consignor and dataset version
+payload_cache = PayloadCache(max_bytes=int(os.environ.get('ROADO_PAYLOAD_CACHE_MB', '64')) * 1024 * 1024)
+
+
+def graph_payload(dataset, selected_consignor):
+    """The chart data of one selection: its title and bars, or a message instead of bars.
+
+    assets/graph.js patches it into the figure_template() the page was sent with, so a
+    selection only sends the vehicle numbers and their CO2e. Background jobs compute the
+    same payload with graph_jobs.graph_job.
+    """
+    if dataset is None:
+        return message_payload("Loading data", "Trip data is loading; the chart will appear shortly."), 0
     if not selected_consignor:
-        empty_fig = px.bar()
-        empty_fig.update_layout(
-            title_text="Please select a consignor",
-            xaxis={'visible': False},
-            yaxis={'visible': False},
-            annotations=[{
-                "text": "Please select a consignor to view data.",
-                "xref": "paper", "yref": "paper",
-                "showarrow": False, "font": {"size": 16}
-            }]
-        )
-        # Return empty table with columns but no data
-        empty_table = dash_table.DataTable(
-            columns=table_columns,
-            data=[],
-            sort_action='native',
-            page_size=10,
-            style_table={'overflowX': 'auto', 'background': '#002147', 'borderRadius': '10px', 'boxShadow': '0 2px 8px #e3e8ee'},
-            style_cell={'textAlign': 'center', 'padding': '8px', 'fontFamily': 'Roboto', 'fontSize': '15px', 'backgroundColor': '#002147', 'color': '#F39200'},
-            style_header={'backgroundColor': '#F39200', 'color': '#002147', 'fontWeight': 'bold', 'fontSize': '16px'},
-        )
-        return empty_fig, empty_table
-
-    filtered_df = df[df['Consignor'] == selected_consignor]
-    if filtered_df.empty:
-        empty_fig = px.bar()
-        empty_fig.update_layout(
-            title_text=f"No data for {selected_consignor}",
-            xaxis={'visible': False},
-            yaxis={'visible': False},
-            annotations=[{
-                "text": f"No data available for {selected_consignor}.",
-                "xref": "paper", "yref": "paper",
-                "showarrow": False, "font": {"size": 16}
-            }]
-        )
-        empty_table = dash_table.DataTable(
-            columns=table_columns,
-            data=[],
-            sort_action='native',
-            page_size=10,
-            style_table={'overflowX': 'auto', 'background': '#002147', 'borderRadius': '10px', 'boxShadow': '0 2px 8px #e3e8ee'},
-            style_cell={'textAlign': 'center', 'padding': '8px', 'fontFamily': 'Roboto', 'fontSize': '15px', 'backgroundColor': '#002147', 'color': '#F39200'},
-            style_header={'backgroundColor': '#F39200', 'color': '#002147', 'fontWeight': 'bold', 'fontSize': '16px'},
-        )
-        return empty_fig, empty_table
-
-    graph_df = filtered_df.copy()
-    graph_df['Graph Vehicle No.'] = graph_df['Current Vehicle No.'].replace({'RJ06GC0709': 'RJ06FC0709'})
-    vehicle_emissions = graph_df.groupby('Graph Vehicle No.')['Carbon Emissions (kg)'].sum().reset_index()
+        return message_payload("Please select a consignor", "Please select a consignor to view data."), 0
+
+    payload_key = ('figure', selected_consignor, dataset.version)
+    cached_payload = payload_cache.get(payload_key)
+    if cached_payload is not None:
+        return cached_payload, 0
+
+    with timers.stage('filter', consignor=selected_consignor):
+        vehicle_emissions = dataset.vehicle_emissions_by_consignor.get(selected_consignor)
+    if vehicle_emissions is None:
+        return message_payload(f"No data for {selected_consignor}", f"No data available for {selected_consignor}."), 0
+
+    with timers.stage('figure', consignor=selected_consignor):
+        payload = bars_payload(selected_consignor, vehicle_emissions)
+    return payload_cache.put(payload_key, payload), 0
+
+
+def figure_template():
+    # The chart without its bars: trace style, layout and colorbar, sent once with the page
     fig = px.bar(
-        vehicle_emissions,
+        pd.DataFrame({'Graph Vehicle No.': pd.Series(dtype=str), 'Carbon Emissions (kg)': pd.Series(dtype='float64')}),
         x='Carbon Emissions (kg)',
         y='Graph Vehicle No.',
         orientation='h',
-        title=f"Estimated Carbon Emissions per Vehicle for {selected_consignor}",
         labels={
             'Graph Vehicle No.': 'Vehicle Registration Number',
             'Carbon Emissions (kg)': 'Estimated CO2e (kg)'
@@ -350,9 +363,10 @@ def update_graph_and_table(selected_consignor):
             '#F9A825',  # Eco yellow
             '#F39200'   # Orange
         ],
-        text=vehicle_emissions['Carbon Emissions (kg)'].map(lambda x: f"{x:.1f}")
     )
     fig.update_traces(
+        texttemplate='%{x:.1f}',
+        hovertemplate='Estimated CO2e (kg)=%{x:.1f}<br>Vehicle Registration Number=%{y}<extra></extra>',
         textfont_size=16,
         textangle=0,
         textposition="auto",  # <-- changed from "outside" to "auto"
@@ -362,11 +376,12 @@ def update_graph_and_table(selected_consignor):
     )
     fig.update_layout(
         title={
-            'text': f"Estimated Carbon Emissions per Vehicle for {selected_consignor}",
+            'text': '',
             'x': 0.5,
             'xanchor': 'center',
             'font': dict(size=22, color='#1B5E20', family='Roboto, Arial, sans-serif')
         },
+        annotations=[],
         xaxis_tickangle=-15,
         plot_bgcolor='#e8f5e9',
         paper_bgcolor='#e8f5e9',
@@ -403,81 +418,321 @@ def update_graph_and_table(selected_consignor):
         margin=dict(l=60, r=40, t=80, b=80),
         height=500
     )
+    return fig
 
-    # Use 'Trip ID' if present and not all null, else fallback to 'Trip ID Results'
-    if 'Trip ID' in filtered_df.columns and not filtered_df['Trip ID'].isnull().all():
-        trip_id_col = 'Trip ID'
-    elif 'Trip ID Results' in filtered_df.columns:
-        trip_id_col = 'Trip ID Results'
-    else:
-        trip_id_col = None
 
-    table_columns[0]['id'] = trip_id_col if trip_id_col else 'Trip ID'
+def table_page_payload(dataset, selected_consignor, page_current, page_size, sort_by, filter_query):
+    if dataset is None or not selected_consignor:
+        return [], 1
+
+    payload_key = ('table', selected_consignor, page_current, page_size, str(sort_by), filter_query, dataset.version)
+    cached_page = payload_cache.get(payload_key)
+    if cached_page is not None:
+        return cached_page
+
+    with timers.stage('filter', consignor=selected_consignor):
+        table_data, page_count = dataset.trip_table_index.page(
+            selected_consignor, page_current or 0, page_size, sort_by, filter_query)
+    with timers.stage('table', consignor=selected_consignor):
+        # Numbers go out as numbers (missing as null); the columns' format shows them to 1 decimal place
+        records = table_data.astype(object).where(table_data.notna(), None).to_dict('records')
+    return payload_cache.put(payload_key, (records, page_count))
 
-    if trip_id_col:
-        table_data = filtered_df[
-            [trip_id_col, 'Current Vehicle No.', 'Consignor', 'Consignment', 'Distance Covered', 'Estimated Consignment Weight (kg)', 'Carbon Emissions (kg)', 'Reference CO2e (kg)']
-        ].copy()
+
+# --- 7. Create Dash App ---
+# How often open pages check for a newly loaded dataset
+STATUS_POLL_MS = 5000
+STATUS_STYLE = {'textAlign': 'center', 'color': '#1B5E20', 'fontSize': '16px', 'marginBottom': '10px'}
+PROGRESS_SHOWN = {'display': 'block', 'width': '60%', 'margin': '0 auto 10px auto', 'accentColor': '#388e3c'}
+PROGRESS_HIDDEN = {**PROGRESS_SHOWN, 'visibility': 'hidden'}
+# Background jobs of the chart callback and their results, under the data directory's cache
+JOB_CACHE_MB = int(os.environ.get('ROADO_JOB_CACHE_MB', '256'))
+
+
+def build_layout():
+    # Static: consignors and table columns arrive through update_data_status once data is loaded
+    layout = html.Div(
+        [
+            html.Div(
+                [
+                    html.Img(
+                        src='/assets/roado%20logo.png',  # Updated path and encoded space
+                        style={
+                            'display': 'block',
+                            'marginLeft': 'auto',
+                            'marginRight': 'auto',
+                            'height': '80px',
+                            'marginBottom': '10px',
+                            'marginTop': '10px'
+                        }
+                    ),
+                    html.H1(
+                        "Roado Carbon Emission Calculator",
+                        style={
+                            'textAlign': 'center',
+                            'color': '#1B5E20',
+                            'marginBottom': '30px',
+                            'fontWeight': 'bold',
+                            'fontFamily': 'Roboto, Arial, sans-serif',
+                            'fontSize': '2.5rem',
+                            'letterSpacing': '1px',
+                            'textShadow': '0 2px 8px #b2dfdb'
+                        }
+                    ),
+                    html.Div(
+                        [
+                            html.Label(
+                                "Select Consignor:",
+                                style={'fontWeight': 'bold', 'fontSize': '18px', 'color': '#1B5E20', 'marginBottom': '8px'}
+                            ),
+                            dcc.Dropdown(
+                                id='consignor-dropdown',
+                                options=[],
+                                value=None,
+                                placeholder="Select a consignor...",
+                                style={
+                                    'width': '100%',
+                                    'backgroundColor': '#e8f5e9',
+                                    'color': '#1B5E20',
+                                    'borderRadius': '8px',
+                                    'border': '2px solid #388e3c',
+                                    'fontSize': '17px',
+                                    'fontFamily': 'Roboto, Arial, sans-serif',
+                                    'marginBottom': '10px'
+                                }
+                            ),
+                        ],
+                        style={'marginBottom': '30px', 'width': '60%', 'margin': '0 auto'}
+                    ),
+                    html.Div(id='data-status', style=STATUS_STYLE),
+                    dcc.Interval(id='data-poll', interval=STATUS_POLL_MS),
+                    dcc.Store(id='data-version'),
+                    html.Progress(id='graph-progress', value='0', max='3', style=PROGRESS_HIDDEN),
+                    dcc.Store(id='graph-data'),
+                    dcc.Graph(id='emission-graph', figure=figure_template(), style={'backgroundColor': '#e8f5e9', 'borderRadius': '14px', 'padding': '18px', 'boxShadow': '0 2px 12px #b2dfdb'}),
+                    html.Br(),
+                    html.H3(
+                        "Trip Details Table",
+                        style={'color': '#1B5E20', 'fontWeight': 'bold', 'marginTop': '30px', 'textAlign': 'center', 'fontSize': '1.5rem'}
+                    ),
+                    html.Div(
+                        # Format the trip table for full width and wrapped text
+                        dash_table.DataTable(
+                            id='trip-table',
+                            columns=[],
+                            data=[],
+                            page_current=0,
+                            page_size=10,
+                            page_action='custom',
+                            sort_action='custom',
+                            sort_mode='single',
+                            sort_by=[],
+                            filter_action='custom',
+                            filter_query='',
+                            style_table={
+                                'overflowX': 'auto',
+                                'background': '#002147',
+                                'borderRadius': '10px',
+                                'boxShadow': '0 2px 8px #e3e8ee',
+                                'width': '98%',
+                                'margin': '0 auto',
+                                'maxWidth': '100vw'
+                            },
+                            style_cell={
+                                'textAlign': 'center',
+                                'padding': '8px',
+                                'fontFamily': 'Roboto',
+                                'fontSize': '15px',
+                                'backgroundColor': '#002147',
+                                'color': '#F39200',
+                                'whiteSpace': 'normal',
+                                'height': 'auto',
+                                'maxWidth': '250px',
+                                'overflow': 'hidden',
+                                'textOverflow': 'ellipsis',
+                                'wordBreak': 'break-word',
+                            },
+                            style_header={
+                                'backgroundColor': '#F39200',
+                                'color': '#002147',
+                                'fontWeight': 'bold',
+                                'fontSize': '16px',
+                                'whiteSpace': 'normal',
+                                'height': 'auto',
+                                'wordBreak': 'break-word',
+                            },
+                            style_data_conditional=[
+                                {
+                                    'if': {'column_id': c},
+                                    'textAlign': 'left',
+                                    'whiteSpace': 'normal',
+                                    'wordBreak': 'break-word',
+                                } for c in ['Consignment', 'Consignor']
+                            ]
+                        ),
+                        style={'marginBottom': '30px'}
+                    ),
+                    html.Br(),
+                    html.Div(
+                        [
+                            html.H4(
+                                "Calculation Methodology & Assumptions",
+                                style={'color': '#1B5E20', 'fontWeight': 'bold'}
+                            ),
+                            html.P(
+                                "Note: The original data does NOT contain actual consignment weights. All carbon emission values are based on the following methodology:",
+                                style={'color': '#1B5E20'}
+                            ),
+                            html.Ul(
+                                [
+                                    html.Li("Distance used: The distance for each trip is taken from the 'Distance Covered' column in the trip data. This is the actual distance the vehicle traveled, measured by GPS or odometer."),
+                                    html.Li("Emission factors used: We use standard values from WRI India 2015 to estimate how much carbon dioxide is produced per tonne of goods moved per kilometer. These are: HGV (Heavy Goods Vehicle) = 133.53, MGV (Medium Goods Vehicle) = 168.32, LCV (Light Commercial Vehicle) = 308.23 (all in grams of CO2 per tonne-km)."),
+                                    html.Li("Estimated consignment weights: Since the actual weight of the goods is not available, we make a rough guess based on keywords in the consignment description. For example, if the consignment mentions 'GENERATOR', we use an average weight for a generator. If we can't guess, we use a default weight of 500 kg. These are only estimates and may not reflect the real weight."),
+                                    html.Li("How carbon emissions are calculated: For each trip, we multiply the distance traveled (in km) by the estimated total weight (in tonnes) and the emission factor (in grams of CO2 per tonne-km), then divide by 1000 to get the result in kilograms. Formula: Carbon Emissions (kg) = Distance Covered (km) × Estimated Total Weight (tonnes) × Emission Factor (gCO2e/tonne-km) / 1000."),
+                                    html.Li("Reference CO2e (kg): This is a comparison value for carbon emissions. If our calculated value is available, we show that. If not, we use a value from another file (if available). This helps you see both our estimate and any reference value side by side, making it easier to compare.") ,
+                                    html.Li("Important: All results are rough estimates for general understanding only. They should NOT be used for official, regulatory, or audit purposes.")
+                                ],
+                                style={'fontSize': '15px', 'color': '#1B5E20'}
+                            ),
+                        ],
+                        style={
+                            'backgroundColor': '#e8f5e9',
+                            'padding': '20px',
+                            'borderRadius': '10px',
+                            'marginBottom': '30px',
+                            'boxShadow': '0 2px 8px #b2dfdb',
+                            'width': '90%',
+                            'margin': '0 auto'
+                        }
+                    ),
+                    html.Div(
+                        [
+                            html.P(
+                                "Disclaimer: These emissions are *estimates* based on standardized factors and highly uncertain weight estimations. Actual emissions may vary significantly.",
+                                style={
+                                    'color': '#fff',
+                                    'backgroundColor': '#388e3c',
+                                    'padding': '12px',
+                                    'borderRadius': '8px',
+                                    'fontWeight': 'bold',
+                                    'fontSize': '16px',
+                                    'textAlign': 'center',
+                                    'marginTop': '20px',
+                                    'boxShadow': '0 2px 8px #b2dfdb',
+                                    'fontFamily': 'Roboto, Arial, sans-serif'
+                                }
+                            )
+                        ]
+                    ),
+                ],
+                style={
+                    'backgroundColor': '#fff',
+                    'padding': '40px 30px 30px 30px',
+                    'borderRadius': '18px',
+                    'maxWidth': '1100px',
+                    'margin': '40px auto',
+                    'boxShadow': '0 4px 24px #b2dfdb'
+                }
+            )
+        ],
+        style={'backgroundColor': '#e0f2f1', 'minHeight': '100vh'}
+    )
+    return layout
+
+
+# --- 8. Define Callbacks ---
+def create_app(data_dir='.', poll_seconds=RELOAD_POLL_SECONDS):
+    """Dash app serving the data in data_dir; it starts before the data is loaded and picks up new exports."""
+    store = DatasetStore(data_dir, poll_seconds, DatasetInputs(data_dir))
+    manager = job_manager(os.path.join(data_dir, CACHE_DIR, 'jobs'), JOB_CACHE_MB * 1024 * 1024)
+    app = dash.Dash(__name__, background_callback_manager=manager, compress=flask_compress is not None)
+    app.layout = build_layout()
+    app.dataset_store = store
+    app.job_manager = manager
+
+    @app.callback(
+        [
+            Output('data-version', 'data'),
+            Output('data-status', 'children'),
+            Output('consignor-dropdown', 'options'),
+            Output('consignor-dropdown', 'value'),
+            Output('trip-table', 'columns'),
+        ],
+        [Input('data-poll', 'n_intervals')],
+        [State('data-version', 'data'), State('consignor-dropdown', 'value')]
+    )
+    def update_data_status(n_intervals, shown_version, selected_consignor):
+        dataset = store.current
+        if dataset is None or dataset.version == shown_version:
+            return dash.no_update, store.message, dash.no_update, dash.no_update, dash.no_update
+        if selected_consignor not in dataset.consignors:
+            selected_consignor = dataset.consignors[0] if dataset.consignors else None
+        options = [{'label': i, 'value': i} for i in dataset.consignors]
+        return dataset.version, store.message, options, selected_consignor, dataset.table_columns
+
+    graph_outputs = [Output('graph-data', 'data'), Output('trip-table', 'page_current')]
+    graph_inputs = [Input('consignor-dropdown', 'value'), Input('data-version', 'data')]
+    if manager is None:
+        @app.callback(graph_outputs, graph_inputs)
+        @timers.timed_callback('update_graph_and_table')
+        def update_graph_and_table(selected_consignor, data_version):
+            return graph_payload(store.current, selected_consignor)
     else:
-        table_data = filtered_df[
-            ['Current Vehicle No.', 'Consignor', 'Consignment', 'Distance Covered', 'Estimated Consignment Weight (kg)', 'Carbon Emissions (kg)', 'Reference CO2e (kg)']
-        ].copy()
-
-    # Format numeric columns to 1 decimal place for consistency
-    for col in ['Distance Covered', 'Estimated Consignment Weight (kg)', 'Carbon Emissions (kg)', 'Reference CO2e (kg)']:
-        if col in table_data.columns:
-            table_data[col] = table_data[col].apply(lambda x: f"{x:.1f}" if pd.notnull(x) else "")
-    table_data = table_data.to_dict('records')
-
-    # Format the trip table for full width and wrapped text
-    trip_table_component = dash_table.DataTable(
-        columns=table_columns,
-        data=table_data,
-        sort_action='native',
-        page_size=10,
-        style_table={
-            'overflowX': 'auto',
-            'background': '#002147',
-            'borderRadius': '10px',
-            'boxShadow': '0 2px 8px #e3e8ee',
-            'width': '98%',
-            'margin': '0 auto',
-            'maxWidth': '100vw'
-        },
-        style_cell={
-            'textAlign': 'center',
-            'padding': '8px',
-            'fontFamily': 'Roboto',
-            'fontSize': '15px',
-            'backgroundColor': '#002147',
-            'color': '#F39200',
-            'whiteSpace': 'normal',
-            'height': 'auto',
-            'maxWidth': '250px',
-            'overflow': 'hidden',
-            'textOverflow': 'ellipsis',
-            'wordBreak': 'break-word',
-        },
-        style_header={
-            'backgroundColor': '#F39200',
-            'color': '#002147',
-            'fontWeight': 'bold',
-            'fontSize': '16px',
-            'whiteSpace': 'normal',
-            'height': 'auto',
-            'wordBreak': 'break-word',
-        },
-        style_data_conditional=[
-            {
-                'if': {'column_id': c},
-                'textAlign': 'left',
-                'whiteSpace': 'normal',
-                'wordBreak': 'break-word',
-            } for c in ['Consignment', 'Consignor']
+        # Runs in a job process, so the request thread stays free. Picking another consignor
+        # cancels the job of the previous pick; identical requests share one job and its
+        # result. The job maps the chart totals load_dataset published for the data version
+        # instead of reading the store, so it works whether job processes are forked or
+        # spawned; its timings reach /metrics through the job cache.
+        app.callback(
+            graph_outputs, graph_inputs,
+            background=True,
+            progress=[Output('graph-progress', 'value'), Output('graph-progress', 'max')],
+            running=[(Output('graph-progress', 'style'), PROGRESS_SHOWN, PROGRESS_HIDDEN)],
+        )(graph_job(data_dir, manager.handle))
+
+    # The browser patches each selection's bars into the figure it already has
+    app.clientside_callback(
+        ClientsideFunction(namespace='roado', function_name='patchGraph'),
+        Output('emission-graph', 'figure'),
+        Input('graph-data', 'data'),
+    )
+
+    @app.callback(
+        [Output('trip-table', 'data'), Output('trip-table', 'page_count')],
+        [
+            Input('consignor-dropdown', 'value'),
+            Input('trip-table', 'page_current'),
+            Input('trip-table', 'page_size'),
+            Input('trip-table', 'sort_by'),
+            Input('trip-table', 'filter_query'),
+            Input('data-version', 'data'),
         ]
     )
-    return fig, trip_table_component
+    @timers.timed_callback('update_table_page')
+    def update_table_page(selected_consignor, page_current, page_size, sort_by, filter_query, data_version):
+        return table_page_payload(store.current, selected_consignor, page_current, page_size, sort_by, filter_query)
+
+    @app.server.route('/metrics')
+    def metrics():
+        if not timers.enabled:
+            return 'Stage timers are disabled; restart with ROADO_METRICS=1.\n', 404, {'Content-Type': 'text/plain'}
+        if manager is not None:
+            pull_metrics(manager.handle, timers)
+        return timers.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+    store.start()
+    return app
+
+
+def create_server():
+    """WSGI entry point serving ROADO_DATA_DIR, e.g. gunicorn 'dash_app:create_server()'.
+
+    The app is only built here and under __main__, so importing this module (benchmarks,
+    background job processes) starts no loader thread or job manager.
+    """
+    return create_app(os.environ.get('ROADO_DATA_DIR', '.')).server
+
 
 # --- 9. Run App ---
 if __name__ == '__main__':
-    app.run(debug=True, port=8052)
\ No newline at end of file
+    create_app(os.environ.get('ROADO_DATA_DIR', '.')).run(debug=True, port=8052)
\ No newline at end of file
@@ -0,0 +1,227 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from factor_registry import FactorRegistry
+from vehicle_registry import CATEGORY, FUEL, VehicleRegistry, overrides_config
+
+# GWP factors (AR5):
+GWP_CH4 = 28
+GWP_N2O = 265
+
+# Factor registry methodologies behind RESULTS.csv: one per gas (kg/km with the real-world
+# uplift) and their CO2e at the GWPs above, which comparisons and uncertainty bands use
+GAS_METHODOLOGIES = {'CO2': 'wri_co2', 'CH4': 'wri_ch4', 'N2O': 'wri_n2o'}
+CO2E_METHODOLOGY = 'wri_ghg_uplift'
+
+RESULT_COLUMNS = [
+    'Trip ID', 'Vehicle No.', 'Vehicle Type', 'Fuel Type',
+    'Running Distance (km)', 'Total Distance (km)', 'Route Efficiency (Running/Total)',
+    'EF_CO2 (kg/km)', 'EF_CH4 (kg/km)', 'EF_N2O (kg/km)',
+    'CO2 (kg)', 'CH4 (kg)', 'N2O (kg)', 'CO2e (kg)'
+]
+# Added after RESULT_COLUMNS when halt-time idling is counted
+IDLING_COLUMNS = ['Halt Time (h)', 'Idling CO2e (kg)']
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+IDLING_FILE = os.path.join(MODULE_DIR, 'idling_factors.csv')  # bundled; --idling FILE replaces it
+
+
+def load_emission_factors(registry):
+    """({vehicle class: {gas: kg/km}}, uplift) from the registry's per-gas methodologies.
+
+    Raises ValueError unless the gases share one uplift and, at the GWPs above, add up to
+    the registry's CO2E_METHODOLOGY factors, so the two can not drift apart.
+    """
+    rows = {gas: registry.rows(spec).set_index('vehicle_type') for gas, spec in GAS_METHODOLOGIES.items()}
+    factors = {t: {gas: float(rows[gas].loc[t, 'factor']) for gas in rows} for t in rows['CO2'].index}
+    uplifts = set(pd.concat([r['uplift'] for r in rows.values()]))
+    if len(uplifts) != 1:
+        raise ValueError(f"Per-gas methodologies {list(GAS_METHODOLOGIES.values())} mix uplifts {sorted(uplifts)}")
+    (uplift_factor,) = uplifts
+
+    co2e = registry.rows(CO2E_METHODOLOGY).set_index('vehicle_type')
+    expected = pd.Series({t: f['CO2'] + f['CH4'] * GWP_CH4 + f['N2O'] * GWP_N2O for t, f in factors.items()})
+    mismatched = (set(co2e.index) != set(expected.index)
+                  or not np.allclose(co2e['factor'].reindex(expected.index), expected, rtol=1e-9, atol=0)
+                  or set(co2e['uplift']) != uplifts)
+    if mismatched:
+        raise ValueError(f"{CO2E_METHODOLOGY} does not match {list(GAS_METHODOLOGIES.values())} at "
+                         f"GWP CH4={GWP_CH4}, N2O={GWP_N2O}: expected factors {expected.round(6).to_dict()} "
+                         f"with uplift {uplift_factor}")
+    return factors, float(uplift_factor)
+
+
+# Emission factors per km (WRI India, kg/km, tailpipe, for diesel trucks) and the
+# real-world uplift, from emission_factors.csv
+EMISSION_FACTORS, UPLIFT = load_emission_factors(FactorRegistry.from_file())
+
+
+def uplift(val):
+    return round(val * UPLIFT, 6)
+
+
+def factor_config():
+    # Everything besides the input files that changes the numbers in RESULTS.csv
+    return {
+        'GWP_CH4': GWP_CH4,
+        'GWP_N2O': GWP_N2O,
+        'EMISSION_FACTORS': EMISSION_FACTORS,
+        'VEHICLE_OVERRIDES': overrides_config(),
+        'uplift': uplift(1),
+    }
+
+
+def load_idling_factors(path=IDLING_FILE):
+    # vehicle_type,idle_fuel_l_per_h,idle_share,co2e_kg_per_l table -> {vehicle class: kg CO2e per hour of halt}
+    table = pd.read_csv(path)
+    return {str(row.vehicle_type).upper(): float(row.idle_fuel_l_per_h * row.idle_share * row.co2e_kg_per_l)
+            for row in table.itertuples(index=False)}
+
+
+def get_type_factor(veh_type):
+    if not isinstance(veh_type, str):
+        return None
+    if 'LGV' in veh_type:
+        return 'LGV'
+    elif 'MGV' in veh_type:
+        return 'MGV'
+    elif 'HGV' in veh_type:
+        return 'HGV'
+    else:
+        return None
+
+
+def round_like_python(values, decimals):
+    # np.round scales by 10**decimals before rounding, which can land on the other
+    # side of a tie than Python's round(). Re-round only the near-ties in Python so
+    # the output stays byte-identical to the original per-row script.
+    values = np.asarray(values, dtype='float64')
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0 ** decimals
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        rounded[i] = round(float(values[i]), decimals)
+    return rounded
+
+
+def _parse_distance(col):
+    # float() on a cell: NaN stays NaN (and still counts as a distance), unparseable text does not
+    parsed = pd.to_numeric(col, errors='coerce').to_numpy(dtype='float64')
+    is_valid = ~(np.isnan(parsed) & col.notna().to_numpy())
+    return parsed, is_valid
+
+
+def vehicle_lookup(veh_no, vehicles, columns=()):
+    """Vehicle type, fuel type and factor key (LGV/MGV/HGV or None) per vehicle number.
+
+    vehicles is a VehicleRegistry or a vahan DataFrame (loaded into an in-memory one).
+    Returns (veh_type, fuel_type, type_key, extra) where extra holds the requested vahan
+    columns per vehicle (NaN where the vehicle has no record).
+    """
+    if not isinstance(vehicles, VehicleRegistry):
+        vehicles = VehicleRegistry.from_frame(vehicles)
+
+    # Registry lookup (first vahan record wins, overrides applied); unknown vehicles get ''
+    info = vehicles.lookup(veh_no, [CATEGORY, FUEL] + [c for c in columns if c not in (CATEGORY, FUEL)])
+    found = info['found'].to_numpy()
+    veh_type = np.where(found, info[CATEGORY].to_numpy(dtype=object), '')
+    fuel_type = np.where(found, info[FUEL].to_numpy(dtype=object), '')
+    extra = {col: info[col].to_numpy(dtype=object) for col in columns}
+
+    # Category -> factor key, evaluated once per distinct category
+    type_key = pd.Series(veh_type, dtype=object).map({c: get_type_factor(c) for c in pd.unique(veh_type)})
+    return veh_type, fuel_type, np.array(type_key, dtype=object), extra
+
+
+def compute_trip_emissions(df_trip, vehicles, idling=None):
+    """Per-trip CO2/CH4/N2O/CO2e for a trip report, in the layout of RESULTS.csv.
+
+    vehicles is a VehicleRegistry or a vahan DataFrame. idling ({vehicle class: kg CO2e
+    per halt hour}, see load_idling_factors) adds engine idling over the trip's parsed
+    'Total Halt Time' to its CO2e, and the IDLING_COLUMNS to the results. A trip without
+    a halt time has no Idling CO2e (NaN) and keeps its running CO2e.
+    """
+    df_trip = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first')
+    veh_no = df_trip['Current Vehicle No.']
+    veh_type, fuel_type, type_key, _ = vehicle_lookup(veh_no, vehicles)
+
+    running_distance, running_valid = _parse_distance(df_trip['Distance Covered'])
+    total_distance, _ = _parse_distance(df_trip['Total Distance'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        route_efficiency = np.where(total_distance != 0, running_distance / total_distance, np.nan)
+    route_efficiency = round_like_python(route_efficiency, 3)
+
+    ef = {gas: np.full(len(df_trip), np.nan) for gas in ('CO2', 'CH4', 'N2O')}
+    for key, factors in EMISSION_FACTORS.items():
+        has_key = (type_key == key) & running_valid
+        for gas in ef:
+            ef[gas][has_key] = uplift(factors[gas])
+
+    co2 = ef['CO2'] * running_distance
+    ch4 = ef['CH4'] * running_distance
+    n2o = ef['N2O'] * running_distance
+    co2e = co2 + ch4 * GWP_CH4 + n2o * GWP_N2O
+
+    df_results = pd.DataFrame({
+        'Trip ID': df_trip['Assignment UID'].to_numpy(),
+        'Vehicle No.': veh_no.to_numpy(),
+        'Vehicle Type': veh_type,
+        'Fuel Type': fuel_type,
+        'Running Distance (km)': running_distance,
+        'Total Distance (km)': total_distance,
+        'Route Efficiency (Running/Total)': route_efficiency,
+        'EF_CO2 (kg/km)': ef['CO2'],
+        'EF_CH4 (kg/km)': ef['CH4'],
+        'EF_N2O (kg/km)': ef['N2O'],
+        'CO2 (kg)': round_like_python(co2, 2),
+        'CH4 (kg)': round_like_python(ch4, 5),
+        'N2O (kg)': round_like_python(n2o, 5),
+        'CO2e (kg)': round_like_python(co2e, 2),
+    })
+    if idling is None:
+        return df_results[RESULT_COLUMNS]
+
+    # Idling over the halt time at the vehicle class's rate. An unknown halt time is not
+    # zero idling, so it stays NaN rather than reading as 0.00 kg.
+    halt_hours = df_trip['Total Halt Time'].dt.total_seconds().to_numpy(dtype='float64') / 3600
+    rate = np.full(len(df_trip), np.nan)
+    for key in EMISSION_FACTORS:
+        rate[(type_key == key) & running_valid] = idling.get(key, 0.0)
+    idle_co2e = rate * halt_hours
+    df_results['Halt Time (h)'] = round_like_python(halt_hours, 2)
+    df_results['Idling CO2e (kg)'] = round_like_python(idle_co2e, 2)
+    df_results['CO2e (kg)'] = round_like_python(co2e + np.where(np.isnan(halt_hours), 0.0, idle_co2e), 2)
+    return df_results[RESULT_COLUMNS + IDLING_COLUMNS]
+
+
+def compare_methodologies(df_trip, df_veh, registry, weight_estimator=None, specs=None):
+    """Side-by-side CO2e per trip under every selected methodology.
+
+    Trips are deduplicated on Assignment UID as in RESULTS.csv. Tonnage for per tonne-km
+    methodologies is the vahan unladen weight plus the estimated consignment weight, as in
+    dash_app.py; without a weight estimator those columns are NaN.
+    """
+    # Per-gas masses are not CO2e methodologies, so they are only compared when asked for
+    specs = specs or [spec for spec in registry.methodologies()
+                      if spec.partition('@')[0] not in GAS_METHODOLOGIES.values()]
+    df_trip = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first')
+    veh_no = df_trip['Current Vehicle No.']
+    veh_type, _, type_key, extra = vehicle_lookup(veh_no, df_veh, columns=['details.rc_unld_wt'])
+    distance, _ = _parse_distance(df_trip['Distance Covered'])
+
+    tonnes = None
+    if weight_estimator is not None and 'Consignment' in df_trip.columns:
+        unladen = pd.to_numeric(pd.Series(extra['details.rc_unld_wt']), errors='coerce').fillna(0).to_numpy()
+        load = weight_estimator.estimate(df_trip['Consignment'], df_trip.get('Quantity')).to_numpy()
+        tonnes = (unladen + load) / 1000
+
+    comparison = pd.DataFrame({
+        'Trip ID': df_trip['Assignment UID'].to_numpy(),
+        'Vehicle No.': veh_no.to_numpy(),
+        'Vehicle Type': veh_type,
+        'Running Distance (km)': distance,
+        'Total Weight (tonnes)': tonnes if tonnes is not None else np.nan,
+    })
+    return pd.concat([comparison, registry.evaluate(type_key, distance, tonnes, specs)], axis=1)
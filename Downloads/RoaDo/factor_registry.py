@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_FILE = os.path.join(MODULE_DIR, 'emission_factors.csv')  # bundled; --factors replaces it
+VEHICLE_TYPES = ['LGV', 'MGV', 'HGV']
+ANY_VEHICLE = '*'
+
+# unit -> (activity the factor multiplies, scale to kg CO2e)
+UNITS = {
+    'kg/km': ('km', 1.0),
+    'g/tonne-km': ('tonne-km', 0.001),
+}
+ACTIVITIES = ['km', 'tonne-km']
+
+
+class FactorRegistry:
+    # Emission methodologies as data: one row per (methodology, version, vehicle type)
+    # with a factor, its unit and an uplift. '*' as vehicle type applies the factor to
+    # every trip, including vehicles of unknown category. A methodology is referred to by
+    # name (its latest version) or as "name@version".
+
+    def __init__(self, table):
+        table = table.copy()
+        table['version'] = table['version'].astype(int)
+        table['vehicle_type'] = table['vehicle_type'].astype(str).str.upper()
+        table['uplift'] = table['uplift'].fillna(1.0).astype(float)
+        unknown = set(table['unit']) - set(UNITS)
+        if unknown:
+            raise ValueError(f"Unknown factor units {sorted(unknown)}; expected one of {sorted(UNITS)}")
+        bad_types = set(table['vehicle_type']) - set(VEHICLE_TYPES) - {ANY_VEHICLE}
+        if bad_types:
+            raise ValueError(f"Unknown vehicle types {sorted(bad_types)}")
+        duplicated = table.duplicated(subset=['methodology', 'version', 'vehicle_type'])
+        if duplicated.any():
+            raise ValueError(f"Duplicate factors:\n{table[duplicated]}")
+        mixed = table.groupby(['methodology', 'version'])['unit'].nunique() > 1
+        if mixed.any():
+            raise ValueError(f"Methodologies mixing units: {list(mixed[mixed].index)}")
+        self.table = table
+
+    @classmethod
+    def from_file(cls, path=REGISTRY_FILE):
+        return cls(pd.read_csv(path))
+
+    def methodologies(self):
+        # Latest version of every methodology, in file order
+        latest = self.table.groupby('methodology', sort=False)['version'].max()
+        return [f"{name}@{version}" for name, version in latest.items()]
+
+    def resolve(self, spec):
+        name, _, version = spec.partition('@')
+        versions = self.table.loc[self.table['methodology'] == name, 'version']
+        if versions.empty:
+            raise KeyError(f"Unknown methodology {name!r}; known: {', '.join(self.methodologies())}")
+        version = int(version) if version else int(versions.max())
+        if version not in set(versions):
+            raise KeyError(f"{name!r} has no version {version}; known: {sorted(set(versions))}")
+        return name, version
+
+    def rows(self, spec):
+        name, version = self.resolve(spec)
+        return self.table[(self.table['methodology'] == name) & (self.table['version'] == version)]
+
+    def factors(self, spec):
+        """{vehicle type: factor x uplift} in the methodology's own unit."""
+        rows = self.rows(spec)
+        return {t: float(f) for t, f in zip(rows['vehicle_type'], rows['factor'] * rows['uplift'])}
+
+    def config(self, specs=None):
+        # For cache keys: the factor rows of the selected methodologies
+        specs = specs or self.methodologies()
+        rows = pd.concat([self.rows(spec) for spec in specs])
+        payload = rows[['methodology', 'version', 'vehicle_type', 'factor', 'unit', 'uplift']].to_json(orient='records')
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def factor_matrix(self, specs):
+        # -> (kg CO2e per activity unit, shape (len(VEHICLE_TYPES) + 1, len(specs)); last row is
+        #     the unknown category) and the activity index of each methodology
+        matrix = np.full((len(VEHICLE_TYPES) + 1, len(specs)), np.nan)
+        activity = np.empty(len(specs), dtype=int)
+        for j, spec in enumerate(specs):
+            rows = self.rows(spec)
+            basis, scale = UNITS[rows['unit'].iloc[0]]
+            activity[j] = ACTIVITIES.index(basis)
+            for vehicle_type, factor, uplift in zip(rows['vehicle_type'], rows['factor'], rows['uplift']):
+                value = factor * uplift * scale
+                if vehicle_type == ANY_VEHICLE:
+                    matrix[np.isnan(matrix[:, j]), j] = value
+                else:
+                    matrix[VEHICLE_TYPES.index(vehicle_type), j] = value
+        return matrix, activity
+
+    def evaluate(self, type_key, distance_km, tonnes=None, specs=None):
+        """CO2e (kg) per trip for every methodology, as one trips x methodologies array pass.
+
+        type_key is LGV/MGV/HGV or None per trip; tonnes (vehicle + load) is only needed
+        by per tonne-km methodologies and gives NaN for them when missing.
+        """
+        specs = ['%s@%d' % self.resolve(spec) for spec in specs] if specs else self.methodologies()
+        matrix, activity = self.factor_matrix(specs)
+        codes = pd.Series(type_key, dtype=object).map({t: i for i, t in enumerate(VEHICLE_TYPES)})
+        codes = codes.fillna(len(VEHICLE_TYPES)).to_numpy(dtype=int)
+        distance_km = np.asarray(distance_km, dtype='float64')
+        tonnes = np.full(len(distance_km), np.nan) if tonnes is None else np.asarray(tonnes, dtype='float64')
+        activities = np.stack([distance_km, distance_km * tonnes])  # (activity, trip)
+        co2e = matrix[codes] * activities[activity].T                # (trip, methodology)
+        return pd.DataFrame(co2e, columns=[f"CO2e (kg) {spec}" for spec in specs])
+
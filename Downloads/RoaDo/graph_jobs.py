@@ -0,0 +1,84 @@
+import bisect
+import os
+
+import numpy as np
+
+from background_jobs import push_metrics
+from stage_timers import StageTimers
+from trip_cache import CACHE_DIR, map_frame
+
+# dash_app publishes each dataset version as <data dir>/.cache/dash_serving-<version>.arrow,
+# with its per-consignor chart totals next to it as dash_graph-<version>.arrow
+SERVING_NAME = 'dash_serving'
+GRAPH_NAME = 'dash_graph'
+GRAPH_COLUMNS = ['Graph Vehicle No.', 'Carbon Emissions (kg)']
+
+
+def graph_path(data_dir, version):
+    return os.path.join(data_dir, CACHE_DIR, f"{GRAPH_NAME}-{version}.arrow")
+
+
+def graph_frame(served):
+    # CO2e per (consignor, vehicle number as charted), sorted by both: the bars of every
+    # consignor, aggregated once per dataset version
+    return (served.groupby(['Consignor'] + GRAPH_COLUMNS[:1])[GRAPH_COLUMNS[1]]
+            .sum().reset_index())
+
+
+def consignor_rows(graph, consignor):
+    # graph_frame is sorted by consignor, so one consignor's bars are a slice found by bisection
+    consignors = graph['Consignor'].array
+    start, stop = bisect.bisect_left(consignors, consignor), bisect.bisect_right(consignors, consignor)
+    return graph.iloc[start:stop][GRAPH_COLUMNS].reset_index(drop=True)
+
+
+def message_payload(title, text):
+    return {'title': title, 'message': text}
+
+
+def bars_payload(selected_consignor, emissions):
+    # Shown to 0.1 kg, so that is all that is sent
+    return {
+        'title': f"Estimated Carbon Emissions per Vehicle for {selected_consignor}",
+        'vehicles': emissions[GRAPH_COLUMNS[0]].tolist(),
+        'co2e': np.round(emissions[GRAPH_COLUMNS[1]].to_numpy(dtype='float64'), 1).tolist(),
+    }
+
+
+def graph_job(data_dir, metrics_cache=None):
+    """The background graph callback of the app serving data_dir.
+
+    Job processes may be spawned rather than forked, so the callback shares nothing with
+    the app process but data_dir and its arguments: it maps the graph totals published
+    for the data-version it is called with and takes the selected consignor's rows, the
+    same ones dash_app.graph_payload serves in process. Its timings go to metrics_cache
+    (the job manager's cache) for the app's /metrics. This module has no import side
+    effects, so unpickling the callback is cheap.
+    """
+    def _graph(timers, set_progress, selected_consignor, data_version):
+        path = graph_path(data_dir, data_version) if data_version else None
+        if path is None or not os.path.exists(path):
+            # Not loaded yet, or superseded by a reload the page has not picked up
+            return message_payload("Loading data", "Trip data is loading; the chart will appear shortly."), 0
+        if not selected_consignor:
+            return message_payload("Please select a consignor", "Please select a consignor to view data."), 0
+
+        with timers.stage('filter', consignor=selected_consignor):
+            rows = consignor_rows(map_frame(path), selected_consignor)
+        if rows.empty:
+            return message_payload(f"No data for {selected_consignor}", f"No data available for {selected_consignor}."), 0
+        set_progress(('1', '2'))
+        with timers.stage('figure', consignor=selected_consignor):
+            payload = bars_payload(selected_consignor, rows)
+        set_progress(('2', '2'))
+        return payload, 0
+
+    def update_graph_and_table(set_progress, selected_consignor, data_version):
+        timers = StageTimers()
+        result = timers.timed_callback('update_graph_and_table')(
+            lambda selected, version: _graph(timers, set_progress, selected, version))(selected_consignor, data_version)
+        if metrics_cache is not None:
+            push_metrics(metrics_cache, timers)
+        return result
+
+    return update_graph_and_table
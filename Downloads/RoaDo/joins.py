@@ -0,0 +1,57 @@
+import warnings
+
+import pandas as pd
+
+# cardinality -> (left keys must be unique, right keys must be unique)
+CARDINALITIES = {
+    'one_to_one': (True, True),
+    'one_to_many': (True, False),
+    'many_to_one': (False, True),
+    'many_to_many': (False, False),
+}
+
+
+class JoinCardinalityError(ValueError):
+    def __init__(self, cardinality, diagnostics):
+        self.cardinality = cardinality
+        self.diagnostics = diagnostics
+        super().__init__(f"{cardinality} join violated:\n" + '\n'.join(_describe(d) for d in diagnostics))
+
+
+def _describe(diag):
+    side, key, counts = diag
+    examples = ', '.join(f"{k!r} x{n}" for k, n in counts.head(5).items())
+    return f"  {len(counts)} duplicated {key!r} values on the {side} side ({counts.sum()} rows), e.g. {examples}"
+
+
+def duplicate_keys(df, key):
+    # Non-null key values that occur more than once, with their row counts
+    keys = df[key]
+    return keys[keys.duplicated(keep=False) & keys.notna()].value_counts().rename('rows')
+
+
+def checked_merge(left, right, left_on, right_on, cardinality, how='left', on_violation='raise', **kwargs):
+    """pd.merge with a declared key cardinality.
+
+    on_violation='raise' fails with a JoinCardinalityError describing the duplicated keys;
+    'keep_first' warns with the same report and keeps the first row per duplicated key on
+    the side that must be unique. Null keys never match.
+    """
+    left_unique, right_unique = CARDINALITIES[cardinality]
+    diagnostics = []
+    for side, df, key, must_be_unique in (('left', left, left_on, left_unique), ('right', right, right_on, right_unique)):
+        if must_be_unique:
+            counts = duplicate_keys(df, key)
+            if len(counts):
+                diagnostics.append((side, key, counts))
+    if diagnostics:
+        if on_violation == 'raise':
+            raise JoinCardinalityError(cardinality, diagnostics)
+        warnings.warn(str(JoinCardinalityError(cardinality, diagnostics)), stacklevel=2)
+        if left_unique:
+            left = left.drop_duplicates(subset=[left_on], keep='first')
+        if right_unique:
+            right = right.drop_duplicates(subset=[right_on], keep='first')
+
+    right = right[right[right_on].notna()]
+    return pd.merge(left, right, left_on=left_on, right_on=right_on, how=how, **kwargs)
@@ -0,0 +1,137 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from emissions import get_type_factor
+from trip_schema import TRIP_COLUMNS, read_report
+from vehicle_registry import CATEGORY, VehicleRegistry
+
+REPORT_FILE = 'PRL-GreenkoReport-24-25.csv'
+VAHAN_FILE = 'PRLGreenko.vahans.csv'
+QUARANTINE_FILE = 'QUARANTINE.csv'
+MAX_TRIP_KM = 5000  # longer than any road trip in India (Leh to Kanyakumari is about 4,000 km)
+
+# Reason code -> what it means; a trip's flags hold one bit per code, in this order
+REASONS = {
+    'UNKNOWN_VEHICLE': 'registration number not in the vahan data or the vehicle overrides',
+    'MISSING_CATEGORY': 'vehicle has no LGV/MGV/HGV category, so no emission factor',
+    'MISSING_DISTANCE': 'Distance Covered is missing or not a number',
+    'NEGATIVE_DISTANCE': 'Distance Covered or Total Distance is below 0',
+    'ABSURD_DISTANCE': f'Distance Covered is above {MAX_TRIP_KM} km',
+    'RUNNING_EXCEEDS_TOTAL': 'Distance Covered is greater than Total Distance',
+}
+REASON_COLUMN = 'Reason Codes'
+
+
+def _km(values):
+    # Distances as floats; text that is not a number becomes NaN
+    return pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype='float64')
+
+
+def _factorized(values, known):
+    # known(value) per distinct value, spread back over all rows (missing values: known(nan))
+    codes, uniques = pd.factorize(values)
+    return np.array([known(v) for v in uniques] + [known(np.nan)], dtype=bool)[codes]
+
+
+def check_trips(found, category, running_km, total_km):
+    """Reason flags per trip (0: clean), from whole-column comparisons only.
+
+    found tells which registration numbers the registry knows and category is their vahan
+    category (or override), as VehicleRegistry.lookup returns them; distances may be text.
+    """
+    found = np.asarray(found, dtype=bool)
+    typed = _factorized(category, lambda c: get_type_factor(c) is not None)
+    running = _km(running_km)
+    total = _km(total_km)
+
+    checks = [
+        ~found,
+        found & ~typed,
+        np.isnan(running),
+        (running < 0) | (total < 0),
+        running > MAX_TRIP_KM,
+        running > total,
+    ]
+    flags = np.zeros(len(found), dtype='uint8')
+    for bit, check in enumerate(checks):
+        flags |= check.astype('uint8') << bit
+    return flags
+
+
+def check_results(df_results):
+    # The same checks on a results frame, where a vehicle the registry does not know has
+    # Vehicle Type '' and one without a category has none
+    veh_type = df_results['Vehicle Type']
+    return check_trips(_factorized(veh_type, lambda t: t != ''), veh_type,
+                       df_results['Running Distance (km)'], df_results['Total Distance (km)'])
+
+
+def reason_codes(flags):
+    # 'CODE;CODE' per trip ('' when clean), spelled out once per distinct combination
+    names = {int(f): ';'.join(code for bit, code in enumerate(REASONS) if f >> bit & 1) for f in np.unique(flags)}
+    return pd.Series(flags).map(names).to_numpy(dtype=object)
+
+
+class QualityGate:
+    """Counts flagged trips per reason code and appends them to a quarantine file.
+
+    record() takes a frame and its check_trips flags, so a chunked run calls it once per
+    chunk. The flagged rows are written as they are, with their reason codes as the last
+    column; the file gets its header even when no trip is flagged.
+    """
+
+    def __init__(self, quarantine_path=None):
+        self.path = quarantine_path
+        self.counts = np.zeros(len(REASONS), dtype='int64')
+        self.trips = 0
+        self.flagged = 0
+        self.header = True
+
+    def record(self, df, flags):
+        bad = flags != 0
+        self.trips += len(flags)
+        self.flagged += int(bad.sum())
+        self.counts += np.unpackbits(flags[bad][:, None], axis=1, bitorder='little')[:, :len(REASONS)].sum(axis=0, dtype='int64')
+        if self.path and (self.header or bad.any()):
+            df[bad].assign(**{REASON_COLUMN: reason_codes(flags[bad])}).to_csv(
+                self.path, mode='w' if self.header else 'a', header=self.header, index=False)
+            self.header = False
+        return flags
+
+    def check(self, df_results):
+        # check_results and record in one, for results frames
+        return self.record(df_results, check_results(df_results))
+
+    def summary(self):
+        return pd.DataFrame({'Reason Code': list(REASONS), 'Description': list(REASONS.values()),
+                             'Trips': self.counts})
+
+    def __str__(self):
+        lines = [f"Quality gate: {self.flagged} of {self.trips} trips flagged"
+                 + (f", written to {self.path}" if self.path else '')]
+        lines += [f"  {code}: {count}" for code, count in zip(REASONS, self.counts) if count]
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check a trip report against the vahan data and write the trips '
+                                                 'that fail to a quarantine file with reason codes.')
+    parser.add_argument('--report', default=REPORT_FILE)
+    parser.add_argument('--vahan', default=VAHAN_FILE)
+    parser.add_argument('--output', default=QUARANTINE_FILE)
+    args = parser.parse_args()
+
+    df_trip = read_report(args.report, TRIP_COLUMNS)
+    df_trip = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first')
+    info = VehicleRegistry.from_vahan([args.vahan]).lookup(df_trip['Current Vehicle No.'], [CATEGORY])
+    gate = QualityGate(args.output)
+    gate.record(df_trip, check_trips(info['found'], info[CATEGORY], df_trip['Distance Covered'],
+                                     df_trip['Total Distance']))
+    print(gate)
+    print(gate.summary().to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
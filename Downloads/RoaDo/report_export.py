@@ -0,0 +1,126 @@
+import hashlib
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+EXCEL_MAX_ROWS = 1_048_576
+WRITE_CHUNK_ROWS = 50_000
+# Workbook of the trips without a consignor
+UNKNOWN_CONSIGNOR = 'UNKNOWN_CONSIGNOR'
+
+
+def _row_chunks(data, chunk_rows=WRITE_CHUNK_ROWS):
+    # A DataFrame is sliced; anything else is taken to be an iterable of DataFrame chunks
+    if isinstance(data, pd.DataFrame):
+        for start in range(0, max(len(data), 1), chunk_rows):
+            yield data.iloc[start:start + chunk_rows]
+    else:
+        yield from data
+
+
+def write_sheet(workbook, sheet_name, data):
+    # Rows are written strictly top to bottom, which is what xlsxwriter's constant_memory
+    # mode needs to flush each row to disk as soon as the next one starts. Data past
+    # Excel's row limit rolls over to "<sheet_name> (2)", "(3)", ...
+    worksheet, columns, row, part = None, None, 0, 1
+    for chunk in _row_chunks(data):
+        if columns is None:
+            columns = list(chunk.columns)
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for record in values.itertuples(index=False, name=None):
+            if worksheet is None or row == EXCEL_MAX_ROWS:
+                name = sheet_name if part == 1 else f"{sheet_name} ({part})"
+                worksheet = workbook.add_worksheet(name[:31])
+                worksheet.write_row(0, 0, columns)
+                row, part = 1, part + 1
+            worksheet.write_row(row, 0, record)
+            row += 1
+    if worksheet is None:
+        workbook.add_worksheet(sheet_name[:31]).write_row(0, 0, columns or [])
+
+
+def export_workbook(path, results, trips=None, vehicles=None):
+    """Write the RESULTS_T workbook in constant memory; trips/vehicles are the optional raw sheets.
+
+    trips may be a DataFrame or an iterable of DataFrame chunks (e.g. pd.read_csv(..., chunksize=...)).
+    """
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True, 'nan_inf_to_errors': True})
+    try:
+        if trips is not None:
+            write_sheet(workbook, 'trip data', trips)
+        if vehicles is not None:
+            write_sheet(workbook, 'vehicle information', vehicles)
+        write_sheet(workbook, 'results', results)
+    finally:
+        workbook.close()
+
+
+def consignor_file_name(consignor):
+    if pd.isna(consignor):
+        return UNKNOWN_CONSIGNOR + '.xlsx'
+    return (re.sub(r'[^A-Za-z0-9._-]+', '_', str(consignor)).strip('._') or UNKNOWN_CONSIGNOR) + '.xlsx'
+
+
+def consignor_file_names(consignors):
+    # consignor -> file name. Names that come out the same (A/B and A B, or a case-only
+    # difference on a case-insensitive file system) all get a short hash of their
+    # consignor, so no workbook overwrites another whatever order they are written in.
+    names = {consignor: consignor_file_name(consignor) for consignor in consignors}
+    counts = pd.Series([name.lower() for name in names.values()], dtype=object).value_counts()
+    return {consignor: name if counts[name.lower()] == 1 else
+            f"{name[:-len('.xlsx')]}-{hashlib.sha256(str(consignor).encode()).hexdigest()[:8]}.xlsx"
+            for consignor, name in names.items()}
+
+
+def _groups(keys, sort):
+    indices = pd.Series(keys).groupby(keys, sort=sort, dropna=False).indices
+    return {None if pd.isna(key) else key: rows for key, rows in indices.items()}
+
+
+def _export_consignor(task):
+    path, results, trips, vehicles = task
+    export_workbook(path, results, trips, vehicles)
+    return path
+
+
+def export_per_consignor(out_dir, results, consignors, trips=None, vehicles=None, workers=None):
+    """One workbook per consignor, written in parallel by a process pool.
+
+    consignors gives the consignor of each row of results (aligned by position); rows
+    without one go to UNKNOWN_CONSIGNOR.xlsx. Only
+    about two tasks per worker are in flight at a time, so peak memory stays bounded by
+    the largest consignors rather than growing with the number of workbooks.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    results = results.reset_index(drop=True)
+    # Missing consignors are grouped under None, so results and raw trips find each other
+    groups = _groups(pd.Series(consignors).to_numpy(), sort=True)
+    trip_groups = _groups(trips['Consignor'], sort=False) if trips is not None else {}
+    file_names = consignor_file_names(groups)
+    vehicle_index = vehicles.drop_duplicates(subset=['regNo']).set_index('regNo', drop=False) if vehicles is not None else None
+
+    def tasks():
+        for consignor, rows in groups.items():
+            consignor_results = results.iloc[rows]
+            consignor_trips = trips.iloc[trip_groups.get(consignor, [])] if trips is not None else None
+            consignor_vehicles = None
+            if vehicle_index is not None:
+                used = consignor_results['Vehicle No.'].dropna().unique()
+                consignor_vehicles = vehicle_index.loc[vehicle_index.index.intersection(used)].reset_index(drop=True)
+            yield (os.path.join(out_dir, file_names[consignor]), consignor_results, consignor_trips,
+                   consignor_vehicles)
+
+    written = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for task in tasks():
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                written.extend(f.result() for f in done)
+            pending.add(pool.submit(_export_consignor, task))
+        written.extend(f.result() for f in wait(pending)[0])
+    return sorted(written)
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from emissions import IDLING_COLUMNS, RESULT_COLUMNS, compute_trip_emissions, factor_config
+from trip_cache import file_digest
+from trip_schema import DURATION_FORMATS, IDLING_TRIP_COLUMNS, parse_durations
+from vehicle_registry import VehicleRegistry
+
+STORE_FILE = 'RESULTS_STORE.arrow'
+
+# Report columns that can change a trip's results, plus the ones a daily refresh touches
+FINGERPRINT_COLUMNS = [
+    'Current Vehicle No.', 'Distance Covered', 'Total Distance', 'Assignment Status', 'Last updated',
+]
+REPORT_COLUMNS = {'Assignment UID', 'Distance Covered', 'Total Distance'} | set(FINGERPRINT_COLUMNS)
+STORE_COLUMNS = ['Seq', 'Fingerprint'] + RESULT_COLUMNS
+TEXT_COLUMNS = ['Trip ID', 'Vehicle No.', 'Vehicle Type', 'Fuel Type']
+
+
+def trip_fingerprints(df_trip):
+    # One 64-bit hash per row over FINGERPRINT_COLUMNS, plus the halt time when idling is
+    # counted. Columns are hashed in their parsed
+    # dtype; if a distance column flips between float and object across exports, every
+    # trip looks changed once, which costs a full recompute but is never wrong.
+    cols = [c for c in FINGERPRINT_COLUMNS + IDLING_TRIP_COLUMNS if c in df_trip.columns]
+    return pd.util.hash_pandas_object(df_trip[cols], index=False).to_numpy().astype('int64')
+
+
+def store_config_key(vahan_path, idling=None):
+    # A different vahan table, factor set or idling rate table invalidates every stored result
+    payload = json.dumps({'vahan': file_digest(vahan_path), 'factors': factor_config(), 'idling': idling},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load_store(store_path, config_key):
+    import pyarrow.feather as feather
+    if os.path.exists(store_path):
+        table = feather.read_table(store_path)
+        if (table.schema.metadata or {}).get(b'roado_config', b'').decode() == config_key:
+            return table.to_pandas()
+    return pd.DataFrame({col: pd.Series(dtype='int64' if col in ('Seq', 'Fingerprint') else object) for col in STORE_COLUMNS})
+
+
+def save_store(store, store_path, config_key):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    store = store.reset_index(drop=True)
+    for col in TEXT_COLUMNS:
+        store[col] = store[col].astype('string')
+    table = pa.Table.from_pandas(store, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'roado_config': config_key.encode()})
+    tmp = f"{store_path}.{os.getpid()}.tmp"
+    feather.write_feather(table, tmp)
+    os.replace(tmp, store_path)
+
+
+def update_store(report_path, vahan_path, store_path=STORE_FILE, idling=None):
+    """Recompute only new or changed trips into the results store and drop the trips the
+    report no longer has; returns (store, stats).
+
+    idling is passed to compute_trip_emissions; a store kept with other idling rates, or
+    without idling, is recomputed from scratch.
+    """
+    columns = REPORT_COLUMNS | (set(IDLING_TRIP_COLUMNS) if idling is not None else set())
+    df_trip = pd.read_csv(report_path, usecols=lambda c: c in columns, low_memory=False, encoding='utf-8',
+                          dtype={col: str for col in IDLING_TRIP_COLUMNS})
+    for col in IDLING_TRIP_COLUMNS if idling is not None else []:
+        df_trip[col] = parse_durations(df_trip[col], DURATION_FORMATS[col])
+    df_trip = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first').reset_index(drop=True)
+    vehicles = VehicleRegistry.from_vahan([vahan_path])
+
+    config_key = store_config_key(vahan_path, idling)
+    store = load_store(store_path, config_key)
+
+    fingerprints = trip_fingerprints(df_trip)
+    stored = pd.Series(store['Fingerprint'].to_numpy(), index=store['Trip ID'].astype(str))
+    previous = stored.reindex(df_trip['Assignment UID'].astype(str)).to_numpy()
+    is_new = pd.isna(previous)
+    changed = is_new | (previous != fingerprints)
+
+    df_changed = df_trip[changed]
+    updates = compute_trip_emissions(df_changed, vehicles, idling)
+    updates.insert(0, 'Fingerprint', fingerprints[changed])
+
+    # Existing trips keep their position; new ones are appended in report order
+    seq = pd.Series(store['Seq'].to_numpy(), index=store['Trip ID'].astype(str))
+    next_seq = int(seq.max()) + 1 if len(seq) else 0
+    updates.insert(0, 'Seq', seq.reindex(updates['Trip ID'].astype(str)).to_numpy())
+    new_rows = updates['Seq'].isna().to_numpy()
+    updates.loc[new_rows, 'Seq'] = np.arange(next_seq, next_seq + new_rows.sum())
+    updates['Seq'] = updates['Seq'].astype('int64')
+
+    # Trips gone from the report (cancelled or cleaned up upstream) leave the store
+    removed = ~store['Trip ID'].astype(str).isin(df_trip['Assignment UID'].astype(str)).to_numpy()
+    if removed.any():
+        store = store[~removed]
+
+    if len(updates):
+        replaced = pd.Index(store['Trip ID'].astype(str)).get_indexer(updates['Trip ID'].astype(str))
+        store = store.drop(store.index[replaced[replaced >= 0]])
+        store = pd.concat([store, updates], ignore_index=True) if len(store) else updates
+        store = store.sort_values('Seq', kind='stable')
+    if len(updates) or removed.any() or not os.path.exists(store_path):
+        save_store(store, store_path, config_key)
+
+    stats = {'trips': len(df_trip), 'new': int(is_new.sum()), 'changed': int((changed & ~is_new).sum()),
+             'removed': int(removed.sum()), 'stored': len(store)}
+    return store, stats
+
+
+def store_results(store):
+    # The RESULTS.csv view of the store, with the idling columns if it was kept with idling
+    columns = RESULT_COLUMNS + [c for c in IDLING_COLUMNS if c in store.columns]
+    return store.sort_values('Seq', kind='stable')[columns].reset_index(drop=True)
@@ -0,0 +1,224 @@
+import argparse
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from joins import checked_merge
+from trip_schema import read_report, read_results
+
+REPORT_FILE = 'PRL-GreenkoReport-24-25.csv'
+RESULTS_FILE = 'RESULTS.csv'
+CUBE_FILE = 'ROLLUP_CUBE.sqlite'
+UNKNOWN = 'unknown'
+
+# Cube dimension -> where it comes from (month: LR Date, else Trip Started At)
+DIMENSIONS = {
+    'month': 'LR Date',
+    'branch': 'Branch Name',
+    'consignor': 'Consignor',
+    'vehicle_type': 'Vehicle Type',
+    'vehicle': 'Vehicle No.',
+}
+# Additive measures; co2e_trips counts the trips that have a CO2e, for averages per trip
+MEASURES = {
+    'trips': None,
+    'co2e_trips': None,
+    'distance_km': 'Running Distance (km)',
+    'co2_kg': 'CO2 (kg)',
+    'ch4_kg': 'CH4 (kg)',
+    'n2o_kg': 'N2O (kg)',
+    'co2e_kg': 'CO2e (kg)',
+}
+PERIODS = {
+    'month': 'month',
+    'quarter': "CASE WHEN month = 'unknown' THEN month "
+               "ELSE substr(month, 1, 4) || '-Q' || ((CAST(substr(month, 6, 2) AS INTEGER) + 2) / 3) END",
+    'year': "CASE WHEN month = 'unknown' THEN month ELSE substr(month, 1, 4) END",
+}
+
+# Materialized rollup levels, coarsest first: a query reads the first level that has all
+# of its dimensions, so fleet-wide trends never touch the per-vehicle cells
+LEVELS = {
+    'cells_month': ['month'],
+    'cells_type': ['month', 'branch', 'consignor', 'vehicle_type'],
+    'cells': list(DIMENSIONS),
+}
+
+_DIMS = ', '.join(DIMENSIONS)
+_MEASURES = ', '.join(MEASURES)
+SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{d} TEXT NOT NULL' for d in dims)}, "
+    f"{', '.join(f'{m} REAL NOT NULL' for m in MEASURES)}, PRIMARY KEY ({', '.join(dims)})) WITHOUT ROWID"
+    for table, dims in LEVELS.items()
+] + [
+    f"CREATE TABLE IF NOT EXISTS trips (trip_id TEXT PRIMARY KEY, {', '.join(f'{d} TEXT' for d in DIMENSIONS)}, "
+    f"{', '.join(f'{m} REAL' for m in MEASURES)}, fingerprint INTEGER NOT NULL) WITHOUT ROWID",
+    'CREATE INDEX IF NOT EXISTS cells_vehicle ON cells (vehicle)',
+]
+# Per-update scratch tables (connection-private), cleared when the update commits
+DIFF_SCHEMA = [
+    'CREATE TEMP TABLE IF NOT EXISTS incoming (trip_id TEXT PRIMARY KEY, fingerprint INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE TEMP TABLE IF NOT EXISTS retired (trip_id TEXT PRIMARY KEY) WITHOUT ROWID',
+    f"CREATE TEMP TABLE IF NOT EXISTS changes (trip_id TEXT PRIMARY KEY, {', '.join(f'{d} TEXT' for d in DIMENSIONS)}, "
+    f"{', '.join(f'{m} REAL' for m in MEASURES)}, fingerprint INTEGER NOT NULL) WITHOUT ROWID",
+    f"CREATE TEMP TABLE IF NOT EXISTS delta ({', '.join(f'{d} TEXT' for d in DIMENSIONS)}, "
+    f"{', '.join(f'{m} REAL' for m in MEASURES)})",
+]
+DIFF_CLEANUP = [f"DELETE FROM {table}" for table in ('incoming', 'retired', 'changes', 'delta')]
+
+
+def rollup_rows(report_path, results_path):
+    """One row per trip of the results file: trip_id, the cube dimensions and measures.
+
+    Month, branch and consignor come from the report; without one (report_path None)
+    they are all unknown and the cube still holds the totals per vehicle.
+    """
+    results = read_results(results_path, ['Trip ID', 'Vehicle No.', 'Vehicle Type']
+                           + [col for col in MEASURES.values() if col])
+    if report_path is None:
+        df = results.assign(**{col: pd.Series(np.nan, index=results.index, dtype=object)
+                               for col in ['LR Date', 'Trip Started At', 'Branch Name', 'Consignor']})
+        df[['LR Date', 'Trip Started At']] = df[['LR Date', 'Trip Started At']].astype('datetime64[ns]')
+    else:
+        report = read_report(report_path, ['Assignment UID', 'LR Date', 'Trip Started At', 'Branch Name',
+                                           'Consignor'])
+        report = report.drop_duplicates(subset=['Assignment UID'], keep='first')
+        df = checked_merge(results, report, 'Trip ID', 'Assignment UID', 'many_to_one')
+
+    rows = pd.DataFrame({'trip_id': df['Trip ID'].astype(str).to_numpy()})
+    dates = df['LR Date'].fillna(df['Trip Started At'])
+    rows['month'] = dates.dt.strftime('%Y-%m').to_numpy(dtype=object)
+    for dim, col in list(DIMENSIONS.items())[1:]:
+        rows[dim] = df[col].astype(object).to_numpy()
+    for dim in DIMENSIONS:
+        rows[dim] = rows[dim].where(rows[dim].notna() & (rows[dim] != ''), UNKNOWN).astype(str)
+    rows['trips'] = 1.0
+    rows['co2e_trips'] = df['CO2e (kg)'].notna().to_numpy(dtype='float64')
+    for measure, col in MEASURES.items():
+        if col:
+            rows[measure] = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype='float64')
+    return rows
+
+
+class RollupCube:
+    # Additive measures per month x branch x consignor x vehicle type x vehicle, in SQLite.
+    # Next to the cells the cube keeps each trip's last contribution, so an update only
+    # subtracts the old and adds the new contribution of trips that are new or changed,
+    # and subtracts the contribution of trips no longer in the input. Queries sum cells,
+    # never trips.
+
+    def __init__(self, path=CUBE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+
+    def update(self, rows):
+        """Bring the cube to exactly the trips of rollup_rows(): new and changed trips are
+        folded in, trips missing from rows are taken out.
+
+        Only (trip_id, fingerprint) pairs are loaded into SQLite for the diff; the ledger
+        is joined against them there, so just the changed and removed trips' rows are
+        read back, and only the cells they touch are updated.
+
+        Returns {'trips', 'new', 'changed', 'removed', 'cells'}.
+        """
+        rows = rows.drop_duplicates(subset=['trip_id'], keep='first').reset_index(drop=True)
+        fingerprints = pd.util.hash_pandas_object(rows[list(DIMENSIONS) + list(MEASURES)], index=False)
+        rows['fingerprint'] = fingerprints.to_numpy().astype('int64')
+
+        with self._lock, self.conn:
+            for statement in DIFF_SCHEMA:
+                self.conn.execute(statement)
+            self.conn.executemany('INSERT INTO incoming (trip_id, fingerprint) VALUES (?, ?)',
+                                  zip(rows['trip_id'].tolist(), rows['fingerprint'].tolist()))
+            changed = pd.read_sql_query(
+                'SELECT incoming.trip_id, trips.trip_id IS NULL AS new FROM incoming '
+                'LEFT JOIN trips USING (trip_id) WHERE trips.fingerprint IS NOT incoming.fingerprint', self.conn)
+            # Ledger rows whose contribution is taken out: changed trips and trips gone from rows
+            self.conn.execute('INSERT INTO retired (trip_id) SELECT trip_id FROM incoming '
+                              'JOIN trips USING (trip_id) WHERE trips.fingerprint != incoming.fingerprint')
+            removed = self.conn.execute('INSERT INTO retired (trip_id) SELECT trip_id FROM trips '
+                                        'WHERE trip_id NOT IN (SELECT trip_id FROM incoming)').rowcount
+            updates = rows[rows['trip_id'].isin(changed['trip_id'])]
+            self.conn.executemany(
+                f"INSERT INTO changes (trip_id, {_DIMS}, {_MEASURES}, fingerprint) "
+                f"VALUES ({', '.join('?' * (len(DIMENSIONS) + len(MEASURES) + 2))})",
+                updates[['trip_id'] + list(DIMENSIONS) + list(MEASURES) + ['fingerprint']]
+                .astype(object).itertuples(index=False, name=None))
+
+            # Net change per cell: new contributions minus the ones they replace
+            for table, dims in LEVELS.items():
+                keys = ', '.join(dims)
+                self.conn.execute('DELETE FROM delta')
+                self.conn.execute(
+                    f"INSERT INTO delta ({keys}, {_MEASURES}) SELECT {keys}, "
+                    f"{', '.join(f'SUM({m})' for m in MEASURES)} FROM ("
+                    f"SELECT {keys}, {_MEASURES} FROM changes UNION ALL "
+                    f"SELECT {keys}, {', '.join(f'-{m}' for m in MEASURES)} FROM trips "
+                    f"WHERE trip_id IN (SELECT trip_id FROM retired)) GROUP BY {keys} "
+                    f"HAVING {' OR '.join(f'SUM({m}) != 0' for m in MEASURES)}")
+                self.conn.execute(
+                    f"INSERT INTO {table} ({keys}, {_MEASURES}) SELECT {keys}, {_MEASURES} FROM delta WHERE true "
+                    f"ON CONFLICT ({keys}) DO UPDATE SET {', '.join(f'{m} = {m} + excluded.{m}' for m in MEASURES)}")
+                self.conn.execute(f"DELETE FROM {table} WHERE ({keys}) IN (SELECT {keys} FROM delta) AND trips <= 0")
+            self.conn.execute('DELETE FROM trips WHERE trip_id IN (SELECT trip_id FROM retired)')
+            self.conn.execute(f"INSERT INTO trips (trip_id, {_DIMS}, {_MEASURES}, fingerprint) "
+                              f"SELECT trip_id, {_DIMS}, {_MEASURES}, fingerprint FROM changes")
+            cells = self.conn.execute('SELECT COUNT(*) FROM cells').fetchone()[0]
+            for statement in DIFF_CLEANUP:
+                self.conn.execute(statement)
+        is_new = changed['new'].to_numpy(dtype=bool)
+        return {'trips': len(rows), 'new': int(is_new.sum()), 'changed': int((~is_new).sum()),
+                'removed': removed, 'cells': cells}
+
+    def query(self, by=(), period=None, **filters):
+        """Measures summed over the cube, grouped by period ('month', 'quarter', 'year') and
+        the given dimensions, restricted to dimension=value filters; sorted by the groups."""
+        unknown = [d for d in list(by) + list(filters) if d not in DIMENSIONS]
+        if unknown:
+            raise KeyError(f"Unknown cube dimensions {unknown}; expected some of {list(DIMENSIONS)}")
+        table = next(t for t, dims in LEVELS.items() if set(by) | set(filters) <= set(dims))
+        groups = ([f"{PERIODS[period]} AS period"] if period else []) + list(by)
+        names = (['period'] if period else []) + list(by)
+        where = ' AND '.join(f"{d} = ?" for d in filters)
+        sql = (f"SELECT {', '.join(groups + [f'SUM({m}) AS {m}' for m in MEASURES])} FROM {table}"
+               + (f" WHERE {where}" if where else '')
+               + (f" GROUP BY {', '.join(names)} ORDER BY {', '.join(names)}" if names else ''))
+        with self._lock:
+            result = pd.read_sql_query(sql, self.conn, params=list(filters.values()))
+        result[list(MEASURES)] = result[list(MEASURES)].fillna(0)
+        return result
+
+    def summary(self, **filters):
+        # Total CO2e, average per trip (with a CO2e) and per km
+        totals = self.query(**filters).iloc[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_trip = np.float64(totals['co2e_kg']) / totals['co2e_trips']
+            per_km = np.float64(totals['co2e_kg']) / totals['distance_km']
+        return totals['co2e_kg'], per_trip, per_km
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the CO2e rollup cube from a report and its results, '
+                                                 'then print totals per period.')
+    parser.add_argument('--report', default=REPORT_FILE)
+    parser.add_argument('--results', default=RESULTS_FILE)
+    parser.add_argument('--cube', default=CUBE_FILE)
+    parser.add_argument('--period', choices=sorted(PERIODS), default='month')
+    parser.add_argument('--by', nargs='*', default=[], choices=list(DIMENSIONS), help='also group by these dimensions')
+    args = parser.parse_args()
+
+    cube = RollupCube(args.cube)
+    stats = cube.update(rollup_rows(args.report, args.results))
+    print(f"{stats['trips']} trips: {stats['new']} new, {stats['changed']} changed, {stats['removed']} removed; "
+          f"{stats['cells']} cells")
+    print(cube.query(by=args.by, period=args.period).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
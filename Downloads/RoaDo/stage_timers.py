@@ -0,0 +1,132 @@
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# metric -> (help text, bucket upper bounds)
+METRICS = {
+    'roado_stage_seconds': ('Time spent per pipeline stage', LATENCY_BUCKETS),
+    'roado_callback_seconds': ('Dash callback latency', LATENCY_BUCKETS),
+    'roado_callback_payload_bytes': ('JSON size of Dash callback responses', SIZE_BUCKETS),
+}
+
+_DISABLED = contextlib.nullcontext()
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class _Stage:
+    __slots__ = ('timers', 'labels', 'start')
+
+    def __init__(self, timers, labels):
+        self.timers = timers
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timers.observe('roado_stage_seconds', time.perf_counter() - self.start, **self.labels)
+
+
+class StageTimers:
+    # Histograms of stage and callback timings, rendered in the Prometheus text format.
+    # Disabled (the default unless ROADO_METRICS=1), stage() hands back one shared no-op
+    # context manager and timed_callback() calls straight through, so instrumented code
+    # pays a method call and nothing else.
+
+    def __init__(self, enabled=None):
+        self.enabled = os.environ.get('ROADO_METRICS', '') not in ('', '0') if enabled is None else enabled
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name, **labels):
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self, {'stage': name, **labels})
+
+    def observe(self, metric, value, **labels):
+        buckets = METRICS[metric][1]
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.counts[bisect.bisect_left(buckets, value)] += 1
+            hist.sum += value
+            hist.count += 1
+
+    def timed_callback(self, name):
+        """Decorator recording latency and response size of a Dash callback, per value of its first argument."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(selected, *args):
+                if not self.enabled:
+                    return fn(selected, *args)
+                start = time.perf_counter()
+                result = fn(selected, *args)
+                elapsed = time.perf_counter() - start
+                from plotly.utils import PlotlyJSONEncoder
+                size = len(json.dumps(result, cls=PlotlyJSONEncoder))
+                self.observe('roado_callback_seconds', elapsed, callback=name, consignor=selected)
+                self.observe('roado_callback_payload_bytes', size, callback=name, consignor=selected)
+                return result
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        # {(metric, labels): (bucket counts, sum, count)}, picklable, for merge() elsewhere
+        with self._lock:
+            return {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+
+    def merge(self, snapshot):
+        # Adds another process's snapshot(), e.g. a background job's, to these histograms
+        with self._lock:
+            for (metric, labels), (counts, total, count) in snapshot.items():
+                hist = self._histograms.get((metric, labels))
+                if hist is None:
+                    hist = self._histograms[(metric, labels)] = _Histogram(METRICS[metric][1])
+                hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                hist.sum += total
+                hist.count += count
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = []
+        for metric, (help_text, buckets) in METRICS.items():
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            for (name, labels), (counts, total, count) in sorted(snapshot.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, n in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += n
+                    lines.append(f"{metric}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{metric}_sum{_labels(labels)} {total}")
+                lines.append(f"{metric}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
@@ -0,0 +1,366 @@
+import argparse
+import functools
+import os
+
+import numpy as np
+import pandas as pd
+
+# Same file names as the real export, so every script runs unchanged inside an output directory
+REPORT_FILE = 'PRL-GreenkoReport-24-25.csv'
+VAHAN_FILE = 'PRLGreenko.vahans.csv'
+
+REPORT_SCHEMA = [
+    'SL. NO.', 'Branch Name', 'Assignment UID', 'Type', 'Consignment Note UID', 'LR No', 'LR Date', 'Consignor',
+    'Source', 'Consignee', 'Destination', 'Billed To', 'Start Type', 'Trip Started At', 'Assignment Status',
+    'Current Vehicle No.', 'Driver Name', 'Mobile', 'Carrier', 'Pickup/Place by date', 'Expected Delivery Date',
+    'Entered Source At', 'Left Source At', 'Reached At', 'Left Destination At', 'Days (Total TAT)',
+    'Total Transit Time', 'Total Run Time', 'Total Halt Time', 'Transit Status', 'Delayed/Ontime (Based on EDA)',
+    'Delay Status', 'Total Distance', 'Distance Covered', 'Distance Remaining', 'Average Speed', 'Consignment',
+    'Quantity', 'Invoice No', 'EwayBills', 'Last updated', 'Last location', 'Last updated (SIM)',
+    'Last location (SIM)', 'Last updated (FASTag)', 'Last location (FASTag)', 'Trip Completed At', 'Tracking Type',
+    'Estimated Arrival Date', 'Created At', 'Consignment Note Started At', 'Consignment Note Completed At',
+    'Trip Auto-Completed', 'Auto assigned vehicle',
+]
+
+VAHAN_SCHEMA = [
+    'regNo', 'details.rc_vch_catg', 'details.rc_vh_class_desc', 'details.rc_chasi_no', 'details.rc_eng_no',
+    'details.rc_maker_desc', 'details.rc_maker_model', 'details.rc_body_type_desc', 'details.rc_fuel_desc',
+    'details.rc_unld_wt', 'details.rc_gvw', 'details.rc_no_cyl', 'details.rc_cubic_cap', 'details.rc_seat_cap',
+    'details.rc_sleeper_cap', 'details.rc_stand_cap', 'details.rc_wheelbase', 'details.rc_permit_type',
+    'details.rc_vh_type', 'details.rc_vh_class', 'details.rc_fuel_cd', 'details.rc_maker_cd', 'details.rc_model_cd',
+]
+
+# Vehicle makes seen in the real vahan export:
+# (category, class desc, maker, model, body, unladen wt, gvw, cylinders, cc, wheelbase, maker code)
+VEHICLE_MODELS = [
+    ('HGV', 'Goods Carrier(HGV)', 'TATA MOTORS LTD', 'TATA ULTRA 1518 5L/45WB BS IV', 'TILT_CAB', 5955, 15710, 4, 5005, 4530, 86),
+    ('HGV', 'Articulated Vehicle(HGV)', 'TATA MOTORS LTD', 'TATA SIGNA 4018.S BSVI', 'ARTICULATED TRAILER', 11500, 39500, 6, 5600, 3900, 86),
+    ('HGV', 'Goods Carrier(HGV)', 'ASHOK LEYLAND LTD', 'CA1615/47 H FBL', 'HSD', 5682, 16100, 4, 5759, 4700, 35),
+    ('HGV', 'Goods Carrier(HGV)', 'TATA MOTORS LTD', 'A/TRAILER LPS4928', 'TRUCK (OPEN BODY)', 14000, 55000, 6, 5883, 3600, 86),
+    ('HGV', 'Goods Carrier(HGV)', 'ASHOK LEYLAND LTD', 'ASHOK LEYLAND 4923', 'MULTI AXLE (TRAILER)', 13900, 55000, 6, 7698, 3850, 35),
+    ('MGV', 'Goods Carrier(MGV)', 'VE COMMERCIAL VEHICLES LTD', '11.10HD H CAB HSD BSIII', 'Open', 3730, 11950, 4, 3298, 4300, 92),
+    ('LGV', 'Goods Carrier(LGV)', 'MAHINDRA & MAHINDRA LIMITED', 'BMT PLUS PS 1.2T', 'OPEN BODY', 1500, 2700, 4, 2523, 2760, 60),
+    ('LGV', 'Goods Carrier(LGV)', 'MAHINDRA & MAHINDRA LIMITED', 'BOL MAXX PUP CITY 3000 VX', 'HARD TOP', 1525, 2825, 4, 2523, 3050, 60),
+]
+CATEGORY_SHARE = {'HGV': 0.65, 'MGV': 0.2, 'LGV': 0.15}
+STATE_CODES = ['RJ', 'MH', 'GJ', 'AP', 'TN', 'KA', 'NL', 'DD', 'HR', 'MP', 'UP', 'TS']
+
+BRANCHES = [('Premier Roadlines Ltd -PRL', 'DOD'), ('Chennai', 'CHN'), ('Hyderabad', 'HYD'), ('Bhiwadi', 'BHW'),
+            ('Pune', 'PNQ'), ('Kolkata', 'CCU'), ('Indore', 'IDR')]
+CONSIGNORS = [
+    'GREENKO DND WIND POWER PRIVATE LIMITED', 'Greenko Renewable Power Private Limited',
+    'GREENKO MAMATKHEDA WIND PVT.LTD.', 'GREENKO RAYALA WIND POWER PRIVATE LIMITED',
+    'GREENKO SIRONJ WIND POWER PRIVATE LIMITED',
+] + [f'GREENKO {name} WIND POWER PRIVATE LIMITED' for name in (
+    'BAGEWADI', 'ANANTAPUR', 'PRATAPGARH', 'MANDSAUR', 'ERODE', 'DEVARAHIPPARIGI', 'BIJAPUR', 'TIRUPATI', 'KURNOOL',
+    'JAISALMER', 'KUTCH', 'SATARA', 'DHULE', 'GADAG', 'DAVANGERE', 'CHITRADURGA', 'THOOTHUKUDI', 'TIRUNELVELI',
+    'RATLAM', 'DEWAS', 'NANDYAL', 'KADAPA', 'BELLARY', 'KOPPAL', 'SANGLI')]
+CONSIGNEES = [
+    'REGEN POWERTECH PVT LTD', 'REGEN INFRASTRUCTURE AND SERVICES PRIVATE LIMITED',
+    'GREENKO BAGEWADI IND ENERGIES PRIVATE LIMITED', 'TD POWER SYSTEMS LIMITED', 'Hitachi Energy India Limited',
+    'CORAL REWINDING INDIA PRIVATE LIMITED', 'DEVARAHIPPARIGI WIND POWER PRIVATE LIMITED',
+]
+PLACES = [
+    'Rajasthan, 312605', 'Dist Pratapgarh, 312619', 'Mandsaur, 458667', 'ANANTAPUR, 515751', 'Thoothukudi, 628401',
+    'ANDRA PRADESH, 524121', 'Tirupathi District, 524121', 'Bijapur District, 586203', 'Bengaluru Rural, 562111',
+    'Vadodara, 390013', 'ERODE, 638107', 'Shivanagi village,Bijapur, 586127',
+]
+LOCATIONS = [
+    'Begur, Bommanahalli Zone, Bengaluru, Bangalore South, Bangalore Urban, Karnataka, 560100, India',
+    'Vichoor - Echanguli Road, CMWSSB Division 16, Ward 16, Zone 2 Manali, Vellankulam, Ponneri, Thiruvallur '
+    'District, Tamil Nadu, 600103, India',
+    'NH16, Doravarisatram, Tirupati, Andhra Pradesh, 524121, India',
+    'NH48, Vadodara, Gujarat, 390013, India',
+    'Perundurai, Erode, Tamil Nadu, 638107, India',
+]
+DRIVERS = ['surender dubey', 'hcf', 'ramesh kumar', 'mahesh yadav', 'abdul rahman', 'suresh babu', 'vijay singh',
+           'manoj patel', 'raju', 'kiran']
+CARRIERS = ['airtel', 'jio', 'vi', 'bsnl']
+
+# Consignment descriptions modelled on the real export, with the quantity they ship with.
+# {n} is filled with a serial number so descriptions have realistic cardinality.
+CONSIGNMENT_TEMPLATES = [
+    ('Failed Wind Electricity Generator-S.No.DWG:30.04.{n}-30', '1 NOS', 8),
+    ('Failed Wind Electricity Generator-S.No.DWG: 30.04.{n}-30', '1 NOS', 4),
+    ('Converter control module(CCV)', '6 NOS', 3),
+    ('Contactor 400V 24VDC Siem 3RT{n}AB36\nIGBT Stack SKiip  4 with Fuse Air Cooled\nNH on Load Isolator 1Q4 1Q3\n'
+     'Profibus Master Interface', '1 Nos\n10 Nos\n1 Nos\n1 Nos', 2),
+    ('Gear Box Internal Allied Component G{n}', '1 NOS', 5),
+    ('ABB GENERATOR', '1 NOS', 4),
+    ('Dry Type Transformer', '1 NOS', 4),
+    ('Generator', '1 Nos', 6),
+    ('SKY LIFT', '1 NOS', 2),
+    ('Blade Set {n}', '3 NOS', 4),
+    ('Tower Section T{n}', '1 NOS', 3),
+    ('Hub Assembly', '1 NOS', 2),
+    ('Spares {n} NOS', '1 Nos', 1),
+]
+CONSIGNMENT_VARIANTS = 400
+
+FY_START = pd.Timestamp('2024-04-01')
+HORIZON_DAYS = 400                 # LR dates span the FY; trips can finish a few weeks later
+DUPLICATE_TRIP_SHARE = 0.005       # report rows repeating an earlier Assignment UID
+UNREGISTERED_VEHICLE_SHARE = 0.03  # vehicles with no vahan record
+DUPLICATE_VAHAN_SHARE = 0.01       # regNo listed twice in the vahan export
+TRIPS_PER_VEHICLE = 40
+VEHICLE_ACTIVITY_SIGMA = 0.8       # lognormal spread of trips per vehicle
+
+
+def parse_size(text):
+    # "10k", "1M", "10m", "2500" -> int
+    text = str(text).strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+@functools.lru_cache(maxsize=1)
+def _timestamp_table():
+    # Every minute from a day before FY_START to the end of the generated horizon, formatted once
+    ts = FY_START + pd.to_timedelta(np.arange(-1440, HORIZON_DAYS * 1440), unit='min')
+    text = [f"{mo}/{d}/{y % 100} {h}:{mi:02d}"
+            for mo, d, y, h, mi in zip(ts.month, ts.day, ts.year, ts.hour, ts.minute)]
+    return np.array(text, dtype=object)
+
+
+def format_timestamps(minutes):
+    # Minutes after FY_START -> "4/27/24 13:11" strings as in the export
+    return _timestamp_table()[np.asarray(minutes) + 1440]
+
+
+def random_codes(rng, n, alphabet, length):
+    chars = np.array(list(alphabet))
+    picks = chars[rng.integers(0, len(chars), size=(n, length))]
+    return np.array([''.join(row) for row in picks], dtype=object)
+
+
+def registration_numbers(rng, n):
+    numbers = set()
+    while len(numbers) < n:
+        k = n - len(numbers)
+        states = np.array(STATE_CODES)[rng.integers(0, len(STATE_CODES), k)]
+        rto = rng.integers(1, 60, k)
+        series = random_codes(rng, k, 'ABCDEFGHJKLMNPRSTUVWXYZ', 2)
+        serial = rng.integers(1, 10_000, k)
+        numbers.update(f"{s}{r:02d}{c}{x:04d}" for s, r, c, x in zip(states, rto, series, serial))
+    numbers.difference_update(('RJ06FC0709', 'MH03ES1467'))
+    return sorted(numbers)[:n]
+
+
+def generate_vehicles(n_vehicles, seed=0):
+    """-> (vahan DataFrame in VAHAN_SCHEMA, array of every vehicle number that runs trips).
+
+    The forced vehicles are always part of the fleet, and some vehicles have no vahan record.
+    """
+    rng = np.random.default_rng(seed)
+    fleet = np.array(['RJ06FC0709', 'MH03ES1467'] + registration_numbers(rng, max(n_vehicles - 2, 0)),
+                     dtype=object)[:max(n_vehicles, 1)]
+    fleet = fleet[rng.permutation(len(fleet))]
+    registered = fleet[rng.random(len(fleet)) >= UNREGISTERED_VEHICLE_SHARE]
+    registered = registered[~np.isin(registered, ['RJ06FC0709', 'MH03ES1467'])]
+
+    n = len(registered)
+    categories = np.array(list(CATEGORY_SHARE))
+    category = rng.choice(categories, size=n, p=list(CATEGORY_SHARE.values()))
+    model_idx = np.empty(n, dtype=int)
+    for cat in categories:
+        options = [i for i, m in enumerate(VEHICLE_MODELS) if m[0] == cat]
+        rows = category == cat
+        model_idx[rows] = rng.choice(options, size=rows.sum())
+    models = pd.DataFrame(VEHICLE_MODELS, columns=[
+        'cat', 'class_desc', 'maker', 'model', 'body', 'unld_wt', 'gvw', 'cyl', 'cc', 'wheelbase', 'maker_cd',
+    ]).iloc[model_idx].reset_index(drop=True)
+
+    vahan = pd.DataFrame({
+        'regNo': registered,
+        'details.rc_vch_catg': models['cat'],
+        'details.rc_vh_class_desc': models['class_desc'],
+        'details.rc_chasi_no': 'MA' + pd.Series(random_codes(rng, n, 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789', 15)),
+        'details.rc_eng_no': pd.Series(random_codes(rng, n, 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789', 12)),
+        'details.rc_maker_desc': models['maker'],
+        'details.rc_maker_model': models['model'],
+        'details.rc_body_type_desc': models['body'],
+        'details.rc_fuel_desc': 'DIESEL',
+        'details.rc_unld_wt': models['unld_wt'],
+        'details.rc_gvw': models['gvw'],
+        'details.rc_no_cyl': models['cyl'],
+        'details.rc_cubic_cap': models['cc'],
+        'details.rc_seat_cap': 3,
+        'details.rc_sleeper_cap': 0.0,
+        'details.rc_stand_cap': 0,
+        'details.rc_wheelbase': models['wheelbase'],
+        'details.rc_permit_type': rng.choice(['Goods Permit', 'Goods Permit [All Goods Except Prohibited]',
+                                              'National Permit'], size=n),
+        'details.rc_vh_type': 'T',
+        'details.rc_vh_class': 59,
+        'details.rc_fuel_cd': 2,
+        'details.rc_maker_cd': models['maker_cd'],
+        'details.rc_model_cd': models['model'],
+    }, columns=VAHAN_SCHEMA)
+    # The real export lists the wrong registration for the forced HGV; keep that quirk
+    quirk = pd.DataFrame([{**dict(zip(VAHAN_SCHEMA, [None] * len(VAHAN_SCHEMA))), 'regNo': 'RJ06GC0709',
+                           'details.rc_vch_catg': 'HGV', 'details.rc_fuel_desc': 'DIESEL'}])
+    duplicates = vahan.sample(frac=DUPLICATE_VAHAN_SHARE, random_state=seed)
+    vahan = pd.concat([vahan, quirk, duplicates], ignore_index=True)
+    return vahan, fleet
+
+
+def consignment_pool(rng):
+    templates = np.array([t[2] for t in CONSIGNMENT_TEMPLATES], dtype=float)
+    picks = rng.choice(len(CONSIGNMENT_TEMPLATES), size=CONSIGNMENT_VARIANTS, p=templates / templates.sum())
+    serials = rng.integers(1000, 9999, CONSIGNMENT_VARIANTS)
+    descriptions = np.array([CONSIGNMENT_TEMPLATES[i][0].format(n=s) for i, s in zip(picks, serials)], dtype=object)
+    quantities = np.array([CONSIGNMENT_TEMPLATES[i][1] for i in picks], dtype=object)
+    return descriptions, quantities
+
+
+def skewed_choice(rng, n_items, size, exponent):
+    # Zipf-like popularity over n_items (rank 1 most popular)
+    weights = 1.0 / np.arange(1, n_items + 1) ** exponent
+    return rng.choice(n_items, size=size, p=weights / weights.sum())
+
+
+def generate_report_chunk(rng, start, n, fleet, fleet_share, descriptions, quantities):
+    """Rows start+1 .. start+n of a synthetic report in REPORT_SCHEMA."""
+    seq = np.arange(start, start + n)
+    branch = rng.choice(len(BRANCHES), size=n, p=[0.4, 0.15, 0.15, 0.1, 0.1, 0.05, 0.05])
+    branch_name = np.array([b[0] for b in BRANCHES], dtype=object)[branch]
+    branch_code = np.array([b[1] for b in BRANCHES], dtype=object)[branch]
+    uid = pd.Series(seq + 1000).astype(str).to_numpy(dtype=object)
+    assignment_uid = 'A-T-' + branch_code + '-' + uid
+    # A few rows repeat the previous trip (re-exported assignments)
+    repeat = np.flatnonzero(rng.random(n) < DUPLICATE_TRIP_SHARE)
+    repeat = repeat[repeat > 0]
+    assignment_uid[repeat] = assignment_uid[repeat - 1]
+    consignor = np.array(CONSIGNORS, dtype=object)[skewed_choice(rng, len(CONSIGNORS), n, 1.0)]
+
+    lr_day = rng.integers(0, 365, n)
+    lr_min = lr_day * 1440
+    started = lr_min + rng.integers(0, 3 * 1440, n)
+    transit = rng.integers(60, 15 * 1440, n)
+    reached = started + transit
+    expected = started + rng.integers(3 * 1440, 9 * 1440, n)
+    run_time = (transit * rng.uniform(0.3, 0.7, n)).astype(int)
+    halt_time = transit - run_time
+    no_timing = rng.random(n) < 0.05
+
+    total = np.round(rng.lognormal(np.log(1200), 0.5, n), 2)
+    covered = np.round(total * rng.uniform(0.6, 1.05, n), 2)
+    covered[rng.random(n) < 0.01] = np.nan
+    remaining = np.round(np.maximum(total - np.nan_to_num(covered), 0) + rng.uniform(0, 20, n), 2)
+    speed = covered / np.maximum(run_time / 60, 1)
+
+    vehicle = fleet[rng.choice(len(fleet), size=n, p=fleet_share)].astype(object)
+    vehicle[rng.random(n) < 0.001] = None
+    consignment = skewed_choice(rng, len(descriptions), n, 0.8)
+    delayed = reached > expected
+    days_late = np.maximum((reached - expected) // 1440, 0)
+    fastag = rng.random(n) < 0.3
+
+    def text_or_dash(values, mask):
+        return np.where(mask, '-', values).astype(object)
+
+    def minutes_text(values, mask):
+        out = pd.Series(values).astype(str).to_numpy(dtype=object)
+        out[mask] = None
+        out[mask & (rng.random(n) < 0.5)] = '-'
+        return out
+
+    frame = {
+        'SL. NO.': seq + 1,
+        'Branch Name': branch_name,
+        'Assignment UID': assignment_uid,
+        'Type': 'StandAlone Trip',
+        'Consignment Note UID': 'N-T-' + branch_code + '-' + pd.Series(seq + 1046).astype(str).to_numpy(dtype=object),
+        'LR No': rng.integers(100_000, 999_999, n),
+        'LR Date': format_timestamps(lr_min),
+        'Consignor': consignor,
+        'Source': np.array(PLACES, dtype=object)[rng.integers(0, 5, n)],
+        'Consignee': np.array(CONSIGNEES, dtype=object)[rng.integers(0, len(CONSIGNEES), n)],
+        'Destination': np.array(PLACES, dtype=object)[rng.integers(5, len(PLACES), n)],
+        'Billed To': consignor,
+        'Start Type': np.where(rng.random(n) < 0.9, 'Auto Start', 'Manual Start').astype(object),
+        'Trip Started At': format_timestamps(started),
+        'Assignment Status': np.where(rng.random(n) < 0.97, 'completed', 'in-transit').astype(object),
+        'Current Vehicle No.': vehicle,
+        'Driver Name': np.array(DRIVERS, dtype=object)[rng.integers(0, len(DRIVERS), n)],
+        'Mobile': rng.integers(6_000_000_000, 9_999_999_999, n),
+        'Carrier': np.array(CARRIERS, dtype=object)[rng.integers(0, len(CARRIERS), n)],
+        'Pickup/Place by date': format_timestamps(started - 1),
+        'Expected Delivery Date': format_timestamps(expected),
+        'Entered Source At': 'Started at Source',
+        'Left Source At': text_or_dash(format_timestamps(started + rng.integers(5, 60, n)), no_timing),
+        'Reached At': format_timestamps(reached),
+        'Left Destination At': '-',
+        'Days (Total TAT)': (pd.Series(transit // 1440).astype(str) + 'days '
+                             + pd.Series(transit % 1440 // 60).astype(str) + 'hours').to_numpy(dtype=object),
+        'Total Transit Time': text_or_dash((pd.Series(transit // 60).astype(str) + 'Hr '
+                                            + pd.Series(transit % 60).astype(str) + 'min').to_numpy(dtype=object),
+                                           no_timing),
+        'Total Run Time': minutes_text(run_time, no_timing),
+        'Total Halt Time': minutes_text(halt_time, no_timing),
+        'Transit Status': 'DELIVERED',
+        'Delayed/Ontime (Based on EDA)': np.where(delayed, 'Delayed', 'On Time').astype(object),
+        'Delay Status': np.where(days_late > 0, 'Expected delivery: ' + pd.Series(days_late).astype(str)
+                                 + ' days late', '-').astype(object),
+        'Total Distance': total,
+        'Distance Covered': covered,
+        'Distance Remaining': remaining,
+        'Average Speed': text_or_dash(pd.Series(speed).map('{:.2f} km/hr'.format).to_numpy(dtype=object),
+                                      no_timing | np.isnan(speed)),
+        'Consignment': descriptions[consignment],
+        'Quantity': quantities[consignment],
+        'Invoice No': (branch_code + '/24-25/' + pd.Series(rng.integers(1, 99, n)).map('{:02d}'.format)
+                       .to_numpy(dtype=object)),
+        'EwayBills': rng.integers(700_000_000_000, 799_999_999_999, n),
+        'Last updated': format_timestamps(reached - 3),
+        'Last location': np.array(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)],
+        'Last updated (SIM)': format_timestamps(reached - 3),
+        'Last location (SIM)': np.array(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)],
+        'Last updated (FASTag)': text_or_dash(format_timestamps(reached - 120), ~fastag),
+        'Last location (FASTag)': text_or_dash(np.array(LOCATIONS, dtype=object)[rng.integers(0, len(LOCATIONS), n)],
+                                               ~fastag),
+        'Trip Completed At': format_timestamps(reached),
+        'Tracking Type': 'SIM',
+        'Estimated Arrival Date': text_or_dash(format_timestamps(expected + rng.integers(-600, 600, n)), no_timing),
+        'Created At': format_timestamps(started),
+        'Consignment Note Started At': format_timestamps(started),
+        'Consignment Note Completed At': format_timestamps(reached),
+        'Trip Auto-Completed': rng.random(n) < 0.05,
+        'Auto assigned vehicle': rng.random(n) < 0.02,
+    }
+    return pd.DataFrame(frame, columns=REPORT_SCHEMA)
+
+
+def write_dataset(out_dir, n_trips, seed=0, chunk_rows=500_000):
+    """Write a synthetic report + vahan pair under their real file names; returns the two paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    vahan, fleet = generate_vehicles(max(n_trips // TRIPS_PER_VEHICLE, 10), seed)
+    vahan_path = os.path.join(out_dir, VAHAN_FILE)
+    vahan.to_csv(vahan_path, index=False)
+
+    # A few busy trucks and a long tail, fixed per vehicle across chunks
+    activity = rng.lognormal(0, VEHICLE_ACTIVITY_SIGMA, len(fleet))
+    fleet_share = activity / activity.sum()
+    descriptions, quantities = consignment_pool(rng)
+    report_path = os.path.join(out_dir, REPORT_FILE)
+    for start in range(0, max(n_trips, 1), chunk_rows):
+        chunk = generate_report_chunk(rng, start, min(chunk_rows, n_trips - start), fleet, fleet_share,
+                                      descriptions, quantities)
+        chunk.to_csv(report_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    return report_path, vahan_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic trip report and vahan export for benchmarking.')
+    parser.add_argument('--rows', default='10k', help='report rows, e.g. 10k, 1M, 10M')
+    parser.add_argument('--out', default=None, help='output directory (default: .bench/<rows>)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    out_dir = args.out or os.path.join('.bench', args.rows.lower())
+    report_path, vahan_path = write_dataset(out_dir, parse_size(args.rows), seed=args.seed)
+    print(f"Wrote {report_path} and {vahan_path}")
+
+
+if __name__ == '__main__':
+    main()
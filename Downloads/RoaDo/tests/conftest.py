@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import write_dataset  # noqa: E402
+
+TRIPS = 3000  # enough for duplicates, unregistered vehicles and missing distances to occur
+SEED = 7
+
+
+@pytest.fixture(scope='session')
+def dataset(tmp_path_factory):
+    """A synthetic (report path, vahan path) pair, written once for the whole session."""
+    return write_dataset(str(tmp_path_factory.mktemp('data')), TRIPS, seed=SEED)
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # The scripts keep their caches (.cache, stores, cubes) under the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
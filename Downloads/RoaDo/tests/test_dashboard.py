@@ -0,0 +1,48 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from create_results_excel import REPORT_FILE, RESULTS_FILE, VAHAN_FILE, run_full
+
+pytest.importorskip('streamlit')
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+DASHBOARD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dashboard.py')
+
+
+@pytest.fixture
+def data_dir(dataset, workdir):
+    report, vahan = (shutil.copy(path, workdir / name) for path, name in zip(dataset, (REPORT_FILE, VAHAN_FILE)))
+    run_full(report, vahan, RESULTS_FILE, 'RESULTS_T.xlsx', include_raw=False)
+    return workdir
+
+
+def run_dashboard():
+    app = AppTest.from_file(DASHBOARD, default_timeout=120).run()
+    assert not app.exception, app.exception
+    return app
+
+
+def expected_metrics():
+    results = pd.read_csv(RESULTS_FILE)
+    total = results['CO2e (kg)'].sum()
+    return [f"{total:,.0f}", f"{total / results['CO2e (kg)'].notna().sum():,.1f}",
+            f"{total / results['Running Distance (km)'].fillna(0).sum():.3f}"]
+
+
+def test_summary_and_rerun(data_dir):
+    app = run_dashboard()
+    assert [m.value for m in app.metric] == expected_metrics()
+    assert not app.info
+    app.run()
+    assert not app.exception
+    assert [m.value for m in app.metric] == expected_metrics()
+
+
+def test_summary_without_the_report(data_dir):
+    os.remove(REPORT_FILE)
+    app = run_dashboard()
+    assert [m.value for m in app.metric] == expected_metrics()
+    assert 'Trends need' in app.info[0].value
@@ -0,0 +1,60 @@
+import shutil
+import time
+
+import pytest
+
+import dash_app
+from background_jobs import job_manager, pull_metrics
+from create_results_excel import run_full
+from graph_jobs import graph_job
+from stage_timers import StageTimers
+
+
+@pytest.fixture(scope='module')
+def served(dataset, tmp_path_factory):
+    # A data directory as the app serves it, with its dataset loaded and published
+    data_dir = tmp_path_factory.mktemp('served')
+    for path, name in zip(dataset, (dash_app.REPORT_FILE, dash_app.VAHAN_FILE)):
+        shutil.copy(path, data_dir / name)
+    run_full(str(data_dir / dash_app.REPORT_FILE), str(data_dir / dash_app.VAHAN_FILE),
+             str(data_dir / dash_app.RESULTS_FILE), str(data_dir / 'RESULTS_T.xlsx'), include_raw=False)
+    return str(data_dir), dash_app.load_dataset(str(data_dir))
+
+
+def selections(dataset):
+    return sorted(dataset.consignors) + [None, 'NO SUCH CONSIGNOR']
+
+
+def test_job_matches_in_process_payload(served):
+    data_dir, dataset = served
+    job = graph_job(data_dir)
+    progress = []
+    for consignor in selections(dataset):
+        assert job(progress.append, consignor, dataset.version) == dash_app.graph_payload(dataset, consignor)
+    assert progress[-2:] == [('1', '2'), ('2', '2')]
+
+
+def test_job_for_an_unpublished_version_waits_for_data(served):
+    data_dir, dataset = served
+    payload, _ = graph_job(data_dir)(lambda _: None, dataset.consignors[0], 'not-a-version')
+    assert payload == dash_app.graph_payload(None, dataset.consignors[0])[0]
+
+
+def test_job_runs_in_a_job_process_and_reports_metrics(served, tmp_path, monkeypatch):
+    pytest.importorskip('diskcache')
+    data_dir, dataset = served
+    manager = job_manager(str(tmp_path / 'jobs'), 1 << 26)
+    monkeypatch.setenv('ROADO_METRICS', '1')  # read by the job's StageTimers
+    consignor = dataset.consignors[0]
+    job_fn = manager.make_job_fn(graph_job(data_dir, manager.handle), progress=True)
+    job = manager.call_job_fn('graph', job_fn, [consignor, dataset.version], {})
+    deadline = time.monotonic() + 60
+    while not manager.result_ready('graph'):
+        assert time.monotonic() < deadline, 'graph job did not finish'
+        time.sleep(0.01)
+    assert manager.get_result('graph', job) == dash_app.graph_payload(dataset, consignor)
+
+    timers = StageTimers(enabled=True)
+    pull_metrics(manager.handle, timers)
+    assert (f'roado_callback_seconds_count{{callback="update_graph_and_table",consignor="{consignor}"}} 1'
+            in timers.render())
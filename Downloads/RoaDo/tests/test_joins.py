@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from joins import JoinCardinalityError, checked_merge
+
+TRIPS = pd.DataFrame({'Trip ID': ['T1', 'T2', 'T3', None], 'regNo': ['A', 'B', 'A', 'C']})
+VEHICLES = pd.DataFrame({'regNo': ['A', 'B', 'B', None, None], 'category': ['HGV', 'MGV', 'LGV', 'x', 'y']})
+
+
+def test_many_to_one_rejects_duplicate_right_keys():
+    with pytest.raises(JoinCardinalityError) as error:
+        checked_merge(TRIPS, VEHICLES, 'regNo', 'regNo', 'many_to_one')
+    side, key, counts = error.value.diagnostics[0]
+    # Null keys are not duplicates
+    assert (side, key, counts.to_dict()) == ('right', 'regNo', {'B': 2})
+    assert "1 duplicated 'regNo' values on the right side (2 rows)" in str(error.value)
+
+
+def test_one_to_one_reports_both_sides():
+    left = pd.DataFrame({'k': [1, 1, 2]})
+    right = pd.DataFrame({'k': [2, 2, 3]})
+    with pytest.raises(JoinCardinalityError) as error:
+        checked_merge(left, right, 'k', 'k', 'one_to_one')
+    assert [side for side, _, _ in error.value.diagnostics] == ['left', 'right']
+
+
+def test_keep_first_warns_and_keeps_the_row_count():
+    with pytest.warns(UserWarning, match='many_to_one join violated'):
+        merged = checked_merge(TRIPS, VEHICLES, 'regNo', 'regNo', 'many_to_one', on_violation='keep_first')
+    assert len(merged) == len(TRIPS)
+    assert merged['category'].tolist()[:3] == ['HGV', 'MGV', 'HGV']
+
+
+def test_null_keys_never_match():
+    right = pd.DataFrame({'k': [None, 'a'], 'v': [1, 2]})
+    merged = checked_merge(pd.DataFrame({'k': [None, 'a']}), right, 'k', 'k', 'one_to_one')
+    assert pd.isna(merged['v'].iloc[0]) and merged['v'].iloc[1] == 2
+
+
+def test_many_to_many_accepts_duplicates():
+    merged = checked_merge(TRIPS, VEHICLES, 'regNo', 'regNo', 'many_to_many')
+    assert len(merged) == 5  # T2 matches both B rows
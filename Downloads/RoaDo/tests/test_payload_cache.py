@@ -0,0 +1,45 @@
+import json
+
+from payload_cache import PayloadCache
+
+
+def payload(n):
+    return {'vehicles': ['V'] * n}
+
+
+def size(value):
+    return len(json.dumps(value))
+
+
+def test_evicts_least_recently_used_by_size():
+    cache = PayloadCache(max_bytes=3 * size(payload(10)))
+    for key in 'abc':
+        cache.put(key, payload(10))
+    cache.get('a')  # 'b' is now the least recently used
+    cache.put('d', payload(10))
+    assert cache.get('b') is None
+    assert [cache.get(key) is not None for key in 'acd'] == [True, True, True]
+    assert cache.bytes <= cache.max_bytes
+
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = PayloadCache(max_bytes=1000)
+    cache.put('a', payload(10))
+    cache.put('a', payload(20))
+    assert cache.get('a') == payload(20)
+    assert cache.bytes == size(payload(20))
+
+
+def test_oversized_values_are_returned_but_not_kept():
+    cache = PayloadCache(max_bytes=size(payload(5)))
+    cache.put('small', payload(1))
+    assert cache.put('big', payload(100)) == payload(100)
+    assert cache.get('big') is None
+    assert cache.get('small') == payload(1)
+
+
+def test_clear():
+    cache = PayloadCache(max_bytes=1000)
+    cache.put('a', payload(1))
+    cache.clear()
+    assert cache.get('a') is None and cache.bytes == 0
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from create_results_excel import run_full, stream_results
+from quality_gate import MAX_TRIP_KM, REASON_COLUMN, REASONS, QualityGate, check_trips, reason_codes
+
+
+def test_each_check_sets_its_reason():
+    found = [True, False, True, True, True, True, True]
+    category = pd.Series(['HGV', np.nan, None, 'LGV', 'MGV', 'HGV', 'HGV'])
+    running = ['10', '10', '10', 'abc', '-5', str(MAX_TRIP_KM + 1), '20']
+    total = ['10', '10', '10', '10', '10', str(MAX_TRIP_KM + 1), '15']
+    codes = reason_codes(check_trips(found, category, running, total))
+    assert list(codes) == ['', 'UNKNOWN_VEHICLE', 'MISSING_CATEGORY', 'MISSING_DISTANCE', 'NEGATIVE_DISTANCE',
+                           'ABSURD_DISTANCE', 'RUNNING_EXCEEDS_TOTAL']
+
+
+def test_reasons_combine():
+    flags = check_trips([False], pd.Series([None]), ['-1'], ['5'])
+    assert reason_codes(flags)[0] == 'UNKNOWN_VEHICLE;NEGATIVE_DISTANCE'
+
+
+def test_quarantine_has_a_header_when_nothing_is_flagged():
+    df = pd.DataFrame({'Trip ID': ['T1']})
+    gate = QualityGate('QUARANTINE.csv')
+    gate.record(df, np.zeros(1, dtype='uint8'))
+    assert list(pd.read_csv('QUARANTINE.csv').columns) == ['Trip ID', REASON_COLUMN]
+    assert gate.flagged == 0 and gate.trips == 1
+
+
+def test_quarantine_rows_of_a_full_run(dataset):
+    gate = QualityGate('QUARANTINE.csv')
+    results = run_full(*dataset, 'RESULTS.csv', 'RESULTS_T.xlsx', include_raw=False, gate=gate)
+    quarantine = pd.read_csv('QUARANTINE.csv')
+    # Synthetic data has unregistered vehicles and missing distances, so something is flagged
+    assert 0 < len(quarantine) == gate.flagged < len(results)
+    assert quarantine.columns.tolist() == results.columns.tolist() + [REASON_COLUMN]
+    assert set(quarantine['Trip ID']) <= set(results['Trip ID'])
+    assert {'UNKNOWN_VEHICLE', 'MISSING_DISTANCE'} <= set(';'.join(quarantine[REASON_COLUMN]).split(';'))
+    counts = gate.summary().set_index('Reason Code')['Trips']
+    for code in REASONS:
+        assert counts[code] == quarantine[REASON_COLUMN].str.split(';').map(lambda codes: code in codes).sum()
+    # The flagged trips stay in the results
+    assert len(pd.read_csv('RESULTS.csv')) == len(results)
+
+
+def test_stream_quarantines_the_same_trips(dataset):
+    run_full(*dataset, 'RESULTS.csv', 'RESULTS_T.xlsx', include_raw=False, gate=QualityGate('FULL.csv'))
+    stream_results(*dataset, 'STREAM_RESULTS.csv', chunk_size=500, gate=QualityGate('STREAM.csv'))
+    pd.testing.assert_frame_equal(pd.read_csv('STREAM.csv'), pd.read_csv('FULL.csv'))
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from batch_runner import run_batch
+from create_results_excel import run_full, run_incremental, stream_results
+from emissions import load_idling_factors
+from results_store import update_store
+
+
+def read(path):
+    return pd.read_csv(path, low_memory=False)
+
+
+def edited_report(report_path, out_path, drop=(), distances=None):
+    # The report without the rows at positions drop, with new Distance Covered values
+    df = pd.read_csv(report_path, dtype=str, keep_default_na=False)
+    for position, km in (distances or {}).items():
+        df.loc[position, 'Distance Covered'] = km
+    df.drop(index=list(drop)).to_csv(out_path, index=False)
+    return str(out_path)
+
+
+@pytest.fixture(scope='module')
+def full_results(dataset, tmp_path_factory):
+    out = tmp_path_factory.mktemp('full')
+    run_full(*dataset, str(out / 'RESULTS.csv'), str(out / 'RESULTS_T.xlsx'), include_raw=False)
+    return read(out / 'RESULTS.csv')
+
+
+def test_stream_matches_full(dataset, full_results):
+    # Small chunks, so duplicate trips straddle chunk boundaries
+    stream_results(*dataset, 'RESULTS.csv', chunk_size=500)
+    pd.testing.assert_frame_equal(read('RESULTS.csv'), full_results)
+
+
+def test_incremental_matches_full(dataset, full_results):
+    stats = run_incremental(*dataset, 'RESULTS.csv', 'RESULTS_STORE.arrow')
+    assert stats['new'] == stats['stored'] == len(full_results)
+    pd.testing.assert_frame_equal(read('RESULTS.csv'), full_results)
+
+    stats = run_incremental(*dataset, 'RESULTS.csv', 'RESULTS_STORE.arrow')
+    assert (stats['new'], stats['changed'], stats['removed']) == (0, 0, 0)
+    pd.testing.assert_frame_equal(read('RESULTS.csv'), full_results)
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_batch_matches_full(dataset, full_results, workers):
+    # With one report file and several workers the report is cut into byte ranges
+    results, _ = run_batch([dataset[0]], [dataset[1]], workers=workers)
+    results.to_csv('RESULTS.csv', index=False)
+    pd.testing.assert_frame_equal(read('RESULTS.csv'), full_results)
+
+
+def test_store_drops_removed_and_recomputes_changed_trips(dataset, workdir):
+    update_store(*dataset, 'RESULTS_STORE.arrow')
+    report = edited_report(dataset[0], workdir / 'report.csv', drop=range(0, 300, 3), distances={1: '12.5', 4: '7'})
+    store, stats = update_store(report, dataset[1], 'RESULTS_STORE.arrow')
+
+    expected = run_full(report, dataset[1], 'FULL.csv', 'FULL.xlsx', include_raw=False)
+    assert stats['removed'] == len(set(read(dataset[0])['Assignment UID'])) - len(expected)
+    assert stats['changed'] == 2
+    assert stats['stored'] == len(store) == len(expected)
+    assert set(store['Trip ID']) == set(expected['Trip ID'])
+
+    run_incremental(report, dataset[1], 'RESULTS.csv', 'RESULTS_STORE.arrow')
+    by_trip = read('RESULTS.csv').set_index('Trip ID').sort_index()
+    pd.testing.assert_frame_equal(by_trip, read('FULL.csv').set_index('Trip ID').sort_index())
+
+
+def test_incremental_counts_idling(dataset):
+    idling = load_idling_factors()
+    run_incremental(*dataset, 'RESULTS.csv', 'RESULTS_STORE.arrow', idling=idling)
+    run_full(*dataset, 'FULL.csv', 'FULL.xlsx', include_raw=False, idling=idling)
+    assert 'Idling CO2e (kg)' in read('RESULTS.csv').columns
+    pd.testing.assert_frame_equal(read('RESULTS.csv'), read('FULL.csv'))
+
+    # Switching idling off recomputes the store without it
+    stats = run_incremental(*dataset, 'RESULTS.csv', 'RESULTS_STORE.arrow')
+    assert stats['new'] == stats['stored']
+    assert 'Idling CO2e (kg)' not in read('RESULTS.csv').columns
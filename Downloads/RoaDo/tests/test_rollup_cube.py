@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from create_results_excel import run_full
+from rollup_cube import LEVELS, MEASURES, UNKNOWN, RollupCube, rollup_rows
+
+
+@pytest.fixture
+def results(dataset, workdir):
+    run_full(*dataset, 'RESULTS.csv', 'RESULTS_T.xlsx', include_raw=False)
+    return pd.read_csv('RESULTS.csv')
+
+
+def cells(cube):
+    # Every materialized level, in a comparable order
+    return {table: pd.read_sql_query(f"SELECT * FROM {table} ORDER BY {', '.join(dims)}", cube.conn)
+            for table, dims in LEVELS.items()}
+
+
+def assert_same_cells(cube, expected):
+    for table, frame in cells(expected).items():
+        pd.testing.assert_frame_equal(cells(cube)[table], frame, check_exact=False, rtol=1e-9)
+
+
+def test_totals_match_the_results(dataset, results):
+    cube = RollupCube('cube.sqlite')
+    stats = cube.update(rollup_rows(dataset[0], 'RESULTS.csv'))
+    assert stats['new'] == stats['trips'] == len(results)
+    total = cube.query().iloc[0]
+    assert total['trips'] == len(results)
+    assert total['co2e_kg'] == pytest.approx(results['CO2e (kg)'].sum())
+    by_type = cube.query(by=['vehicle_type']).set_index('vehicle_type')['co2e_kg']
+    expected = results.groupby(results['Vehicle Type'].fillna(UNKNOWN))['CO2e (kg)'].sum()
+    pd.testing.assert_series_equal(by_type, expected, check_names=False)
+
+
+def test_update_removes_and_replaces_trips(dataset, results):
+    cube = RollupCube('cube.sqlite')
+    cube.update(rollup_rows(dataset[0], 'RESULTS.csv'))
+    assert cube.update(rollup_rows(dataset[0], 'RESULTS.csv'))['new'] == 0
+
+    edited = results.drop(index=range(0, 600, 4)).copy()
+    edited.loc[[1, 2, 3], 'CO2e (kg)'] += 100
+    edited.to_csv('EDITED.csv', index=False)
+    rows = rollup_rows(dataset[0], 'EDITED.csv')
+    stats = cube.update(rows)
+    assert (stats['new'], stats['changed'], stats['removed']) == (0, 3, 150)
+
+    fresh = RollupCube('fresh.sqlite')
+    fresh.update(rows)
+    assert_same_cells(cube, fresh)
+    assert cube.query().iloc[0]['co2e_kg'] == pytest.approx(edited['CO2e (kg)'].sum())
+
+    # And back: the removed trips return, the changed ones revert
+    cube.update(rollup_rows(dataset[0], 'RESULTS.csv'))
+    original = RollupCube('original.sqlite')
+    original.update(rollup_rows(dataset[0], 'RESULTS.csv'))
+    assert_same_cells(cube, original)
+
+
+def test_without_a_report_only_totals_are_known(results):
+    rows = rollup_rows(None, 'RESULTS.csv')
+    assert (rows[['month', 'branch', 'consignor']] == UNKNOWN).all().all()
+    cube = RollupCube('cube.sqlite')
+    cube.update(rows)
+    total, per_trip, per_km = cube.summary()
+    assert total == pytest.approx(results['CO2e (kg)'].sum())
+    assert per_trip == pytest.approx(total / results['CO2e (kg)'].notna().sum())
+    assert np.isfinite(per_km)
+    assert list(cube.query(period='year')['period']) == [UNKNOWN]
+    assert set(MEASURES) <= set(cube.query().columns)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from factor_registry import FactorRegistry
+from trip_schema import VEHICLE_COLUMNS, read_report, read_vahan
+from uncertainty import DEFAULT_METHODOLOGY, load_distributions, simulate
+from weights import DEFAULT_WEIGHT, WeightEstimator
+
+SAMPLES = 400
+Q_COLS = ['CO2e P5 (kg)', 'CO2e P50 (kg)', 'CO2e P95 (kg)']
+
+
+@pytest.fixture(scope='module')
+def inputs(dataset):
+    df_trip = read_report(dataset[0], ['Assignment UID', 'Current Vehicle No.', 'Distance Covered', 'Consignor',
+                                       'Consignment', 'Quantity'])
+    df_veh = read_vahan(dataset[1], VEHICLE_COLUMNS + ['details.rc_unld_wt'])
+    return df_trip, df_veh, FactorRegistry.from_file(), WeightEstimator.from_file(memo_dir=None)
+
+
+def run(inputs, dists, methodology=DEFAULT_METHODOLOGY, **kwargs):
+    df_trip, df_veh, registry, weights = inputs
+    return simulate(df_trip, df_veh, registry, dists, methodology, weights, samples=SAMPLES, **kwargs)
+
+
+@pytest.mark.parametrize('methodology', ['wri_tonne_km', 'wri_ghg_uplift'])
+def test_fixed_distributions_give_the_point_estimate(inputs, methodology):
+    # Nothing uncertain: every percentile is the point estimate, however the trips are blocked
+    for frame in run(inputs, {}, methodology, max_chunk_bytes=SAMPLES * 16 * 100):
+        for col in Q_COLS:
+            np.testing.assert_allclose(frame[col], frame['CO2e (kg)'], rtol=1e-4)
+
+
+def test_bands_are_ordered_and_reproducible(inputs):
+    dists = load_distributions()
+    first = run(inputs, dists, seed=3, max_chunk_bytes=1 << 20)
+    again = run(inputs, dists, seed=3, max_chunk_bytes=1 << 20)
+    for frame, repeat in zip(first, again):
+        pd.testing.assert_frame_equal(frame, repeat)
+        banded = frame.dropna(subset=Q_COLS)
+        assert len(banded)
+        assert (banded[Q_COLS[0]] <= banded[Q_COLS[1]]).all() and (banded[Q_COLS[1]] <= banded[Q_COLS[2]]).all()
+
+
+def test_trip_bands_come_from_the_load_draws(inputs):
+    trips, vehicles, _ = run(inputs, load_distributions())
+    # Loads are drawn per trip, so trips spread more than the shared factor and uplift alone
+    fixed_load = {key: dist for key, dist in load_distributions().items()
+                  if key[0] not in ('load', 'default_load_kg')}
+    narrow, _, _ = run(inputs, fixed_load)
+    width = (trips[Q_COLS[2]] - trips[Q_COLS[0]]) / trips['CO2e (kg)']
+    narrow_width = (narrow[Q_COLS[2]] - narrow[Q_COLS[0]]) / narrow['CO2e (kg)']
+    assert width.median() > narrow_width.median()
+    # The point estimate lies inside most trips' 90% band
+    inside = (trips[Q_COLS[0]] <= trips['CO2e (kg)']) & (trips['CO2e (kg)'] <= trips[Q_COLS[2]])
+    assert inside[trips['CO2e (kg)'].notna()].mean() > 0.8
+    assert vehicles['Trips'].sum() == len(trips)
+
+
+def test_default_load_is_centred_on_the_point_estimate():
+    kind, low, mode, high = load_distributions()[('default_load_kg', '*')]
+    assert mode == DEFAULT_WEIGHT and low < mode < high
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from vehicle_registry import CATEGORY, FUEL, VehicleRegistry, alias_numbers, load_overrides, normalize_reg_no, \
+    normalize_reg_nos
+
+SPELLINGS = ['RJ06GC0709', 'rj06gc0709', 'RJ-06-GC-0709', 'rj 06 gc 0709', ' RJ06 GC0709 ', 'RJ.06/GC.0709']
+
+
+@pytest.mark.parametrize('spelling', SPELLINGS)
+def test_spellings_normalize_to_one_key(spelling):
+    assert normalize_reg_no(spelling) == 'RJ06GC0709'
+
+
+@pytest.mark.parametrize('value', [None, np.nan, pd.NA, '', ' - '])
+def test_missing_numbers_have_no_key(value):
+    assert normalize_reg_no(value) is None
+
+
+def test_vectorized_normalization_matches():
+    values = SPELLINGS + [None, np.nan, '', 'mh03es1467']
+    assert list(normalize_reg_nos(values)) == [normalize_reg_no(v) for v in values]
+
+
+def test_aliases_apply_to_every_spelling():
+    # vehicle_overrides.csv: RJ06GC0709 is reported under RJ06FC0709
+    overrides = load_overrides()
+    numbers = alias_numbers(SPELLINGS + ['MH03ES1467', None], overrides)
+    assert numbers.tolist() == ['RJ06FC0709'] * len(SPELLINGS) + ['MH03ES1467', None]
+
+
+def test_lookup_by_any_spelling_with_overrides():
+    vahan = pd.DataFrame({'regNo': ['RJ-06-GC-0709', 'KA01AB1234'], CATEGORY: ['HGV', 'LGV'],
+                          FUEL: ['DIESEL', 'CNG'], 'details.rc_unld_wt': [9000, 1500]})
+    registry = VehicleRegistry.from_frame(vahan)
+    info = registry.lookup(['rj06gc0709', 'ka 01 ab 1234', 'MH03ES1467', 'XX00XX0000', None])
+    assert info['found'].tolist() == [True, True, True, False, False]
+    # MH03ES1467 has no vahan record, only an override
+    assert info[CATEGORY].tolist()[:3] == ['HGV', 'LGV', 'MGV']
+    assert registry.get('RJ 06 GC 0709')['details.rc_unld_wt'] == 9000
+
+
+def test_import_skips_unchanged_files_and_caches_digests_by_the_db(dataset, tmp_path):
+    db_dir = tmp_path / 'registry'
+    db_dir.mkdir()
+    registry = VehicleRegistry(str(db_dir / 'vehicles.sqlite'))
+    assert registry.import_vahan(dataset[1]) > 0
+    assert registry.import_vahan(dataset[1]) == 0
+    assert os.path.exists(db_dir / '.cache' / 'digests.json')
+    assert not os.path.exists(tmp_path / '.cache')  # the working directory
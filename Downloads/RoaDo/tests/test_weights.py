@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from trip_schema import read_report
+from weights import WeightEstimator
+
+CONSIGNMENTS = pd.Series(['ABB GENERATOR', 'Generator', 'Gear Box Internal 2 NOS', 'Dry Type Transformer',
+                          'Hub Assembly', None, 'SKY LIFT'])
+QUANTITIES = pd.Series(['1 NOS', '2 Nos', '1 NOS', '3 NOS\n1 Nos', None, '1 NOS', None])
+
+
+def test_keywords_quantities_and_defaults():
+    weight, matched = WeightEstimator.from_file(memo_dir=None).estimate(CONSIGNMENTS, QUANTITIES, with_match=True)
+    # Longest keyword first; a count in the text beats the Quantity column; the first
+    # count of a multi-line Quantity is used; no match gets the default, no description 0
+    assert weight.tolist() == [15000, 100000, 40000, 30000, 500, 0, 15000]
+    assert matched.tolist() == [True, True, True, True, False, False, True]
+
+
+def test_memo_gives_the_same_weights(dataset, workdir):
+    df = read_report(dataset[0], ['Consignment', 'Quantity'])
+    expected = WeightEstimator.from_file(memo_dir=None).estimate(df['Consignment'], df['Quantity'])
+    memoized = WeightEstimator.from_file(memo_dir=str(workdir / 'memo'))
+    cold = memoized.estimate(df['Consignment'], df['Quantity'])
+    warm = memoized.estimate(df['Consignment'], df['Quantity'])
+    pd.testing.assert_series_equal(cold, expected)
+    pd.testing.assert_series_equal(warm, expected)
+
+
+def test_memo_is_per_rule_table(workdir):
+    memo_dir = str(workdir / 'memo')
+    light = WeightEstimator({'GENERATOR': 1.0}, memo_dir=memo_dir)
+    heavy = WeightEstimator({'GENERATOR': 2.0}, memo_dir=memo_dir)
+    assert light.memo_path != heavy.memo_path
+    light.estimate(pd.Series(['GENERATOR']))
+    assert np.array_equal(heavy.estimate(pd.Series(['GENERATOR'])).to_numpy(), [2.0])
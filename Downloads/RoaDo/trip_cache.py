@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process build lock
+    fcntl = None
+
+CACHE_DIR = '.cache'
+# Bump when a builder's logic changes in a way the inputs/config do not capture
+CACHE_VERSION = 1
+
+
+def file_digest(path, cache_dir=CACHE_DIR):
+    # Content hash of an input file. Hashing a multi-GB export on every start would defeat
+    # the cache, so digests are remembered per (size, mtime) and only recomputed when the
+    # file has actually been touched.
+    stat = os.stat(path)
+    stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+    index_path = os.path.join(cache_dir, 'digests.json')
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (FileNotFoundError, ValueError):
+        index = {}
+    entry = index.get(os.path.abspath(path))
+    if entry and entry['stamp'] == stamp:
+        return entry['digest']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.hexdigest()
+    index[os.path.abspath(path)] = {'stamp': stamp, 'digest': digest}
+    os.makedirs(cache_dir, exist_ok=True)
+    _atomic_write_text(index_path, json.dumps(index))
+    return digest
+
+
+def cache_key(name, input_paths, config=None, cache_dir=CACHE_DIR):
+    h = hashlib.sha256()
+    h.update(f"{name}:{CACHE_VERSION}".encode())
+    for path in input_paths:
+        h.update(file_digest(path, cache_dir).encode())
+    h.update(json.dumps(config, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def _atomic_write_text(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _arrow_safe(df):
+    # Arrow needs one type per column; CSV-parsed object columns can mix str and numbers
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def cached_frame(name, input_paths, build, config=None, cache_dir=CACHE_DIR):
+    """Return build() for these inputs, from an Arrow IPC file keyed on input contents and config."""
+    key = cache_key(name, input_paths, config, cache_dir)
+    path = os.path.join(cache_dir, f"{name}-{key}.arrow")
+    if os.path.exists(path):
+        return pd.read_feather(path)
+
+    df = build()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    _arrow_safe(df).to_feather(tmp)
+    os.replace(tmp, path)
+    _drop_stale(name, path, cache_dir)
+    return pd.read_feather(path)
+
+
+def _drop_stale(name, path, cache_dir):
+    # Drop stale entries for the same dataset. Processes that still map an old file keep
+    # it until they let go (on Windows the removal fails and is retried next time).
+    for old in os.listdir(cache_dir):
+        if old.startswith(f"{name}-") and old.endswith(('.arrow', '.arrow.lock')) \
+                and not old.startswith(os.path.basename(path)):
+            try:
+                os.remove(os.path.join(cache_dir, old))
+            except OSError:
+                pass
+
+
+def _mappable_table(df):
+    # Uncompressed single-chunk columns that pandas can wrap without a copy. Arrow would
+    # turn float NaN into nulls, which pandas must copy back into NaN, so floats are stored
+    # as plain values; and a column split over record batches is concatenated on read.
+    df = _arrow_safe(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, col in enumerate(df.columns):
+        if df[col].dtype.kind == 'f':
+            table = table.set_column(i, col, pa.array(df[col].to_numpy(), from_pandas=False))
+    return table.combine_chunks()
+
+
+def map_frame(path):
+    """Read-only DataFrame over a memory-mapped Arrow IPC file written by cached_mapped_frame.
+
+    Numeric and string columns point into the mapping, so processes mapping the same file
+    share one copy of it in the page cache.
+    """
+    with pa.memory_map(path, 'r') as source:
+        table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+class _BuildLock:
+    # Exclusive lock file, so that of several processes needing the same entry one builds it
+    # and the others wait and then map the result
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+
+
+def cached_mapped_frame(name, input_paths, build, config=None, cache_dir=CACHE_DIR):
+    """Like cached_frame, but the entry is published once as an uncompressed Arrow file and
+    every caller gets a zero-copy memory map of it instead of a private copy."""
+    return published_frame(name, cache_key(name, input_paths, config, cache_dir), build, cache_dir)
+
+
+def published_frame(name, key, build, cache_dir=CACHE_DIR):
+    # cached_mapped_frame under a key the caller chose, e.g. one derived from another entry,
+    # so a process that only knows that key can map the file as {name}-{key}.arrow
+    path = os.path.join(cache_dir, f"{name}-{key}.arrow")
+    if os.path.exists(path):
+        return map_frame(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with _BuildLock(f"{path}.lock"):
+        if not os.path.exists(path):
+            table = _mappable_table(build())
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with ipc.new_file(tmp, table.schema) as writer:
+                writer.write_table(table)
+            del table
+            os.replace(tmp, path)
+    _drop_stale(name, path, cache_dir)
+    return map_frame(path)
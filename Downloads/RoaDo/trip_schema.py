@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from emissions import IDLING_COLUMNS, RESULT_COLUMNS
+
+# Report timestamps, e.g. 4/27/24 13:11; '-' and blanks mean not yet happened
+REPORT_DATETIME_FORMAT = '%m/%d/%y %H:%M'
+
+# Report durations: column -> the whole text, as days/hours/minutes groups. Run and halt
+# times are plain minutes (run + halt adds up to the TAT).
+DURATION_FORMATS = {
+    'Days (Total TAT)': r'(?P<days>\d+)days (?P<hours>\d+)hours',   # 12days 5hours
+    'Total Transit Time': r'(?P<hours>\d+)Hr (?P<minutes>\d+)min',  # 293Hr 30min
+    'Total Run Time': r'(?P<minutes>\d+(?:\.\d+)?)',                  # 9264
+    'Total Halt Time': r'(?P<minutes>\d+(?:\.\d+)?)',
+}
+UNIT_SECONDS = {'days': 86400, 'hours': 3600, 'minutes': 60}
+
+# Declared types of the columns the pipeline reads. The exports carry many more (free-text
+# locations, e-way bills, driver contacts); those are only read when a workbook's raw
+# sheets are exported, straight from the CSV.
+#   'key'       one value per trip, a plain string column
+#   'category'  labels repeated across rows (consignors, vehicles, branches), stored once
+#   'float'     numbers; a column with unparseable text is left as text so callers can tell
+#   'datetime'  report timestamps in REPORT_DATETIME_FORMAT, missing as NaT
+#   'duration'  text in the column's DURATION_FORMATS pattern, as timedelta64, missing as NaT
+REPORT_SCHEMA = {
+    'Branch Name': 'category',
+    'Assignment UID': 'key',
+    'LR Date': 'datetime',
+    'Consignor': 'category',
+    'Consignee': 'category',
+    'Assignment Status': 'category',
+    'Current Vehicle No.': 'category',
+    'Trip Started At': 'datetime',
+    'Left Source At': 'datetime',
+    'Reached At': 'datetime',
+    'Trip Completed At': 'datetime',
+    'Days (Total TAT)': 'duration',
+    'Total Transit Time': 'duration',
+    'Total Run Time': 'duration',
+    'Total Halt Time': 'duration',
+    'Total Distance': 'float',
+    'Distance Covered': 'float',
+    'Consignment': 'category',
+    'Quantity': 'category',
+}
+
+VAHAN_SCHEMA = {
+    'regNo': 'key',
+    'details.rc_vch_catg': 'category',
+    'details.rc_fuel_desc': 'category',
+    'details.rc_unld_wt': 'float',
+    'details.rc_gvw': 'float',
+}
+
+RESULTS_SCHEMA = {col: 'float' for col in RESULT_COLUMNS + IDLING_COLUMNS}
+RESULTS_SCHEMA.update({
+    'Trip ID': 'key',
+    'Vehicle No.': 'category',
+    'Vehicle Type': 'category',
+    'Fuel Type': 'category',
+})
+
+# What the emission calculation (compute_trip_emissions, vehicle_lookup) reads
+TRIP_COLUMNS = ['Assignment UID', 'Current Vehicle No.', 'Distance Covered', 'Total Distance']
+IDLING_TRIP_COLUMNS = ['Total Halt Time']  # also read when idling is counted
+VEHICLE_COLUMNS = ['regNo', 'details.rc_vch_catg', 'details.rc_fuel_desc']
+
+
+def _to_float(col):
+    parsed = pd.to_numeric(col, errors='coerce')
+    if (parsed.isna() & col.notna()).any():
+        return col
+    return parsed.astype('float64')
+
+
+def _take_parsed(values, parse):
+    # parse() runs once per distinct string; rows take their value by code (missing: last)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parsed = parse(pd.Series(np.asarray(uniques, dtype=object), dtype='string'))
+    return np.append(parsed, parsed[:0].dtype.type('NaT'))[codes]
+
+
+def parse_datetimes(values, fmt=REPORT_DATETIME_FORMAT):
+    """Timestamps in one explicit format as datetime64; anything else ('-', blanks) is NaT."""
+    def parse(uniques):
+        # Arrow's strptime is lenient (2/30 rolls over to 3/1, padding blanks pass), so a
+        # value is only kept if it formats back to its text, leading zeros aside
+        text = pa.array(uniques, pa.string())
+        parsed = pc.strptime(text, format=fmt, unit='s', error_is_null=True)
+        exact = pc.equal(_unpadded(pc.strftime(parsed, format=fmt)), _unpadded(text))
+        parsed = pc.if_else(exact, parsed, pa.scalar(None, parsed.type))
+        return parsed.to_numpy(zero_copy_only=False).astype('datetime64[us]')
+    return pd.Series(_take_parsed(values, parse), index=getattr(values, 'index', None))
+
+
+def _unpadded(text):
+    return pc.replace_substring_regex(text, r'(^|[^0-9])0(\d)', r'\1\2')
+
+
+def parse_durations(values, pattern):
+    """Durations matching a DURATION_FORMATS pattern as timedelta64; anything else is NaT."""
+    def parse(uniques):
+        parts = uniques.str.extract(f'^{pattern}$')
+        seconds = sum(pd.to_numeric(parts[unit], errors='coerce').to_numpy(dtype='float64') * factor
+                      for unit, factor in UNIT_SECONDS.items() if unit in parts.columns)
+        return pd.to_timedelta(seconds, unit='s').to_numpy()
+    return pd.Series(_take_parsed(values, parse), index=getattr(values, 'index', None))
+
+
+def read_typed(path, schema, columns=None):
+    """The given columns of a CSV (default: all declared in schema), parsed to their declared types.
+
+    Columns missing from the file are left out, as a full read would not have them either.
+    """
+    columns = list(schema) if columns is None else list(columns)
+    undeclared = [c for c in columns if c not in schema]
+    if undeclared:
+        raise KeyError(f"Columns without a declared type: {undeclared}")
+    header = set(pd.read_csv(path, nrows=0, encoding='utf-8').columns)
+    if hasattr(path, 'seek'):  # a file object, e.g. a byte range of a report, is read twice
+        path.seek(0)
+    columns = [c for c in columns if c in header]
+    # Timestamps and durations are read as strings and each distinct string parsed once
+    dtypes = {c: 'category' if schema[c] == 'category' else str for c in columns if schema[c] != 'float'}
+    df = pd.read_csv(path, usecols=columns, dtype=dtypes, encoding='utf-8', low_memory=False)
+    for col in columns:
+        if schema[col] == 'float':
+            df[col] = _to_float(df[col])
+        elif schema[col] == 'datetime':
+            df[col] = parse_datetimes(df[col])
+        elif schema[col] == 'duration':
+            df[col] = parse_durations(df[col], DURATION_FORMATS[col])
+    return df[columns]
+
+
+def read_report(path, columns=None):
+    return read_typed(path, REPORT_SCHEMA, columns)
+
+
+def read_vahan(path, columns=None):
+    return read_typed(path, VAHAN_SCHEMA, columns)
+
+
+def read_results(path, columns=None):
+    return read_typed(path, RESULTS_SCHEMA, columns)
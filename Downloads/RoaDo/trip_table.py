@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Dash DataTable filter_query operators, in the order they must be tried
+FILTER_OPERATORS = [
+    ['ge ', '>='],
+    ['le ', '<='],
+    ['lt ', '<'],
+    ['gt ', '>'],
+    ['ne ', '!='],
+    ['eq ', '='],
+    ['contains '],
+    ['datestartswith '],
+]
+
+
+def split_filter_part(filter_part):
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+def filter_mask(df, rows, filter_query):
+    mask = np.ones(len(rows), dtype=bool)
+    for filter_part in (filter_query or '').split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+        col = df[col_name].iloc[rows]
+        if operator in ('eq', 'ne', 'lt', 'le', 'gt', 'ge'):
+            if isinstance(filter_value, float) and not pd.api.types.is_numeric_dtype(col):
+                col = pd.to_numeric(col, errors='coerce')
+            mask &= getattr(col, operator)(filter_value).to_numpy(dtype=bool)
+        elif operator == 'contains':
+            mask &= col.astype(str).str.contains(str(filter_value), case=False, regex=False).to_numpy(dtype=bool)
+        elif operator == 'datestartswith':
+            mask &= col.astype(str).str.startswith(str(filter_value)).to_numpy(dtype=bool)
+    return mask
+
+
+class TripTableIndex:
+    # Server-side backing store for a page_action/sort_action/filter_action='custom'
+    # DataTable. Rows are grouped by consignor and a global sort order is built per
+    # column once at load, so a consignor's sorted rows are a single mask over that
+    # order. Resolved (consignor, sort, filter)
+    # row lists are kept in a small LRU so page flips only slice and serialize a page.
+
+    def __init__(self, df, columns, group_col='Consignor', max_cached_views=64, index=None):
+        # index: the arrays of build_index() for this df, e.g. memory-mapped from a file
+        # another process wrote, so they are not recomputed and held privately per process
+        self.df = df[columns].reset_index(drop=True)
+        if index is None:
+            index = self.build_index(df, columns, group_col)
+        self.codes = index['codes']
+        uniques = [value for value in df[group_col].unique() if pd.notna(value)]
+        self.group_codes = {value: code for code, value in enumerate(uniques)}
+        order = index['group_order']
+        bounds = np.searchsorted(self.codes[order], np.arange(len(uniques) + 1))
+        self.group_rows = {code: order[bounds[code]:bounds[code + 1]] for code in range(len(uniques))}
+        self._sort_orders = {col: index[f'order:{col}'] for col in self.df.columns}
+        self._column_orders = {}
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_cached_views = max_cached_views
+        for col in self.df.columns:
+            self._column_order(col)
+
+    @staticmethod
+    def build_index(df, columns, group_col='Consignor'):
+        """Group codes and per-column sort orders of df as flat arrays of len(df).
+
+        A column's order lists its non-null rows sorted, then its null rows.
+        """
+        codes, _ = pd.factorize(df[group_col].to_numpy(), use_na_sentinel=True)
+        index = {'codes': codes, 'group_order': np.argsort(codes, kind='stable')}
+        for col in columns:
+            values = df[col].reset_index(drop=True)
+            is_null = values.isna().to_numpy()
+            valid = np.flatnonzero(~is_null)
+            try:
+                order = valid[np.argsort(values.to_numpy()[valid], kind='stable')]
+            except TypeError:
+                # mixed str/number object column
+                order = valid[np.argsort(values.astype(str).to_numpy()[valid], kind='stable')]
+            index[f'order:{col}'] = np.concatenate([order, np.flatnonzero(is_null)])
+        return index
+
+    def _column_order(self, col):
+        if col not in self._column_orders:
+            order = self._sort_orders[col]
+            n_valid = len(order) - int(self.df[col].isna().sum())
+            self._column_orders[col] = (order[:n_valid], order[n_valid:])
+        return self._column_orders[col]
+
+    def group_positions(self, group):
+        code = self.group_codes.get(group)
+        return self.group_rows[code] if code is not None else np.empty(0, dtype=np.intp)
+
+    def rows(self, group, sort_by=None, filter_query=''):
+        code = self.group_codes.get(group)
+        if code is None:
+            return self.group_positions(group)
+        sort_key = tuple((s['column_id'], s['direction']) for s in (sort_by or []) if s['column_id'] in self.df.columns)
+        key = (group, sort_key, filter_query or '')
+        with self._lock:
+            if key in self._views:
+                self._views.move_to_end(key)
+                return self._views[key]
+
+        rows = self.group_rows[code]
+        if sort_key:
+            # single-column sort (sort_mode='single'); NaNs stay last in both directions
+            col, direction = sort_key[0]
+            order, null_rows = self._column_order(col)
+            if direction == 'desc':
+                order = order[::-1]
+            order = np.concatenate([order, null_rows])
+            rows = order[self.codes[order] == code]
+        if filter_query:
+            rows = rows[filter_mask(self.df, rows, filter_query)]
+
+        with self._lock:
+            self._views[key] = rows
+            if len(self._views) > self.max_cached_views:
+                self._views.popitem(last=False)
+        return rows
+
+    def page(self, group, page_current, page_size, sort_by=None, filter_query=''):
+        rows = self.rows(group, sort_by, filter_query)
+        page_count = max(1, -(-len(rows) // page_size))
+        # a new sort/filter can leave the current page past the end
+        start = min(page_current, page_count - 1) * page_size
+        return self.df.iloc[rows[start:start + page_size]], page_count
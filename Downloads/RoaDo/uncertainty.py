@@ -0,0 +1,260 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from emissions import _parse_distance, vehicle_lookup
+from factor_registry import ACTIVITIES, ANY_VEHICLE, REGISTRY_FILE, VEHICLE_TYPES, FactorRegistry
+from trip_schema import VEHICLE_COLUMNS, read_report, read_vahan
+from weights import WeightEstimator
+
+REPORT_FILE = 'PRL-GreenkoReport-24-25.csv'
+VAHAN_FILE = 'PRLGreenko.vahans.csv'
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+UNCERTAINTY_FILE = os.path.join(MODULE_DIR, 'emission_uncertainty.csv')  # bundled; --distributions replaces it
+DEFAULT_METHODOLOGY = 'wri_tonne_km'  # the app's: CO2e per tonne-km of vehicle plus estimated load
+PERCENTILES = (5, 50, 95)
+DISTRIBUTIONS = ('triangular', 'uniform', 'fixed')
+MAX_CHUNK_BYTES = 256 * 1024 * 1024  # per trips x samples block
+QUANTILE_LEVELS = 4096  # inverse-CDF table size for per-trip draws
+TRIP_GRID = 129  # fixed-share grid for per-trip percentiles
+
+
+def load_distributions(path=UNCERTAINTY_FILE):
+    # parameter,vehicle_type,distribution,low,mode,high table -> {(parameter, vehicle type): distribution}
+    dists = {}
+    for row in pd.read_csv(path).itertuples(index=False):
+        if row.distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution {row.distribution!r} for {row.parameter}; "
+                             f"expected one of {DISTRIBUTIONS}")
+        dists[(row.parameter, str(row.vehicle_type).upper())] = (
+            row.distribution, float(row.low), float(row.mode), float(row.high))
+    return dists
+
+
+def distribution(dists, parameter, vehicle_type=ANY_VEHICLE, point=1.0):
+    # A parameter without a row is not uncertain: fixed at its point value
+    return dists.get((parameter, vehicle_type)) or dists.get((parameter, ANY_VEHICLE)) or ('fixed', point, point, point)
+
+
+def sample(dist, u):
+    """Inverse-CDF draws from dist for uniforms u (keeps u's dtype and shape)."""
+    kind, low, mode, high = dist
+    if kind == 'fixed':
+        return np.full(u.shape, mode, dtype=u.dtype)
+    if kind == 'uniform':
+        return low + u * (high - low)
+    split = (mode - low) / (high - low)
+    left = low + np.sqrt(u * ((high - low) * (mode - low)))
+    right = high - np.sqrt((1 - u) * ((high - low) * (high - mode)))
+    return np.where(u < split, left, right)
+
+
+def _segments(codes):
+    # Start offsets of runs of equal values in a sorted code array
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.empty(0, dtype=int)
+
+
+def _sum_runs(values, starts, weights=None):
+    # Row sums (or weights-weighted sums) over runs starting at starts. A loop of contiguous
+    # sums is several times faster than np.add.reduceat along axis 0.
+    bounds = np.r_[starts, len(values)]
+    out = np.empty((len(starts), values.shape[1]), dtype=values.dtype)
+    for k, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        if weights is None:
+            values[a:b].sum(axis=0, out=out[k])
+        else:
+            np.dot(weights[a:b], values[a:b], out=out[k])
+    return out
+
+
+def _inverse_cdf_table(dist, levels=QUANTILE_LEVELS):
+    # Draws per trip index this table with random integers, several times cheaper than
+    # transforming uniforms and finer than the Monte Carlo error at 10k samples
+    return sample(dist, (np.arange(levels, dtype='float64') + 0.5) / levels).astype('float32')
+
+
+class _GroupSums:
+    # Per-sample CO2e totals for a small number of groups (consignors), accumulated chunk by chunk
+    def __init__(self, n_groups, samples):
+        self.sums = np.zeros((n_groups, samples))
+
+    def add(self, codes, co2e):
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        starts = _segments(codes)
+        self.sums[codes[starts]] += _sum_runs(co2e[order], starts)
+
+
+def simulate(df_trip, df_veh, registry, dists, methodology=DEFAULT_METHODOLOGY, weight_estimator=None,
+             samples=10_000, seed=0, percentiles=PERCENTILES, max_chunk_bytes=MAX_CHUNK_BYTES):
+    """Monte Carlo CO2e percentiles per trip, vehicle and consignor -> (trips, vehicles, consignors).
+
+    The methodology's factor (per vehicle category) and uplift are drawn once per sample
+    and shared by all trips, since they are uncertain for the fleet as a whole. In every
+    methodology that uses weight (per tonne-km), each trip's load is drawn per sample over
+    a trips x samples matrix, in blocks of whole vehicles of at most max_chunk_bytes, so
+    memory does not grow with the number of trips; trip, vehicle and consignor percentiles
+    are all taken from those draws. Per-km methodologies have no weight term, so only
+    their factor and uplift are drawn. The same seed and chunk size give the same bands.
+    """
+    df_trip = df_trip.drop_duplicates(subset=['Assignment UID'], keep='first').reset_index(drop=True)
+    veh_no = df_trip['Current Vehicle No.']
+    veh_type, _, type_key, extra = vehicle_lookup(veh_no, df_veh, columns=['details.rc_unld_wt'])
+    distance, _ = _parse_distance(df_trip['Distance Covered'])
+    type_codes = pd.Series(type_key, dtype=object).map({t: i for i, t in enumerate(VEHICLE_TYPES)})
+    type_codes = type_codes.fillna(len(VEHICLE_TYPES)).to_numpy(dtype=int)
+
+    spec = '%s@%d' % registry.resolve(methodology)
+    matrix, activity = registry.factor_matrix([spec])
+    uses_weight = ACTIVITIES[activity[0]] == 'tonne-km'
+
+    # Shared draws: kg CO2e per km (or tonne-km) per vehicle category and sample. Trips of
+    # a category the methodology has no factor for count as 0 in the totals, as in the
+    # point estimate.
+    shared = np.random.default_rng([seed, 0])
+    factor_mult = np.stack([sample(distribution(dists, 'factor', t), shared.random(samples))
+                            for t in VEHICLE_TYPES + [ANY_VEHICLE]])
+    uplift_mult = sample(distribution(dists, 'uplift'), shared.random(samples))
+    unit_co2e = (matrix[:, :1] * factor_mult * uplift_mult).astype('float32')
+    unit = np.nan_to_num(unit_co2e)
+    n_cat = len(unit)
+
+    consignor = df_trip['Consignor'] if 'Consignor' in df_trip.columns else pd.Series('', index=df_trip.index)
+    veh_codes, vehicles = pd.factorize(veh_no, use_na_sentinel=False)
+    con_codes, consignors = pd.factorize(consignor, use_na_sentinel=False)
+    veh_type_codes = np.zeros(len(vehicles), dtype=int)
+    veh_type_codes[veh_codes] = type_codes
+    q_cols = [f"CO2e P{p:g} (kg)" for p in percentiles]
+
+    # Per trip, CO2e = unit CO2e x (fixed + var x draw): a fixed activity (km, or tonne-km
+    # of the unladen vehicle) plus, per tonne-km, an activity proportional to a load draw
+    tonnes = None
+    if uses_weight:
+        if weight_estimator is None:
+            raise ValueError(f"{spec} is per tonne-km and needs a weight estimator")
+        load, matched = weight_estimator.estimate(df_trip['Consignment'], df_trip.get('Quantity'), with_match=True)
+        load = load.to_numpy()
+        scaled = matched | df_trip['Consignment'].isna().to_numpy()  # a missing description weighs 0
+        unladen = pd.to_numeric(pd.Series(extra['details.rc_unld_wt']), errors='coerce').fillna(0).to_numpy()
+        tonnes = (unladen + load) / 1000
+        fixed = distance * unladen / 1000
+        var = distance * np.where(scaled, load, 1.0) / 1000  # x load multiplier, or x default kg
+        load_table = _inverse_cdf_table(distribution(dists, 'load'))
+        default_table = _inverse_cdf_table(distribution(dists, 'default_load_kg', point=weight_estimator.default_weight))
+    else:
+        fixed, var = distance, np.zeros(len(distance))
+        trip_q = distance[:, None] * np.percentile(unit_co2e, percentiles, axis=1).T[type_codes]
+    missing = np.isnan(fixed) | np.isnan(var)  # no distance (or weight): no CO2e, as in the point estimate
+    fixed, var = np.nan_to_num(fixed), np.nan_to_num(var).astype('float32')
+
+    vehicle_fixed = np.bincount(veh_codes, weights=fixed, minlength=len(vehicles))
+    consignor_fixed = np.bincount(con_codes * n_cat + type_codes, weights=fixed, minlength=len(consignors) * n_cat)
+    consignor_sums = _GroupSums(len(consignors) * n_cat, samples)
+
+    if uses_weight:
+        trip_q = np.full((len(df_trip), len(percentiles)), np.nan)
+        vehicle_q = np.full((len(vehicles), len(percentiles)), np.nan)
+        # Runs of one vehicle and consignor, in whole vehicles per block so each vehicle's
+        # totals are complete when its block ends
+        order = np.lexsort((con_codes, veh_codes))
+        runs = _segments(veh_codes[order] * len(consignors) + con_codes[order])
+        vehicle_starts = _segments(veh_codes[order])
+        # About 16 bytes per trip and sample: draw indices, draws, and a trip's CO2e with the
+        # copies np.percentile makes of it
+        rows_per_block = max(1, max_chunk_bytes // (samples * 16))
+        block_starts = [0]
+        for start in vehicle_starts[1:]:
+            if start - block_starts[-1] >= rows_per_block:
+                block_starts.append(start)
+        block_bounds = block_starts + [len(order)]
+
+        for block, (lo, hi) in enumerate(zip(block_bounds[:-1], block_bounds[1:])):
+            rows = order[lo:hi]
+            idx = np.random.default_rng([seed, 1, block]).integers(
+                0, QUANTILE_LEVELS, (len(rows), samples), dtype=np.uint16)
+            draws = load_table.take(idx)
+            default_rows = np.flatnonzero(~scaled[rows])
+            if len(default_rows):
+                draws[default_rows] = default_table.take(idx[default_rows])
+            del idx
+
+            # Each trip's CO2e per sample, from the same draws as the vehicle and consignor totals
+            trip_co2e = draws * var[rows, None]
+            trip_co2e += fixed[rows, None]
+            trip_co2e *= unit_co2e[type_codes[rows]]
+            trip_q[rows] = np.percentile(trip_co2e, percentiles, axis=1).T
+            del trip_co2e
+
+            seg = runs[(runs >= lo) & (runs < hi)] - lo
+            run_sums = _sum_runs(draws, seg, weights=var[rows])
+            del draws
+            consignor_sums.add(con_codes[rows[seg]] * n_cat + type_codes[rows[seg]], run_sums)
+
+            first = vehicle_starts[(vehicle_starts >= lo) & (vehicle_starts < hi)] - lo
+            codes = veh_codes[rows[first]]
+            totals = _sum_runs(run_sums, np.searchsorted(seg, first))
+            totals += vehicle_fixed[codes, None].astype('float32')
+            totals *= unit[veh_type_codes[codes]]
+            vehicle_q[codes] = np.percentile(totals, percentiles, axis=1).T
+            del run_sums, totals
+    else:
+        # Per km, a vehicle's CO2e is its distance times its category's shared draws
+        vehicle_q = vehicle_fixed[:, None] * np.percentile(unit, percentiles, axis=1).T[veh_type_codes]
+
+    totals = consignor_sums.sums.reshape(len(consignors), n_cat, samples)
+    totals += consignor_fixed.reshape(len(consignors), n_cat, 1)
+    consignor_q = np.percentile(np.einsum('gcs,cs->gs', totals, unit), percentiles, axis=1).T
+
+    point = registry.evaluate(type_key, distance, tonnes, [spec]).iloc[:, 0].to_numpy()
+    trips = pd.DataFrame({
+        'Trip ID': df_trip['Assignment UID'].to_numpy(),
+        'Vehicle No.': veh_no.to_numpy(),
+        'Consignor': consignor.to_numpy(),
+        'Vehicle Type': veh_type,
+        'CO2e (kg)': point,
+    })
+    trip_q[missing] = np.nan
+    trips[q_cols] = trip_q.astype('float64')
+
+    def groups(codes, labels, q, key):
+        frame = pd.DataFrame({key: labels, 'Trips': np.bincount(codes, minlength=len(labels)),
+                              'CO2e (kg)': np.bincount(codes, weights=np.nan_to_num(point), minlength=len(labels))})
+        frame[q_cols] = q.astype('float64')
+        return frame
+
+    return (trips, groups(veh_codes, vehicles, vehicle_q, 'Vehicle No.'),
+            groups(con_codes, consignors, consignor_q, 'Consignor'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo CO2e uncertainty bands per trip, vehicle and consignor.')
+    parser.add_argument('--report', default=REPORT_FILE)
+    parser.add_argument('--vahan', default=VAHAN_FILE)
+    parser.add_argument('--factors', default=REGISTRY_FILE, help='factor registry')
+    parser.add_argument('--distributions', default=UNCERTAINTY_FILE,
+                        help='parameter distributions (default: the bundled emission_uncertainty.csv)')
+    parser.add_argument('--methodology', default=DEFAULT_METHODOLOGY,
+                        help='registry methodology (NAME[@VERSION]); loads are only drawn for per tonne-km ones')
+    parser.add_argument('--samples', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-chunk-mb', type=int, default=MAX_CHUNK_BYTES // (1024 * 1024),
+                        help='memory per block of trips x samples')
+    parser.add_argument('--out-prefix', default='UNCERTAINTY', help='writes <prefix>_trips/_vehicles/_consignors.csv')
+    args = parser.parse_args()
+
+    df_trip = read_report(args.report, ['Assignment UID', 'Current Vehicle No.', 'Distance Covered', 'Consignor',
+                                        'Consignment', 'Quantity'])
+    df_veh = read_vahan(args.vahan, VEHICLE_COLUMNS + ['details.rc_unld_wt'])
+    outputs = simulate(df_trip, df_veh, FactorRegistry.from_file(args.factors), load_distributions(args.distributions),
+                       args.methodology, WeightEstimator.from_file(), samples=args.samples, seed=args.seed,
+                       max_chunk_bytes=args.max_chunk_mb * 1024 * 1024)
+    for name, frame in zip(('trips', 'vehicles', 'consignors'), outputs):
+        path = f"{args.out_prefix}_{name}.csv"
+        frame.to_csv(path, index=False)
+        print(f"Wrote {len(frame)} {name} to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from trip_cache import CACHE_DIR, file_digest
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DB = 'vehicles.sqlite'
+OVERRIDES_FILE = os.path.join(MODULE_DIR, 'vehicle_overrides.csv')  # bundled; --overrides replaces it
+
+# Vahan columns kept per vehicle -> SQLite type
+FIELDS = {
+    'regNo': 'TEXT',
+    'details.rc_vch_catg': 'TEXT',
+    'details.rc_fuel_desc': 'TEXT',
+    'details.rc_unld_wt': 'REAL',
+    'details.rc_gvw': 'REAL',
+}
+CATEGORY = 'details.rc_vch_catg'
+FUEL = 'details.rc_fuel_desc'
+QUERY_BATCH = 500  # keys per IN (...) query, below SQLite's bound-parameter limit
+_COLUMNS = ', '.join(f'"{col}"' for col in FIELDS)
+_PLACEHOLDERS = ', '.join('?' * (len(FIELDS) + 2))
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS vehicles (reg_no TEXT PRIMARY KEY, '
+    + ', '.join(f'"{col}" {kind}' for col, kind in FIELDS.items()) + ', source TEXT) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, digest TEXT NOT NULL)',
+]
+
+
+def normalize_reg_no(value):
+    # Registration numbers as keys: upper case, letters and digits only ('rj-06 gc 0709'
+    # -> 'RJ06GC0709'); None for a missing or blank number
+    if not isinstance(value, str) and pd.isna(value):
+        return None
+    return re.sub(r'[^0-9A-Z]', '', str(value).upper()) or None
+
+
+def normalize_reg_nos(values):
+    # normalize_reg_no over an array, as one vectorized pass
+    keys = pd.Series(values, dtype=object).astype('string').str.upper().str.replace(r'[^0-9A-Z]', '', regex=True)
+    return keys.astype(object).where(keys.notna() & (keys != ''), None).to_numpy()
+
+
+def load_overrides(path=OVERRIDES_FILE):
+    """The override/alias table, indexed by normalized registration number.
+
+    vehicle_type/fuel_type replace the vahan category and fuel of that vehicle (or give
+    them for a vehicle vahan has no record of). alias_of names the vehicle a number is
+    reported under in per-vehicle views; the number's own record is still used.
+    """
+    table = pd.read_csv(path, dtype=str)
+    table.index = pd.Index(normalize_reg_nos(table['reg_no']), name='key')
+    duplicated = table.index.duplicated()
+    if duplicated.any():
+        raise ValueError(f"Duplicate vehicle overrides: {sorted(set(table.index[duplicated]))}")
+    return table[['reg_no', 'alias_of', 'vehicle_type', 'fuel_type']]
+
+
+def overrides_config(path=OVERRIDES_FILE):
+    # For cache keys: the override rows
+    return load_overrides(path).fillna('').to_dict('records')
+
+
+def alias_numbers(reg_nos, overrides):
+    # Each number as reported, or the number it is an alias of
+    reg_nos = pd.Series(reg_nos, dtype=object).reset_index(drop=True)
+    aliases = overrides['alias_of'].dropna()
+    target = pd.Series(normalize_reg_nos(reg_nos), dtype=object).map(aliases)
+    return reg_nos.where(target.isna(), target)
+
+
+class VehicleRegistry:
+    # Vahan records in an SQLite table keyed on the normalized registration number, so a
+    # single lookup is one primary-key probe and a bulk lookup is one IN query per batch
+    # of distinct numbers, however many vehicles the store holds. Imports keep the first
+    # record per vehicle unless told to replace. Overrides come from OVERRIDES_FILE and
+    # are applied to every lookup.
+
+    def __init__(self, path=':memory:', overrides_path=OVERRIDES_FILE):
+        self.path = path
+        self.overrides = load_overrides(overrides_path)
+        self._connect()
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.conn:
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+
+    @classmethod
+    def from_frame(cls, df_veh, overrides_path=OVERRIDES_FILE):
+        registry = cls(overrides_path=overrides_path)
+        registry.import_frame(df_veh)
+        return registry
+
+    @classmethod
+    def from_vahan(cls, paths, overrides_path=OVERRIDES_FILE):
+        # In-memory registry of vahan exports; earlier files win
+        registry = cls(overrides_path=overrides_path)
+        for path in paths:
+            registry.import_vahan(path)
+        return registry
+
+    def __getstate__(self):
+        # Worker processes open a file store by path; an in-memory one travels as its rows
+        state = {'path': self.path, 'overrides': self.overrides}
+        if self.path == ':memory:':
+            with self._lock:
+                state['rows'] = self.conn.execute('SELECT * FROM vehicles').fetchall()
+        return state
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.overrides = state['overrides']
+        self._connect()
+        if 'rows' in state:
+            with self.conn:
+                self.conn.executemany(f"INSERT INTO vehicles VALUES ({_PLACEHOLDERS})", state['rows'])
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM vehicles').fetchone()[0]
+
+    def import_frame(self, df_veh, source='', replace=False):
+        """Add the vehicles of a vahan export; returns the number of rows written.
+
+        The first record per normalized number wins within the frame. Vehicles already in
+        the store are kept, or overwritten with replace=True (a newer export).
+        """
+        keys = pd.Series(normalize_reg_nos(df_veh['regNo']), index=df_veh.index, dtype=object)
+        first = keys.notna() & ~keys.duplicated(keep='first')
+        df_veh = df_veh[first]
+        rows = pd.DataFrame({'reg_no': keys[first]})
+        for col, kind in FIELDS.items():
+            if col not in df_veh.columns:
+                rows[col] = None
+            elif kind == 'REAL':
+                rows[col] = pd.to_numeric(df_veh[col], errors='coerce')
+            else:
+                rows[col] = df_veh[col].astype('string')
+        rows['source'] = source
+        rows = rows.astype(object).where(rows.notna(), None)
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(f"{verb} INTO vehicles VALUES ({_PLACEHOLDERS})",
+                                  rows.itertuples(index=False, name=None))
+            return self.conn.total_changes - before
+
+    def import_vahan(self, path, replace=False, cache_dir=None):
+        # A file already imported with the same content is skipped. Its digest is remembered
+        # in cache_dir, by default the .cache next to the registry file (or, in memory, next
+        # to the export), wherever the caller's working directory is.
+        if cache_dir is None:
+            anchor = path if self.path == ':memory:' else self.path
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(anchor)), CACHE_DIR)
+        digest = file_digest(path, cache_dir)
+        source = os.path.abspath(path)
+        with self._lock:
+            known = self.conn.execute('SELECT digest FROM sources WHERE path = ?', (source,)).fetchone()
+        if known and known[0] == digest:
+            return 0
+        header = pd.read_csv(path, nrows=0, encoding='utf-8').columns
+        df_veh = pd.read_csv(path, usecols=[c for c in FIELDS if c in header], dtype={'regNo': str},
+                             low_memory=False, encoding='utf-8')
+        written = self.import_frame(df_veh, source, replace)
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO sources VALUES (?, ?)', (source, digest))
+        return written
+
+    def get(self, reg_no):
+        """The record of one vehicle with overrides applied, or None if neither has it."""
+        key = normalize_reg_no(reg_no)
+        if key is None:
+            return None
+        with self._lock:
+            row = self.conn.execute(f"SELECT {_COLUMNS} FROM vehicles WHERE reg_no = ?", (key,)).fetchone()
+        record = dict(zip(FIELDS, row)) if row else None
+        if key in self.overrides.index:
+            override = self.overrides.loc[key]
+            for col, value in ((CATEGORY, override['vehicle_type']), (FUEL, override['fuel_type'])):
+                if pd.notna(value):
+                    record = record or {c: None for c in FIELDS}
+                    record[col] = value
+        return record
+
+    def _keys(self, reg_nos):
+        # Position -> code into the distinct numbers (-1 for missing), and their normalized keys
+        codes, uniques = pd.factorize(pd.Series(reg_nos, dtype=object), use_na_sentinel=True)
+        return codes, pd.Index(normalize_reg_nos(uniques), dtype=object)
+
+    def _fetch(self, keys, columns):
+        select = ', '.join(['reg_no'] + [f'"{c}"' for c in columns])
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), QUERY_BATCH):
+                batch = list(keys[start:start + QUERY_BATCH])
+                rows += self.conn.execute(f"SELECT {select} FROM vehicles WHERE reg_no IN "
+                                          f"({', '.join('?' * len(batch))})", batch).fetchall()
+        return pd.DataFrame(rows, columns=['reg_no'] + list(columns), dtype=object).set_index('reg_no')
+
+    def lookup(self, reg_nos, columns=(CATEGORY, FUEL)):
+        """The given vahan columns per registration number, as a frame aligned by position.
+
+        'found' tells which numbers have a record (or an override of their category or
+        fuel); the others get NaN. Each distinct number is normalized and fetched once.
+        """
+        columns = list(columns)
+        unknown = [c for c in columns if c not in FIELDS]
+        if unknown:
+            raise KeyError(f"Vahan columns not kept in the registry: {unknown}")
+        codes, keys = self._keys(reg_nos)
+        fetched = self._fetch(keys.dropna().unique(), columns)
+        table = fetched.reindex(keys)
+        table = table.where(table.notna(), np.nan).reset_index(drop=True)
+        found = keys.isin(fetched.index)
+
+        overrides = self.overrides.reindex(keys)
+        for col, override_col in ((CATEGORY, 'vehicle_type'), (FUEL, 'fuel_type')):
+            forced = overrides[override_col].notna().to_numpy()
+            found |= forced
+            if col in table.columns:
+                table.loc[forced, col] = overrides[override_col].to_numpy()[forced]
+        table['found'] = found
+
+        # Missing numbers (code -1) take the extra, empty last row
+        table.loc[len(keys)] = [np.nan] * len(columns) + [False]
+        return table.iloc[np.where(codes < 0, len(keys), codes)].reset_index(drop=True)
+
+    def overridden(self, reg_nos):
+        # True where an override sets the vehicle's category or fuel
+        codes, keys = self._keys(reg_nos)
+        overrides = self.overrides.reindex(keys)
+        forced = np.append((overrides['vehicle_type'].notna() | overrides['fuel_type'].notna()).to_numpy(), False)
+        return forced[np.where(codes < 0, len(keys), codes)]
+
+    def alias_numbers(self, reg_nos):
+        return alias_numbers(reg_nos, self.overrides)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the local vehicle registry and look vehicles up in it.')
+    parser.add_argument('--db', default=REGISTRY_DB, help='SQLite registry file')
+    parser.add_argument('--overrides', default=OVERRIDES_FILE,
+                        help='vehicle override/alias table (default: the one next to this script)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('import', help='add the vehicles of vahan CSV exports (earlier files win)')
+    add.add_argument('vahan', nargs='+')
+    add.add_argument('--replace', action='store_true', help='overwrite vehicles already in the registry')
+    get = commands.add_parser('get', help='print the record of each registration number')
+    get.add_argument('reg_no', nargs='+')
+    args = parser.parse_args()
+
+    registry = VehicleRegistry(args.db, args.overrides)
+    if args.command == 'import':
+        for path in args.vahan:
+            print(f"{path}: {registry.import_vahan(path, replace=args.replace)} vehicles written")
+        print(f"{len(registry)} vehicles in {args.db}")
+    else:
+        for reg_no in args.reg_no:
+            print(f"{reg_no}: {registry.get(reg_no)}")
+
+
+if __name__ == '__main__':
+    main()
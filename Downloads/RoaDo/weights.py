@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_FILE = os.path.join(MODULE_DIR, 'consignment_weights.csv')  # bundled with the scripts
+DEFAULT_WEIGHT = 500  # kg, when no keyword matches
+MEMO_DIR = '.cache'
+MEMO_MAX_ENTRIES = 200_000  # descriptions remembered per rule table; the least recently used go first
+
+MEMO_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS memo (consignment TEXT PRIMARY KEY, unit_weight REAL, text_quantity REAL, '
+    'last_used INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS memo_last_used ON memo (last_used)',
+]
+
+
+def load_rules(path=RULES_FILE):
+    # keyword,weight_kg table; keywords are matched as upper-case substrings
+    rules = pd.read_csv(path)
+    return {str(k).upper(): float(w) for k, w in zip(rules['keyword'], rules['weight_kg'])}
+
+
+def text_quantity(consignment_str):
+    # "... 4 NOS" or "... 4NOS" in the description itself
+    parts = consignment_str.split(' ')
+    for i, part in enumerate(parts):
+        if 'NOS' in part and i > 0:
+            if parts[i-1].isdigit():
+                return int(parts[i-1])
+            elif any(char.isdigit() for char in part):
+                num_str = ''.join(filter(str.isdigit, part))
+                if num_str:
+                    return int(num_str)
+    return None
+
+
+class WeightEstimator:
+    # Keyword-based consignment weight guess. Keywords are tried longest first (ties keep
+    # file order), so "ABB GENERATOR" wins over "GENERATOR". All keywords are matched in a
+    # single pass of one compiled pattern; overlapping matches are found via a lookahead.
+    # Each distinct description is parsed once and the result is remembered on disk per
+    # rule table (up to MEMO_MAX_ENTRIES of them), so repeated descriptions cost a lookup.
+
+    def __init__(self, rules, default_weight=DEFAULT_WEIGHT, memo_dir=MEMO_DIR):
+        self.default_weight = default_weight
+        ordered = sorted(rules.items(), key=lambda kv: -len(kv[0]))
+        self.rules = dict(ordered)
+        self.priority = {key: rank for rank, (key, _) in enumerate(ordered)}
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(k) for k in self.rules) + '))') if rules else None
+        digest = hashlib.sha256(json.dumps([ordered, default_weight]).encode()).hexdigest()[:16]
+        self.memo_path = os.path.join(memo_dir, f"weights-{digest}.sqlite") if memo_dir else None
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE, **kwargs):
+        return cls(load_rules(path), **kwargs)
+
+    def _recall(self, uniques):
+        # {description: parse(description)}, read from the memo where it has them. Only these
+        # rows are read, marked as used and, for new descriptions, added; rows beyond
+        # MEMO_MAX_ENTRIES are dropped least recently used first.
+        if not self.memo_path:
+            return {u: self.parse(u) for u in uniques}
+        os.makedirs(os.path.dirname(self.memo_path), exist_ok=True)
+        with closing(sqlite3.connect(self.memo_path)) as conn, conn:
+            for statement in MEMO_SCHEMA:
+                conn.execute(statement)
+            stamp = conn.execute('SELECT COALESCE(MAX(last_used), 0) + 1 FROM memo').fetchone()[0]
+            conn.execute('CREATE TEMP TABLE wanted (consignment TEXT PRIMARY KEY)')
+            conn.executemany('INSERT OR IGNORE INTO wanted VALUES (?)', ((u,) for u in uniques))
+            memo = {text: [weight, qty] for text, weight, qty in conn.execute(
+                'SELECT consignment, unit_weight, text_quantity FROM memo JOIN wanted USING (consignment)')}
+            conn.execute('UPDATE memo SET last_used = ? WHERE consignment IN (SELECT consignment FROM wanted)',
+                         (stamp,))
+            missing = [u for u in uniques if u not in memo]
+            for u in missing:
+                memo[u] = self.parse(u)
+            # Quantities are stored as REAL: a long digit run would overflow an SQLite integer
+            conn.executemany('INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?)',
+                             ((u, memo[u][0], None if memo[u][1] is None else float(memo[u][1]), stamp)
+                              for u in missing))
+            conn.execute('DELETE FROM memo WHERE consignment IN (SELECT consignment FROM memo '
+                         'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (MEMO_MAX_ENTRIES,))
+        return memo
+
+    def parse(self, consignment):
+        # -> [unit weight or None, quantity stated in the text or None]
+        consignment_str = str(consignment).upper()
+        keys = set(self.pattern.findall(consignment_str)) if self.pattern else ()
+        key = min(keys, key=self.priority.__getitem__) if keys else None
+        return [self.rules[key] if key else None, text_quantity(consignment_str)]
+
+    def estimate(self, consignment, quantity=None, with_match=False):
+        """Estimated weight (kg) per row of a Consignment column, optionally with its Quantity column.
+
+        with_match=True also returns a boolean array telling which rows matched a keyword
+        (the others got the default weight, or 0 for a missing description).
+        """
+        codes, uniques = pd.factorize(consignment, use_na_sentinel=True)
+        uniques = [str(u) for u in uniques]
+        memo = self._recall(uniques)
+        parsed = [memo[u] for u in uniques]
+        unit = np.array([np.nan if w is None else w for w, _ in parsed] + [np.nan], dtype='float64')[codes]
+        text_qty = np.array([np.nan if q is None else q for _, q in parsed] + [np.nan], dtype='float64')[codes]
+
+        # Quantity column ("1 NOS", or one line per item); the first count is used
+        if quantity is not None:
+            qty_codes, qty_uniques = pd.factorize(quantity, use_na_sentinel=True)
+            counts = pd.Series(qty_uniques, dtype='string').str.extract(r'(\d+)\s*NOS', flags=re.IGNORECASE)[0]
+            column_qty = np.append(pd.to_numeric(counts, errors='coerce').to_numpy(dtype='float64'), np.nan)[qty_codes]
+        else:
+            column_qty = np.full(len(codes), np.nan)
+        qty = np.where(~np.isnan(text_qty), text_qty, np.where(~np.isnan(column_qty), column_qty, 1))
+
+        weight = np.where(np.isnan(unit), self.default_weight, unit * qty)
+        weight[codes == -1] = 0
+        weight = pd.Series(weight, index=getattr(consignment, 'index', None), name='Estimated Consignment Weight (kg)')
+        if with_match:
+            return weight, ~np.isnan(unit)
+        return weight